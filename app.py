@@ -35,6 +35,48 @@ app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__fil
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
+# Output directory for the Parquet export (see columnar_export.py); the overlap (seconds)
+# re-reads recent order changes so rows committed late are not skipped
+app.config['COLUMNAR_EXPORT_DIR'] = os.environ.get('COLUMNAR_EXPORT_DIR', os.path.join(app.instance_path, 'exports'))
+app.config['COLUMNAR_EXPORT_OVERLAP'] = int(os.environ.get('COLUMNAR_EXPORT_OVERLAP', 300))
+
+# Rendered bill/invoice PDF cache (see pdf_cache.py)
+app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR', os.path.join(app.instance_path, 'pdf_cache'))
+app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Bulk invoice ZIP job (see invoice_bulk.py); workers 0 renders in-process, unset = one per CPU
+app.config['INVOICE_RENDER_WORKERS'] = int(os.environ['INVOICE_RENDER_WORKERS']) if os.environ.get('INVOICE_RENDER_WORKERS') else None
+app.config['BULK_INVOICE_LIMIT'] = int(os.environ.get('BULK_INVOICE_LIMIT', 50000))
+
+# Background jobs (see jobs.py and worker.py); times in seconds
+app.config['JOB_ARTIFACT_DIR'] = os.environ.get('JOB_ARTIFACT_DIR', os.path.join(app.instance_path, 'job_artifacts'))
+app.config['JOB_TIMEOUT'] = int(os.environ.get('JOB_TIMEOUT', 2 * 60 * 60))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+app.config['JOB_RETENTION'] = int(os.environ.get('JOB_RETENTION', 7 * 24 * 60 * 60))
+
+# Public tracking view cache (see tracking_cache.py); the Redis tier is optional
+app.config['TRACKING_CACHE_SIZE'] = int(os.environ.get('TRACKING_CACHE_SIZE', 10000))
+app.config['TRACKING_CACHE_TTL'] = int(os.environ.get('TRACKING_CACHE_TTL', 30))
+app.config['TRACKING_CACHE_REDIS_URL'] = os.environ.get('TRACKING_CACHE_REDIS_URL')
+app.config['TRACKING_CACHE_SHARED_TTL'] = int(os.environ.get('TRACKING_CACHE_SHARED_TTL', 300))
+
+# Server-Sent Events tracking streams (see pubsub.py); times in seconds
+app.config['SSE_MAX_SUBSCRIBERS'] = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 200))
+app.config['SSE_HEARTBEAT'] = int(os.environ.get('SSE_HEARTBEAT', 15))
+app.config['SSE_MAX_DURATION'] = int(os.environ.get('SSE_MAX_DURATION', 30 * 60))
+app.config['PUBSUB_REDIS_URL'] = os.environ.get('PUBSUB_REDIS_URL', app.config['TRACKING_CACHE_REDIS_URL'])
+
+# Order/ticket ids reserved per worker process in one round trip (see id_allocator.py)
+app.config['ID_BLOCK_SIZE'] = int(os.environ.get('ID_BLOCK_SIZE', 50))
+
+# Auto-assignment (see auto_assign.py): how many extra open orders a partner already
+# serving the order's district/zone may carry over the least-loaded partner
+app.config['AUTO_ASSIGN_AFFINITY_SLACK'] = int(os.environ.get('AUTO_ASSIGN_AFFINITY_SLACK', 5))
+
+# Pickup runs (see pickup_runs.py): caps per run in kg and m³
+app.config['PICKUP_RUN_MAX_WEIGHT'] = float(os.environ.get('PICKUP_RUN_MAX_WEIGHT', 250))
+app.config['PICKUP_RUN_MAX_VOLUME'] = float(os.environ.get('PICKUP_RUN_MAX_VOLUME', 2.0))
+
 # Configure Flask-Mail (fill in your SMTP details)
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
 app.config['MAIL_PORT'] = 587
@@ -66,15 +108,22 @@ def load_user(user_id):
 with app.app_context():
     # Import models to ensure tables are created
     import models
+    # Assigns order/ticket ids (and reference numbers) at flush
+    import id_allocator
     db.create_all()
     logging.info("Database tables created successfully")
     
+    # Apply versioned schema changes (indexes, new columns) on existing databases
+    from migrations import run_migrations
+    run_migrations()
+    
     # Initialize default content
     from init_data import initialize_contact_settings
     initialize_contact_settings()
 
 # Import routes after app is created
 from routes import *
+import cli
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
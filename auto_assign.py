@@ -0,0 +1,191 @@
+"""Bulk auto-assignment of unassigned orders to delivery partners.
+
+Every open order without a partner is given to an active partner, oldest
+order first. Partners sit in a min-heap keyed by open load (their open
+orders from the daily rollups plus what this run has given them), so each
+order goes to the least-loaded partner. A partner already serving the
+order's pickup district, or failing that its zone, is preferred as long as
+their load is within AUTO_ASSIGN_AFFINITY_SLACK of the least-loaded
+partner; serving sets grow as orders are assigned, so a run keeps nearby
+pickups together. 10k orders take well under a second to plan.
+
+The plan is written with one executemany UPDATE in a single transaction.
+The update only touches orders that are still unassigned, and if any was
+assigned in the meantime the whole run is rolled back rather than
+half-applied. Being a Core write, it updates the rollups and drops the
+cached dashboard metrics itself.
+"""
+from collections import defaultdict
+from datetime import datetime
+import heapq
+import logging
+from flask import current_app
+from sqlalchemy import bindparam, func, select, update
+from database import db
+from models import Order, DeliveryPartner, OrderDailyRollup
+from work_queue import OPEN_STATUSES
+import metrics
+import rollups
+import tracking_cache
+import pickup_runs
+
+class AssignmentConflict(Exception):
+    """Raised when orders were assigned by someone else while a run was writing"""
+
+def _district(order):
+    return pickup_runs.cluster_key(order.pickup_district, order.pickup_state)
+
+class _LoadHeap:
+    """Min-heap of (load, partner id), one entry per member, read against a shared load dict.
+
+    Loads only grow, so an entry whose load is out of date is refreshed
+    when it reaches the top instead of on every assignment.
+    """
+
+    def __init__(self, loads, partner_ids=()):
+        self.loads = loads
+        self.members = set()
+        self.heap = []
+        for partner_id in partner_ids:
+            self.add(partner_id)
+
+    def add(self, partner_id):
+        if partner_id not in self.members:
+            self.members.add(partner_id)
+            heapq.heappush(self.heap, (self.loads[partner_id], partner_id))
+
+    def peek(self):
+        """(load, partner id) of the least-loaded member, or None"""
+        while self.heap:
+            load, partner_id = self.heap[0]
+            if load == self.loads[partner_id]:
+                return self.heap[0]
+            heapq.heapreplace(self.heap, (self.loads[partner_id], partner_id))
+        return None
+
+def _open_loads(partner_ids):
+    """Return ({partner id: open orders}, {partner id: set of zone ids}) from the rollups"""
+    loads = {partner_id: 0 for partner_id in partner_ids}
+    zones = defaultdict(set)
+    rows = db.session.query(OrderDailyRollup.partner_id, OrderDailyRollup.zone_id,
+                            func.sum(OrderDailyRollup.order_count))\
+        .filter(OrderDailyRollup.partner_id.in_(partner_ids),
+                OrderDailyRollup.delivery_status.in_(OPEN_STATUSES))\
+        .group_by(OrderDailyRollup.partner_id, OrderDailyRollup.zone_id).all()
+    for partner_id, zone_id, count in rows:
+        if count:
+            loads[partner_id] += int(count)
+            zones[partner_id].add(zone_id)
+    return loads, zones
+
+def _open_districts(partner_ids):
+    """{partner id: set of pickup districts} for partners' open orders"""
+    districts = defaultdict(set)
+    rows = db.session.execute(
+        select(Order.partner_id, Order.pickup_district, Order.pickup_state).distinct()
+        .where(Order.partner_id.in_(partner_ids), Order.delivery_status.in_(OPEN_STATUSES)))
+    for row in rows:
+        district = _district(row)
+        if district:
+            districts[row.partner_id].add(district)
+    return districts
+
+def _plan():
+    """Return (plan, order rows by id); see plan_assignments()"""
+    partners = db.session.query(DeliveryPartner.id, DeliveryPartner.full_name)\
+        .filter(DeliveryPartner.is_active.is_(True)).order_by(DeliveryPartner.id).all()
+    orders = db.session.execute(
+        select(Order.id, Order.reference_number, Order.zone_id, Order.pickup_district, Order.pickup_state,
+               Order.created_at,
+               Order.delivery_status, Order.total_amount, Order.gst_amount)
+        .where(Order.partner_id.is_(None), Order.delivery_status.in_(OPEN_STATUSES))
+        .order_by(Order.created_at, Order.id)).all()
+    if not partners or not orders:
+        return {'assignments': [], 'partners': []}, {}
+
+    partner_ids = [partner_id for partner_id, _ in partners]
+    loads, zones = _open_loads(partner_ids)
+    districts = _open_districts(partner_ids)
+    initial = dict(loads)
+    slack = current_app.config['AUTO_ASSIGN_AFFINITY_SLACK']
+
+    everyone = _LoadHeap(loads, partner_ids)
+    groups = {}  # ('zone', id) / ('district', name) -> _LoadHeap of partners serving it
+    for partner_id in partner_ids:
+        for zone_id in zones[partner_id]:
+            groups.setdefault(('zone', zone_id), _LoadHeap(loads)).add(partner_id)
+        for district in districts[partner_id]:
+            groups.setdefault(('district', district), _LoadHeap(loads)).add(partner_id)
+
+    assignments = []
+    for order in orders:
+        least_load, choice = everyone.peek()
+        reason = 'load'
+        keys = [key for key in (('district', _district(order)), ('zone', order.zone_id))
+                if key[1] is not None]
+        for key in keys:
+            best = groups[key].peek() if key in groups else None
+            if best and best[0] <= least_load + slack:
+                choice, reason = best[1], key[0]
+                break
+
+        loads[choice] += 1
+        for key in keys:
+            groups.setdefault(key, _LoadHeap(loads)).add(choice)
+        assignments.append({'order_id': order.id, 'reference_number': order.reference_number,
+                            'partner_id': choice, 'reason': reason})
+
+    summary = [{'partner_id': partner_id, 'full_name': name, 'open_orders': initial[partner_id],
+                'assigned': loads[partner_id] - initial[partner_id], 'new_load': loads[partner_id]}
+               for partner_id, name in partners]
+    return {'assignments': assignments, 'partners': summary}, {order.id: order for order in orders}
+
+def plan_assignments():
+    """Work out assignments without writing anything (the dry run).
+
+    Returns {'assignments': [...], 'partners': [...]}; each assignment has
+    the order's id, reference number, chosen partner and the reason
+    ('district', 'zone' or 'load'), and each partner entry their open
+    orders before and after the run.
+    """
+    return _plan()[0]
+
+def assign_orders():
+    """Plan and apply assignments in one transaction; returns the plan.
+
+    Raises AssignmentConflict if any planned order was assigned or closed
+    while the run was writing.
+    """
+    plan, orders = _plan()
+    assignments = plan['assignments']
+    if not assignments:
+        return plan
+
+    now = datetime.utcnow()
+    table = Order.__table__
+    statement = update(table)\
+        .where(table.c.id == bindparam('order_id'), table.c.partner_id.is_(None),
+               table.c.delivery_status == bindparam('status'))\
+        .values(partner_id=bindparam('new_partner_id'), updated_at=now)
+    deltas = rollups.new_deltas()
+    params = []
+    for assignment in assignments:
+        order = orders[assignment['order_id']]
+        values = dict(order._mapping)
+        rollups.add_row_delta(deltas, values, -1)
+        rollups.add_row_delta(deltas, dict(values, partner_id=assignment['partner_id']))
+        params.append({'order_id': order.id, 'status': order.delivery_status,
+                       'new_partner_id': assignment['partner_id']})
+    try:
+        updated = db.session.execute(statement, params).rowcount
+        if updated != len(params):
+            raise AssignmentConflict(f'{len(params) - updated} orders changed while assigning; run again')
+        rollups.apply_rollup_deltas(db.session.connection(), deltas)
+        tracking_cache.mark_changed(db.session, *[assignment['reference_number'] for assignment in assignments])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    metrics.invalidate('orders')
+    logging.info(f"Auto-assigned {len(assignments)} orders to {sum(1 for p in plan['partners'] if p['assigned'])} partners")
+    return plan
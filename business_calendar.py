@@ -0,0 +1,143 @@
+"""Business-day calendar for delivery ETAs.
+
+Weekends and the holidays table (national rows plus rows for one state)
+are compiled into per-state arrays covering LOOKBACK_DAYS before today to
+LOOKAHEAD_DAYS after it: the day offsets of every business day and the
+cumulative count of business days up to each day. Adding n business days
+to a date is then two array lookups instead of a walk through the
+calendar, and estimated_deliveries() does the same for whole arrays at once.
+
+Compiled calendars are cached per process. Admin endpoints that change
+holidays call bump_calendar_version() before committing; the local cache
+is dropped on commit and other workers notice the new version within
+VERSION_CHECK_INTERVAL seconds (see config_version.py).
+"""
+from datetime import date, datetime, timedelta
+import threading
+import time
+import numpy as np
+import config_version
+from database import db
+
+CALENDAR_VERSION_KEY = 'holidays'
+VERSION_CHECK_INTERVAL = 5  # seconds between version checks
+LOOKBACK_DAYS = 7
+LOOKAHEAD_DAYS = 730
+REBUILD_AFTER_DAYS = 30  # recompile once today has moved this far past the build date
+
+def state_key(state):
+    """Normalised state name ('' for national-only)"""
+    return (state or '').strip().lower()
+
+class BusinessCalendar:
+    """Business-day arrays for one state over a fixed date range"""
+
+    def __init__(self, start, holidays):
+        self.start = start
+        days = np.arange(LOOKBACK_DAYS + LOOKAHEAD_DAYS + 1)
+        weekday = (start.weekday() + days) % 7
+        is_business = weekday < 5
+        offsets = [(day - start).days for day in holidays]
+        offsets = [offset for offset in offsets if 0 <= offset < len(days)]
+        if offsets:
+            is_business[offsets] = False
+        # cumulative[i] = business days in [start, start + i]; business_days[r] = offset of the (r + 1)th
+        self.cumulative = np.cumsum(is_business)
+        self.business_days = np.flatnonzero(is_business)
+
+    def add_offsets(self, offsets, business_days):
+        """Vectorized: day offsets n business days after each offset (n = 0 keeps the day)"""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        business_days = np.asarray(business_days, dtype=np.int64)
+        if offsets.size and (offsets.min() < 0 or offsets.max() >= len(self.cumulative)):
+            raise ValueError('Date outside the business calendar range')
+        targets = self.cumulative[offsets] + business_days
+        if targets.size and targets.max() > len(self.business_days):
+            raise ValueError('Delivery time beyond the business calendar range')
+        arrivals = self.business_days[np.clip(targets - 1, 0, None)]
+        return np.where(business_days > 0, arrivals, offsets)
+
+    def add(self, day, business_days):
+        """date n business days after day (scalar form of add_offsets)"""
+        offset = (day - self.start).days
+        if not 0 <= offset < len(self.cumulative):
+            raise ValueError('Date outside the business calendar range')
+        if business_days <= 0:
+            return day
+        target = int(self.cumulative[offset]) + business_days
+        if target > len(self.business_days):
+            raise ValueError('Delivery time beyond the business calendar range')
+        return self.start + timedelta(days=int(self.business_days[target - 1]))
+
+_lock = threading.Lock()
+_state = {'version': None, 'start': None, 'holidays': None, 'calendars': {}, 'checked_at': 0.0}
+
+def _load_holidays(start):
+    """{state key: [dates]} for the calendar range ('' holds national holidays)"""
+    from models import Holiday
+    end = start + timedelta(days=LOOKBACK_DAYS + LOOKAHEAD_DAYS)
+    holidays = {}
+    for day, state in db.session.query(Holiday.date, Holiday.state).filter(Holiday.date.between(start, end)):
+        holidays.setdefault(state_key(state), []).append(day)
+    return holidays
+
+def get_calendar(state=None):
+    """Compiled BusinessCalendar for a state (national holidays only if state is empty)"""
+    key = state_key(state)
+    now = time.monotonic()
+    today = datetime.utcnow().date()
+    current = _state['start'] is not None and (today - _state['start']).days <= LOOKBACK_DAYS + REBUILD_AFTER_DAYS
+    if current and now - _state['checked_at'] < VERSION_CHECK_INTERVAL:
+        calendar = _state['calendars'].get(key)
+        if calendar is not None:
+            return calendar
+    with _lock:
+        version = _state['version']
+        if now - _state['checked_at'] >= VERSION_CHECK_INTERVAL:
+            version = config_version.read(CALENDAR_VERSION_KEY)
+            _state['checked_at'] = now
+        if not current or version != _state['version']:
+            start = today - timedelta(days=LOOKBACK_DAYS)
+            _state.update(version=version, start=start, holidays=_load_holidays(start), calendars={})
+        calendar = _state['calendars'].get(key)
+        if calendar is None:
+            holidays = _state['holidays'].get('', []) + (_state['holidays'].get(key, []) if key else [])
+            calendar = _state['calendars'][key] = BusinessCalendar(_state['start'], holidays)
+        return calendar
+
+def estimated_delivery(delivery_days, state=None, now=None):
+    """Datetime delivery_days business days after now (same time of day)"""
+    now = now or datetime.utcnow()
+    day = get_calendar(state).add(now.date(), int(delivery_days))
+    return datetime.combine(day, now.time())
+
+def estimated_deliveries(delivery_days, states=None, now=None):
+    """Vectorized estimated_delivery(): one datetime per delivery_days entry.
+
+    states, if given, is a parallel list of delivery states; each distinct
+    state is computed in one array operation.
+    """
+    now = now or datetime.utcnow()
+    delivery_days = np.asarray(delivery_days, dtype=np.int64)
+    keys = [state_key(state) for state in states] if states is not None else [''] * len(delivery_days)
+    keys = np.array(keys, dtype=object)
+    ordinals = np.empty(len(delivery_days), dtype=np.int64)
+    for key in set(keys.tolist()):
+        calendar = get_calendar(key)
+        mask = keys == key
+        today = (now.date() - calendar.start).days
+        ordinals[mask] = calendar.start.toordinal() + calendar.add_offsets(
+            np.full(int(mask.sum()), today), delivery_days[mask])
+    clock = now.time()
+    return [datetime.combine(date.fromordinal(ordinal), clock) for ordinal in ordinals.tolist()]
+
+def invalidate_calendar():
+    """Drop compiled calendars so the next lookup reloads holidays"""
+    with _lock:
+        _state.update(version=None, start=None, holidays=None, calendars={}, checked_at=0.0)
+
+def bump_calendar_version():
+    """Increment the holiday calendar version in the current transaction"""
+    config_version.bump(CALENDAR_VERSION_KEY)
+
+config_version.register(CALENDAR_VERSION_KEY, invalidate_calendar)
@@ -0,0 +1,136 @@
+import click
+from app import app, db
+from migrations import run_migrations, current_version, check_query_plans
+
+@app.cli.command('db-upgrade')
+def db_upgrade():
+    """Create missing tables and apply pending migrations"""
+    db.create_all()
+    run_migrations()
+    click.echo(f"Schema at version {current_version()}")
+
+@app.cli.command('db-check-plans')
+def db_check_plans():
+    """Fail if any hot order query falls back to a full table scan"""
+    results = check_query_plans()
+    if not results:
+        click.echo('Query plan check is only supported on SQLite')
+        return
+    failed = []
+    for name, (plan, full_scan) in results.items():
+        status = 'SCAN' if full_scan else 'ok'
+        click.echo(f"{status:4} {name}: {' | '.join(plan)}")
+        if full_scan:
+            failed.append(name)
+    if failed:
+        raise click.ClickException(f"Full table scan in: {', '.join(failed)}")
+
+@app.cli.command('simulate-pricing')
+@click.option('--months', default=6, show_default=True, help='How many months of orders to re-price')
+@click.option('--set', 'overrides', multiple=True, metavar='FIELD=VALUE', help='Proposed pricing value')
+@click.option('--zone-rate', multiple=True, metavar='ZONE_ID=RATE', help='Proposed zone base rate')
+@click.option('--workers', type=int, default=None, help='Worker processes (0 = in-process)')
+@click.option('--chunk-size', type=int, default=20000, show_default=True)
+def simulate_pricing(months, overrides, zone_rate, workers, chunk_size):
+    """Report revenue delta per zone and month under proposed pricing"""
+    from pricing_simulator import simulate_revenue
+    try:
+        proposed = dict(item.split('=', 1) for item in overrides)
+        if zone_rate:
+            proposed['zones'] = dict(item.split('=', 1) for item in zone_rate)
+    except ValueError:
+        raise click.BadParameter('expected FIELD=VALUE')
+    try:
+        report = simulate_revenue(proposed, months=months, chunk_size=chunk_size, workers=workers)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{'Month':8} {'Zone':30} {'Orders':>8} {'Stored':>14} {'Current':>14} {'Proposed':>14} {'Delta':>12}")
+    for row in report['rows']:
+        click.echo(f"{row['month']:8} {row['zone'][:30]:30} {row['orders']:>8} {row['stored_revenue']:>14.2f} "
+                   f"{row['current_revenue']:>14.2f} {row['proposed_revenue']:>14.2f} {row['delta']:>12.2f}")
+    click.echo(f"Since {report['since']}: {report['orders']} orders, "
+               f"revenue at current rates {report['current_revenue']:.2f} -> {report['proposed_revenue']:.2f} "
+               f"(delta {report['delta']:.2f}; stored totals {report['stored_revenue']:.2f})")
+
+@app.cli.command('export-columnar')
+@click.option('--out', 'out_dir', default=None, help='Output directory (default: COLUMNAR_EXPORT_DIR)')
+@click.option('--full', is_flag=True, help='Rewrite everything instead of exporting changes since the watermark')
+def export_columnar(out_dir, full):
+    """Export orders and delivery events as month-partitioned Parquet"""
+    from columnar_export import export_all
+    out_dir = out_dir or app.config['COLUMNAR_EXPORT_DIR']
+    try:
+        rows = export_all(out_dir, incremental=not full)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for name, count in rows.items():
+        click.echo(f"{name}: {count} rows -> {out_dir}")
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily order rollups from the orders table"""
+    from rollups import rebuild_rollups
+    click.echo(f"Rebuilt {rebuild_rollups()} rollup rows")
+
+@app.cli.command('import-orders')
+@click.argument('manifest', type=click.File('rb'))
+@click.option('--errors-only', is_flag=True, help='Only print rows that were rejected')
+def import_orders_command(manifest, errors_only):
+    """Book the orders in a CSV or JSON manifest file"""
+    import time
+    from order_import import parse_manifest, import_orders
+    try:
+        rows = parse_manifest(manifest.read(), manifest.name)
+        started = time.perf_counter()
+        result = import_orders(rows)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    for row in result['results']:
+        if row['success'] and not errors_only:
+            click.echo(f"{row['row']:>6} {row['reference_number']}")
+        elif not row['success']:
+            click.echo(f"{row['row']:>6} ERROR {row['error']}")
+    click.echo(f"Imported {result['imported']} orders, {result['failed']} rejected, in {elapsed:.2f}s")
+
+@app.cli.command('auto-assign')
+@click.option('--dry-run', is_flag=True, help='Show the plan without assigning anything')
+def auto_assign_command(dry_run):
+    """Assign open unassigned orders to partners, balancing open load"""
+    import time
+    from auto_assign import plan_assignments, assign_orders, AssignmentConflict
+    started = time.perf_counter()
+    try:
+        plan = plan_assignments() if dry_run else assign_orders()
+    except AssignmentConflict as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    click.echo(f"{'Partner':30} {'Open':>8} {'Assigned':>9} {'New load':>9}")
+    for partner in plan['partners']:
+        click.echo(f"{partner['full_name'][:30]:30} {partner['open_orders']:>8} {partner['assigned']:>9} {partner['new_load']:>9}")
+    verb = 'Would assign' if dry_run else 'Assigned'
+    click.echo(f"{verb} {len(plan['assignments'])} orders in {elapsed:.2f}s")
+
+@app.cli.command('cluster-pickups')
+def cluster_pickups_command():
+    """Place pending orders that are not in a pickup run yet"""
+    from pickup_runs import cluster_pending
+    click.echo(f"Placed {cluster_pending()} orders into pickup runs")
+
+@app.cli.command('bench-invoices')
+@click.option('--count', default=50, show_default=True, help='Orders to render')
+def bench_invoices(count):
+    """Time bill and invoice rendering per PDF"""
+    import time
+    from models import Order
+    from invoice_renderer import company_details, order_view, render_bill, render_invoice
+    orders = Order.query.order_by(Order.id.desc()).limit(count).all()
+    if not orders:
+        raise click.ClickException('No orders to render')
+    company = company_details()
+    views = [order_view(order) for order in orders]
+    for name, render in (('bill', render_bill), ('invoice', render_invoice)):
+        started = time.perf_counter()
+        size = sum(len(render(view, company)) for view in views)
+        elapsed = (time.perf_counter() - started) * 1000
+        click.echo(f"{name:8} {len(views)} PDFs  {elapsed / len(views):.2f} ms/PDF  {size // len(views)} bytes avg")
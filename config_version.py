@@ -0,0 +1,45 @@
+"""Version counters for per-process config caches.
+
+A module that caches compiled config (pricing.py, business_calendar.py)
+registers a name and a function that drops its cache. Writers call
+bump(name) before committing: the config_versions row is incremented in
+the same transaction, and the local cache is dropped once that
+transaction commits (nothing happens if it rolls back). Other processes
+compare read(name) with the version they compiled from.
+"""
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from database import db
+
+_invalidators = {}  # name -> function dropping this process's cache
+
+def register(name, invalidate):
+    """Call invalidate() after any commit that bumped name"""
+    _invalidators[name] = invalidate
+
+def read(name):
+    """Current version of a config (0 if it was never bumped)"""
+    from models import ConfigVersion
+    row = db.session.get(ConfigVersion, name)
+    return row.version if row else 0
+
+def bump(name):
+    """Increment a config version in the current transaction"""
+    from models import ConfigVersion
+    result = db.session.execute(
+        update(ConfigVersion)
+        .where(ConfigVersion.name == name)
+        .values(version=ConfigVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(ConfigVersion(name=name, version=1))
+    db.session.info.setdefault('config_changed', set()).add(name)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for name in session.info.pop('config_changed', ()):
+        _invalidators[name]()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_bumps(session):
+    session.info.pop('config_changed', None)
@@ -1,8 +1,11 @@
-from models import GlobalPricingConfig
+import numpy as np
+from pricing import get_snapshot
 
-def calculate_customer_bill(data):
-    config = GlobalPricingConfig.query.first()
-    if not config:
+def calculate_customer_bill(data, config=None):
+    """Price a customer bill against a pricing snapshot (the cached one by default)"""
+    if config is None:
+        config = get_snapshot()
+    if not config.has_config:
         raise Exception("Pricing configuration not set.")
 
     gst_rate = config.gst_rate
@@ -62,4 +65,87 @@ def calculate_customer_bill(data):
         "weight": weight,
         "dimensions": data['dimensions'],
     }
-    return invoice 
\ No newline at end of file
+    return invoice
+
+def _as_columns(batch):
+    """Accept a dict of columns, a list of row dicts or a pyarrow RecordBatch/Table"""
+    if hasattr(batch, 'to_pydict'):
+        return batch.to_pydict()
+    if isinstance(batch, (list, tuple)):
+        names = set().union(*(row.keys() for row in batch)) if batch else set()
+        return {name: [row.get(name) for row in batch] for name in names}
+    return batch
+
+def calculate_customer_bills(batch, config=None):
+    """Columnar calculate_customer_bill for whole manifests.
+
+    Takes the same fields as calculate_customer_bill, as columns, and returns
+    a dict of NumPy arrays with the same invoice fields. Branches are replaced
+    by masks, but each charge uses the same float operations as the scalar
+    function, so the values are identical row for row.
+    """
+    if config is None:
+        config = get_snapshot()
+    if not config.has_config:
+        raise Exception("Pricing configuration not set.")
+
+    columns = _as_columns(batch)
+    location_type = np.asarray(columns['location_type'], dtype=object)
+    weight = np.asarray(columns['weight'], dtype=np.float64)
+    declared_value = np.asarray(columns['declared_value'], dtype=np.float64)
+    size = len(location_type)
+
+    jaipur = location_type == 'jaipur_city'
+    oda_jaipur = location_type == 'oda_jaipur'
+    rajasthan = location_type == 'rajasthan'
+    all_india = location_type == 'all_india'
+
+    if 'distance_km' in columns:
+        distance = np.asarray(columns['distance_km'], dtype=np.float64)
+    elif jaipur.any():
+        raise KeyError('distance_km')
+    else:
+        distance = np.zeros(size)
+
+    # Pickup Charges
+    pickup_charge = np.zeros(size)
+    pickup_charge[jaipur] = config.pickup_charge_jaipur
+    pickup_charge[oda_jaipur] = config.pickup_charge_oda_jaipur
+
+    # Delivery Charges
+    delivery_charge = np.zeros(size)
+    delivery_charge[jaipur & (distance <= 5)] = config.delivery_charge_jaipur_0_5
+    delivery_charge[jaipur & (distance > 5) & (distance <= 15)] = config.delivery_charge_jaipur_5_15
+    over_min = weight > config.min_weight
+    for mask, base, per_kg in (
+        (rajasthan, config.delivery_charge_rajasthan_base, config.delivery_charge_rajasthan_per_kg),
+        (all_india, config.delivery_charge_india_base, config.delivery_charge_india_per_kg),
+    ):
+        delivery_charge[mask & ~over_min] = base
+        heavy = mask & over_min
+        delivery_charge[heavy] = base + (weight[heavy] - config.min_weight) * per_kg
+
+    # ODA Surcharge
+    is_oda = np.asarray(columns.get('is_oda', [False] * size), dtype=object)
+    oda_charge = np.where(is_oda.astype(bool), config.oda_charge, 0.0)
+
+    # Subtotal, GST
+    subtotal = pickup_charge + delivery_charge + oda_charge
+    gst = subtotal * config.gst_rate
+    total = subtotal + gst
+
+    invoice = {
+        "pickup_charge": pickup_charge,
+        "delivery_charge": delivery_charge,
+        "oda_charge": oda_charge,
+        "subtotal": subtotal,
+        "gst": gst,
+        "total": total,
+        "eway_bill_required": declared_value > 50000,
+        "declared_value": declared_value,
+        "weight": weight,
+    }
+    for name in ('description', 'dimensions'):
+        if name in columns:
+            invoice["product_description" if name == 'description' else name] = np.asarray(columns[name], dtype=object)
+    return invoice
@@ -0,0 +1,149 @@
+"""Batched, idempotent delivery-event ingest for partner devices.
+
+Devices queue scans offline and replay them in one request. Every event
+carries a client-generated idempotency key (stored per partner as
+"<partner id>:<key>" under a unique index), so replaying a batch never
+creates duplicates. A batch is validated up front, its events are
+inserted with one executemany in a single transaction, and the response
+has one result per item.
+
+For each order the newest event in the batch sets the delivery status,
+unless the order already has a later event, so late replays of old scans
+do not move an order backwards. Events whose type is not a delivery
+status (e.g. "scan") are recorded without touching the order.
+"""
+from datetime import datetime, timezone
+import logging
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import Order, DeliveryEvent
+import tracking_cache
+
+MAX_BATCH_EVENTS = 1000
+STATUS_EVENT_TYPES = ('pending', 'picked_up', 'in_transit', 'delivered', 'cancelled')
+
+def _parse_timestamp(value):
+    if not value:
+        return datetime.utcnow()
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _validate(item):
+    """Return (cleaned event, error)"""
+    if not isinstance(item, dict):
+        return None, 'event must be an object'
+    key = str(item.get('idempotency_key') or '').strip()
+    if not key or len(key) > 64:
+        return None, 'idempotency_key is required (max 64 characters)'
+    if not item.get('event_type') or not item.get('description'):
+        return None, 'event_type and description are required'
+    if not item.get('order_id') and not item.get('reference_number'):
+        return None, 'order_id or reference_number is required'
+    try:
+        timestamp = _parse_timestamp(item.get('timestamp'))
+        order_id = int(item['order_id']) if item.get('order_id') else None
+    except (TypeError, ValueError) as e:
+        return None, f'invalid value: {str(e)}'
+    return {
+        'key': key,
+        'order_id': order_id,
+        'reference_number': str(item.get('reference_number') or '').strip().upper() or None,
+        'event_type': str(item['event_type'])[:50],
+        'description': str(item['description']),
+        'location': str(item.get('location') or '')[:200],
+        'timestamp': timestamp,
+    }, None
+
+def _load_orders(events):
+    ids = {event['order_id'] for event in events if event['order_id']}
+    refs = {event['reference_number'] for event in events if event['reference_number'] and not event['order_id']}
+    orders = []
+    if ids:
+        orders += Order.query.filter(Order.id.in_(ids)).all()
+    if refs:
+        orders += Order.query.filter(Order.reference_number.in_(refs)).all()
+    return {order.id: order for order in orders}, {order.reference_number: order for order in orders}
+
+def _apply(partner_id, updated_by, items):
+    results = []
+    valid = []
+    for item in items:
+        event, error = _validate(item)
+        if error:
+            key = item.get('idempotency_key') if isinstance(item, dict) else None
+            results.append({'idempotency_key': key, 'status': 'error', 'error': error})
+        else:
+            event['stored_key'] = f'{partner_id}:{event["key"]}'
+            results.append({'idempotency_key': event['key'], 'status': None})
+            valid.append((len(results) - 1, event))
+
+    stored_keys = [event['stored_key'] for _, event in valid]
+    existing = set()
+    for start in range(0, len(stored_keys), 500):
+        existing.update(key for (key,) in db.session.query(DeliveryEvent.idempotency_key)
+                        .filter(DeliveryEvent.idempotency_key.in_(stored_keys[start:start + 500])))
+    orders_by_id, orders_by_ref = _load_orders([event for _, event in valid])
+
+    new_events = []
+    touched = set()
+    newest = {}  # order id -> newest status event in this batch
+    for index, event in valid:
+        result = results[index]
+        if event['stored_key'] in existing:
+            result['status'] = 'duplicate'
+            continue
+        order = orders_by_id.get(event['order_id']) if event['order_id'] else orders_by_ref.get(event['reference_number'])
+        if order is None:
+            result.update(status='error', error='Order not found')
+            continue
+        existing.add(event['stored_key'])  # repeated keys within the batch
+        new_events.append({
+            'order_id': order.id,
+            'event_type': event['event_type'],
+            'description': event['description'],
+            'location': event['location'],
+            'timestamp': event['timestamp'],
+            'updated_by': updated_by,
+            'idempotency_key': event['stored_key'],
+        })
+        touched.add(order.reference_number)
+        result.update(status='created', order_id=order.id)
+        if event['event_type'] in STATUS_EVENT_TYPES:
+            current = newest.get(order.id)
+            if current is None or event['timestamp'] >= current['timestamp']:
+                newest[order.id] = event
+
+    latest = DeliveryEvent.latest_events(list(newest))
+    for order_id, event in newest.items():
+        previous = latest.get(order_id)
+        if previous is not None and previous.timestamp and previous.timestamp > event['timestamp']:
+            continue  # a later event is already recorded
+        order = orders_by_id.get(order_id) or db.session.get(Order, order_id)
+        order.delivery_status = event['event_type']
+        if event['event_type'] == 'delivered':
+            order.actual_delivery = event['timestamp']
+
+    if new_events:
+        # Core executemany: one round trip for the whole batch
+        db.session.execute(insert(DeliveryEvent), new_events)
+        tracking_cache.mark_changed(db.session, *touched)
+    db.session.commit()
+    return results
+
+def ingest_events(partner_id, updated_by, items):
+    """Write a batch of events in one transaction; returns one result per item"""
+    for attempt in range(2):
+        try:
+            return _apply(partner_id, updated_by, items)
+        except IntegrityError:
+            # A concurrent replay stored some of the same keys first; retry once to mark them duplicate
+            db.session.rollback()
+            if attempt:
+                raise
+            logging.info("Delivery event batch raced with a replay, retrying")
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,22 @@
+"""Gunicorn settings (read automatically by `gunicorn wsgi:app`).
+
+Tracking pages keep a Server-Sent Events stream open (see pubsub.py) and
+each stream occupies a worker thread for up to SSE_MAX_DURATION seconds.
+Sync workers would serve one stream per process, so workers are threaded
+(gthread) with enough threads for SSE_MAX_SUBSCRIBERS streams plus regular
+requests. Streams beyond the limit get a 503 telling the client to poll.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+# Threads left for page and API requests once SSE_MAX_SUBSCRIBERS streams are open
+request_threads = int(os.environ.get('GUNICORN_REQUEST_THREADS', 32))
+threads = int(os.environ.get('GUNICORN_THREADS', int(os.environ.get('SSE_MAX_SUBSCRIBERS', 200)) + request_threads))
+# gthread workers report to the arbiter from their main loop, so a long-lived
+# stream does not trip this; it only catches a worker that is stuck as a whole
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,140 @@
+"""Counter-table id allocator for orders and support tickets.
+
+Reference and ticket numbers embed the row id, so new orders and tickets
+get their id (and number) in a before_flush hook rather than from the
+insert, and a booking still finishes in one commit. Constructing a model
+allocates nothing.
+
+Ids come from the id_sequences table. A block of ID_BLOCK_SIZE ids is
+reserved with one UPDATE on the flushing session's own connection, inside
+its transaction, so there is no second writer competing for the database
+lock. The rest of the block becomes this process's to hand out once that
+transaction commits; if it rolls back, the reservation is undone with it
+and nothing is lost. Later flushes take ids from the committed block
+without touching the table. Blocks never overlap, so there is no collision
+to retry; ids left unused when a process exits are simply skipped. A
+forked process discards the blocks it inherited.
+
+A sequence never hands out an id at or below the table's current max(id),
+so it stays correct if rows are inserted without it.
+"""
+from datetime import datetime
+import os
+import threading
+from flask import current_app
+from sqlalchemy import case, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from database import db
+from models import IdSequence, Order, SupportTicket
+
+# sequence name -> id column it allocates for
+SEQUENCES = {
+    'orders': Order.id,
+    'support_tickets': SupportTicket.id,
+}
+
+# model -> sequence, for ids assigned at flush
+MODEL_SEQUENCES = {
+    Order: 'orders',
+    SupportTicket: 'support_tickets',
+}
+
+_lock = threading.Lock()
+_blocks = {}  # name -> [pid, [[next id, end (exclusive)], ...]] committed ranges of this process
+
+def _floor(connection, name):
+    return connection.execute(select(func.coalesce(func.max(SEQUENCES[name]), 0) + 1)).scalar()
+
+def _reserve(connection, name, size):
+    """Reserve size ids in the counter table in the connection's transaction; returns the first one"""
+    table = IdSequence.__table__
+    floor = _floor(connection, name)
+    reserved = connection.execute(
+        update(table).where(table.c.name == name)
+        .values(next_value=case((table.c.next_value < floor, floor), else_=table.c.next_value) + size,
+                updated_at=datetime.utcnow()))
+    if reserved.rowcount:
+        end = connection.execute(select(table.c.next_value).where(table.c.name == name)).scalar()
+        return end - size
+    # Rows are seeded by migration 9; this only runs if one was deleted since
+    connection.execute(insert(table).values(name=name, next_value=floor + size, updated_at=datetime.utcnow()))
+    return floor
+
+def seed_sequences():
+    """Migration step creating the counter rows, starting above each table's max(id)"""
+    connection = db.session.connection()
+    table = IdSequence.__table__
+    existing = set(connection.execute(select(table.c.name)).scalars())
+    for name in SEQUENCES:
+        if name not in existing:
+            connection.execute(insert(table).values(name=name, next_value=_floor(connection, name),
+                                                    updated_at=datetime.utcnow()))
+
+def _take(ranges, count):
+    """Remove up to count ids from the front of a list of [next, end] ranges"""
+    ids = []
+    while ranges and len(ids) < count:
+        start, end = ranges[0]
+        take = min(count - len(ids), end - start)
+        ids.extend(range(start, start + take))
+        if start + take >= end:
+            ranges.pop(0)
+        else:
+            ranges[0][0] = start + take
+    return ids
+
+def _process_ranges(name):
+    pid = os.getpid()
+    entry = _blocks.get(name)
+    if entry is None or entry[0] != pid:
+        entry = _blocks[name] = [pid, []]  # inherited across fork; the parent may still use it
+    return entry[1]
+
+def _pending_ranges(session, name):
+    """Ranges reserved in the session's current transaction (not yet committed)"""
+    transaction = session.get_transaction()
+    pending = session.info.get('id_blocks')
+    if pending is None or pending[0] is not transaction:
+        pending = session.info['id_blocks'] = (transaction, {})
+    return pending[1].setdefault(name, [])
+
+def allocate(name, count=1, session=None):
+    """Return count unused ids for a sequence, reserving a block in the session's transaction if needed"""
+    if name not in SEQUENCES:
+        raise ValueError(f"Unknown id sequence: {name}")
+    session = session or db.session()
+    connection = session.connection()
+    with _lock:
+        ids = _take(_process_ranges(name), count)
+    pending = _pending_ranges(session, name)
+    ids += _take(pending, count - len(ids))
+    if len(ids) < count:
+        size = max(current_app.config['ID_BLOCK_SIZE'], count - len(ids))
+        start = _reserve(connection, name, size)
+        pending.append([start, start + size])
+        ids += _take(pending, count - len(ids))
+    return ids
+
+@event.listens_for(Session, 'before_flush')
+def _assign_ids(session, flush_context, instances):
+    new = {}
+    for obj in session.new:
+        name = MODEL_SEQUENCES.get(type(obj))
+        if name and obj.id is None:
+            new.setdefault(name, []).append(obj)
+    for name, objs in new.items():
+        for obj, new_id in zip(objs, allocate(name, len(objs), session)):
+            obj.assign_id(new_id)
+
+@event.listens_for(Session, 'after_commit')
+def _keep_committed_blocks(session):
+    pending = session.info.pop('id_blocks', None)
+    if pending is None or pending[0] is not session.get_transaction():
+        return
+    with _lock:
+        for name, ranges in pending[1].items():
+            _process_ranges(name).extend(ranges)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_uncommitted_blocks(session):
+    session.info.pop('id_blocks', None)
@@ -0,0 +1,141 @@
+"""Month-end bulk invoicing.
+
+Invoice numbers for every selected order are assigned with a few set-based
+UPDATEs in a single transaction. The PDFs are then rendered from plain
+order views and streamed back as a ZIP archive as each chunk finishes. The
+invoice_zip job (in worker.py) renders in a process pool; a web request
+renders in its own thread, because forking a multi-threaded web worker can
+leave a child holding a lock that another thread had taken. Only a bounded
+number of chunks is ever in flight and the archive is written to a
+non-seekable sink that is drained after every chunk, so memory stays flat
+and the first bytes arrive after the first chunk is rendered.
+"""
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import logging
+import os
+import zipfile
+from sqlalchemy import literal, or_, select, update
+from database import db
+from models import Order, Zone
+from invoice_renderer import ORDER_VIEW_FIELDS, render_invoice
+
+RENDER_CHUNK_SIZE = 25
+UPDATE_CHUNK_SIZE = 500  # stays below SQLite's bound-parameter limit
+
+def assign_invoice_numbers(order_ids):
+    """Number and mark as generated all given orders in one transaction"""
+    now = datetime.now()
+    try:
+        for start in range(0, len(order_ids), UPDATE_CHUNK_SIZE):
+            chunk = order_ids[start:start + UPDATE_CHUNK_SIZE]
+            db.session.execute(
+                update(Order)
+                .where(Order.id.in_(chunk), Order.invoice_number.is_(None))
+                .values(invoice_number=literal('INV-') + Order.reference_number, invoice_date=now)
+                .execution_options(synchronize_session=False))
+            db.session.execute(
+                update(Order)
+                .where(Order.id.in_(chunk), or_(Order.invoice_generated == False,
+                                                Order.invoice_generated.is_(None)))
+                .values(invoice_generated=True)
+                .execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+_VIEW_COLUMNS = [getattr(Order, name) for name in ORDER_VIEW_FIELDS] + [Zone.name.label('zone_name')]
+
+def iter_view_chunks(order_ids, chunk_size=RENDER_CHUNK_SIZE):
+    """Yield lists of order views (plain dicts) for the given ids"""
+    for start in range(0, len(order_ids), chunk_size):
+        statement = (select(*_VIEW_COLUMNS)
+                     .outerjoin(Zone, Order.zone_id == Zone.id)
+                     .where(Order.id.in_(order_ids[start:start + chunk_size])))
+        views = []
+        for row in db.session.execute(statement):
+            view = row._asdict()
+            view['zone_name'] = view['zone_name'] or 'N/A'
+            views.append(view)
+        yield views
+
+def render_invoice_chunk(views, company):
+    """Render one chunk; returns [(file name, pdf bytes or None, error or None)]"""
+    results = []
+    for view in views:
+        name = f"invoice_{view['reference_number']}.pdf"
+        try:
+            results.append((name, render_invoice(view, company), None))
+        except Exception as e:
+            results.append((name, None, str(e)))
+    return results
+
+def iter_rendered(chunks, company, workers=None):
+    """Render chunks of views, yielding results as chunks finish.
+
+    workers=0 renders in-process; otherwise a process pool of `workers`
+    processes is used (default: one per CPU). Only use a pool from a
+    single-threaded process such as the job worker.
+    """
+    if workers == 0:
+        for views in chunks:
+            yield render_invoice_chunk(views, company)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        max_in_flight = workers * 2
+        pending = set()
+        for views in chunks:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(render_invoice_chunk, views, company))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class _StreamSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_invoice_zip(order_ids, company, workers=None):
+    """Yield a ZIP archive of invoice PDFs chunk by chunk"""
+    sink = _StreamSink()
+    errors = []
+    rendered = 0
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for results in iter_rendered(iter_view_chunks(order_ids), company, workers):
+            for name, content, error in results:
+                if error:
+                    errors.append(f"{name}: {error}")
+                    continue
+                archive.writestr(name, content)
+                rendered += 1
+            data = sink.drain()
+            if data:
+                yield data
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield sink.drain()
+    logging.info(f"Bulk invoice ZIP: {rendered} rendered, {len(errors)} failed")
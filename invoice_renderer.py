@@ -0,0 +1,301 @@
+"""Bill and invoice PDF rendering.
+
+Paragraph and table styles are built once at import and shared by every
+render. Company details come from the active InvoiceTemplate, falling back
+to ContactSettings, and all amounts are the ones stored on the order when
+it was priced, so the bill and the invoice always show the same numbers.
+
+Renderers take plain dicts (see order_view and company_details), so they
+can run in worker processes without a database session.
+"""
+from datetime import datetime
+from io import BytesIO
+import hashlib
+import logging
+from xml.sax.saxutils import escape
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.enums import TA_CENTER
+from models import InvoiceTemplate, ContactSettings
+
+CURRENCY = 'INR'
+DATETIME_FORMAT = '%B %d, %Y at %I:%M %p'
+
+# Styles (built once)
+_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_styles['Heading1'],
+    fontSize=22,
+    spaceAfter=24,
+    alignment=TA_CENTER,
+    textColor=colors.HexColor('#2c3e50')
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_styles['Heading2'],
+    fontSize=14,
+    spaceAfter=10,
+    textColor=colors.HexColor('#34495e')
+)
+
+COMPANY_STYLE = ParagraphStyle(
+    'Company',
+    parent=_styles['Normal'],
+    fontSize=10,
+    leading=13,
+    alignment=TA_CENTER,
+    textColor=colors.HexColor('#34495e')
+)
+
+FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=_styles['Normal'],
+    fontSize=9,
+    alignment=TA_CENTER,
+    textColor=colors.HexColor('#7f8c8d')
+)
+
+# Table styles (built once)
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+])
+
+AMOUNT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#bdc3c7')),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('FONTSIZE', (0, -1), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+])
+
+INFO_COL_WIDTHS = [2*inch, 4.3*inch]
+AMOUNT_COL_WIDTHS = [4.3*inch, 2*inch]
+
+ORDER_VIEW_FIELDS = (
+    'id', 'reference_number', 'invoice_number', 'invoice_date', 'created_at',
+    'delivery_status', 'payment_status', 'customer_name', 'customer_email', 'customer_phone',
+    'pickup_address', 'delivery_address', 'recipient_name', 'recipient_phone',
+    'weight', 'length', 'width', 'height', 'quantity', 'package_description', 'payment_mode',
+    'insurance_required', 'insurance_value', 'insurance_premium',
+    'estimated_delivery', 'actual_delivery',
+    'base_amount', 'pickup_charge', 'extra_weight_charge', 'payment_fee',
+    'subtotal', 'gst_amount', 'total_amount',
+)
+
+def order_view(order, zone_name=None):
+    """Plain dict of the stored order fields used on bills and invoices"""
+    view = {name: getattr(order, name) for name in ORDER_VIEW_FIELDS}
+    if zone_name is None:
+        zone_name = order.zone.name if order.zone else 'N/A'
+    view['zone_name'] = zone_name
+    return view
+
+def company_details():
+    """Company header from the active InvoiceTemplate, else ContactSettings"""
+    template = InvoiceTemplate.query.filter_by(is_active=True).order_by(InvoiceTemplate.id).first()
+    if template:
+        details = {
+            'name': template.company_name,
+            'address': template.company_address,
+            'phone': template.company_phone,
+            'email': template.company_email,
+            'website': '',
+            'gst_number': template.gst_number,
+            'terms': template.terms_conditions or '',
+        }
+    else:
+        settings = ContactSettings.get_settings()
+        details = {
+            'name': settings.company_name,
+            'address': settings.company_address,
+            'phone': settings.company_phone,
+            'email': settings.company_email,
+            'website': settings.company_website,
+            'gst_number': '',
+            'terms': '',
+        }
+    # Changes whenever any detail changes; used in PDF cache keys
+    details['fingerprint'] = hashlib.sha1(
+        '|'.join(str(details[k]) for k in sorted(details)).encode('utf-8')).hexdigest()[:16]
+    return details
+
+def _money(value):
+    return f"{CURRENCY} {value or 0:,.2f}"
+
+def _label(value):
+    return (value or '').replace('_', ' ').title()
+
+def _when(value):
+    return value.strftime(DATETIME_FORMAT) if value else 'Pending'
+
+def _text(value):
+    return Paragraph(escape(value or ''), _styles['Normal'])
+
+def _info_table(rows):
+    table = Table(rows, colWidths=INFO_COL_WIDTHS)
+    table.setStyle(INFO_TABLE_STYLE)
+    return table
+
+def _company_header(company):
+    lines = [f"<b>{escape(company['name'])}</b>", escape(company['address']).replace('\n', '<br/>')]
+    contact = ' | '.join(part for part in (company['phone'], company['email'], company['website']) if part)
+    if contact:
+        lines.append(escape(contact))
+    if company['gst_number']:
+        lines.append(f"GSTIN: {escape(company['gst_number'])}")
+    return Paragraph('<br/>'.join(lines), COMPANY_STYLE)
+
+def _amount_table(view):
+    rows = [
+        ['Description', 'Amount'],
+        ['Base Shipping Amount', _money(view['base_amount'])],
+        ['Pickup Charge', _money(view['pickup_charge'])],
+        ['Extra Weight Charge', _money(view['extra_weight_charge'])],
+    ]
+    if view['insurance_required'] and view['insurance_premium']:
+        rows.append(['Insurance Premium', _money(view['insurance_premium'])])
+    rows.append(['Payment Processing Fee', _money(view['payment_fee'])])
+    rows.append(['Subtotal', _money(view['subtotal'])])
+    if view['subtotal']:
+        rows.append([f"GST ({view['gst_amount'] / view['subtotal'] * 100:.0f}%)", _money(view['gst_amount'])])
+    else:
+        rows.append(['GST', _money(view['gst_amount'])])
+    rows.append(['Total Amount', _money(view['total_amount'])])
+    table = Table(rows, colWidths=AMOUNT_COL_WIDTHS)
+    table.setStyle(AMOUNT_TABLE_STYLE)
+    return table
+
+def _package_rows(view):
+    rows = [
+        ['Zone:', view['zone_name']],
+        ['Weight:', f"{view['weight']} kg"],
+        ['Dimensions (L×W×H):', f"{view['length']} × {view['width']} × {view['height']} cm"],
+        ['Quantity:', f"{view['quantity']} package(s)"],
+        ['Description:', view['package_description'] or 'N/A'],
+        ['Payment Mode:', _label(view['payment_mode'])],
+    ]
+    if view['insurance_required']:
+        rows.append(['Declared Value:', _money(view['insurance_value'])])
+    return rows
+
+def _build(elements):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=54, leftMargin=54, topMargin=54, bottomMargin=36)
+    doc.build(elements)
+    pdf_content = buffer.getvalue()
+    buffer.close()
+    return pdf_content
+
+def render_bill(view, company):
+    """Customer delivery bill for an order view"""
+    customer_rows = [
+        ['Name:', view['customer_name']],
+        ['Email:', view['customer_email']],
+        ['Phone:', view['customer_phone']],
+        ['Pickup Address:', _text(view['pickup_address'])],
+        ['Delivery Address:', _text(view['delivery_address'])],
+    ]
+    if view['recipient_name'] and view['recipient_name'] != view['customer_name']:
+        customer_rows.extend([
+            ['Recipient Name:', view['recipient_name']],
+            ['Recipient Phone:', view['recipient_phone']],
+        ])
+
+    elements = [
+        _company_header(company),
+        Spacer(1, 12),
+        Paragraph("LOGISTICS DELIVERY BILL", TITLE_STYLE),
+        _info_table([
+            ['Reference Number:', view['reference_number']],
+            ['Order Date:', _when(view['created_at'])],
+            ['Delivery Status:', _label(view['delivery_status'])],
+            ['Payment Status:', _label(view['payment_status'])],
+        ]),
+        Spacer(1, 16),
+        Paragraph("Customer Information", HEADING_STYLE),
+        _info_table(customer_rows),
+        Spacer(1, 16),
+        Paragraph("Package Information", HEADING_STYLE),
+        _info_table(_package_rows(view)),
+        Spacer(1, 16),
+        Paragraph("Delivery Information", HEADING_STYLE),
+        _info_table([
+            ['Estimated Delivery:', _when(view['estimated_delivery'])],
+            ['Actual Delivery:', _when(view['actual_delivery'])],
+        ]),
+        Spacer(1, 16),
+        Paragraph("Billing Information", HEADING_STYLE),
+        _amount_table(view),
+        Spacer(1, 24),
+        Paragraph(
+            f"Thank you for choosing {escape(company['name'])}!<br/>"
+            "For any queries, please contact us with your reference number.<br/>"
+            f"Generated on: {datetime.now().strftime(DATETIME_FORMAT)}",
+            FOOTER_STYLE
+        ),
+    ]
+    return _build(elements)
+
+def render_invoice(view, company):
+    """Tax invoice for an order view"""
+    invoice_date = view['invoice_date'] or view['created_at']
+    elements = [
+        _company_header(company),
+        Spacer(1, 12),
+        Paragraph("INVOICE", TITLE_STYLE),
+        _info_table([
+            ['Invoice Number:', view['invoice_number'] or f"INV-{view['reference_number']}"],
+            ['Invoice Date:', invoice_date.strftime('%Y-%m-%d') if invoice_date else ''],
+            ['Reference:', view['reference_number']],
+            ['Customer:', view['customer_name']],
+            ['Email:', view['customer_email']],
+            ['Phone:', view['customer_phone']],
+        ]),
+        Spacer(1, 16),
+        _info_table([
+            ['Pickup Address:', _text(view['pickup_address'])],
+            ['Delivery Address:', _text(view['delivery_address'])],
+        ] + _package_rows(view)),
+        Spacer(1, 16),
+        _amount_table(view),
+    ]
+    if company['terms']:
+        elements.extend([Spacer(1, 20), Paragraph(escape(company['terms']).replace('\n', '<br/>'), FOOTER_STYLE)])
+    return _build(elements)
+
+def generate_pdf_bill(order, company=None):
+    """Render the bill for an ORM order"""
+    try:
+        return render_bill(order_view(order), company or company_details())
+    except Exception as e:
+        logging.error(f"Error generating PDF: {str(e)}")
+        raise e
+
+def generate_pdf_invoice(order, company=None):
+    """Render the invoice for an ORM order"""
+    try:
+        return render_invoice(order_view(order), company or company_details())
+    except Exception as e:
+        logging.error(f"Error generating invoice PDF: {str(e)}")
+        raise e
@@ -0,0 +1,137 @@
+"""Database-backed background job queue.
+
+Web requests enqueue a Job row and return its id; worker.py processes
+claim queued jobs one at a time, run the registered handler and store the
+result as a file under JOB_ARTIFACT_DIR for download. Claiming is a
+conditional UPDATE (status='queued' -> 'running'), so several workers can
+share the table safely. Jobs left running by a crashed worker are put back
+in the queue after JOB_TIMEOUT seconds, up to JOB_MAX_ATTEMPTS attempts.
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import tempfile
+import time
+from flask import current_app
+from sqlalchemy import update
+from database import db
+from models import Job
+
+# kind -> handler(params, out) returning (download name, mimetype)
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+def artifact_dir():
+    path = current_app.config['JOB_ARTIFACT_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def enqueue(kind, params=None, created_by=None):
+    """Queue a job and return it"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(kind=kind, params=json.dumps(params or {}), created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    logging.info(f"Queued job {job.id} ({kind})")
+    return job
+
+def claim_next(worker_id):
+    """Atomically claim the oldest queued job; returns it or None"""
+    while True:
+        job_id = db.session.query(Job.id).filter_by(status='queued').order_by(Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', worker_id=worker_id, started_at=datetime.utcnow(),
+                    attempts=Job.attempts + 1, error=None)
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(Job, job_id)
+        # Another worker claimed it first; try the next one
+
+def run_job(job):
+    """Run a claimed job and record its artifact or error"""
+    handler = JOB_HANDLERS.get(job.kind)
+    tmp_path = None
+    try:
+        if handler is None:
+            raise ValueError(f"No handler for job kind: {job.kind}")
+        fd, tmp_path = tempfile.mkstemp(dir=artifact_dir(), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as out:
+            name, mimetype = handler(json.loads(job.params or '{}'), out)
+        path = os.path.join(artifact_dir(), f'{job.id}-{name}')
+        os.replace(tmp_path, path)
+        job.status = 'done'
+        job.artifact_path = path
+        job.artifact_name = name
+        job.mimetype = mimetype
+        logging.info(f"Job {job.id} ({job.kind}) done")
+    except Exception as e:
+        db.session.rollback()
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job.status = 'failed'
+        job.error = str(e)
+        logging.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def requeue_stale():
+    """Return jobs abandoned by a crashed worker to the queue (or fail them)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+    max_attempts = current_app.config['JOB_MAX_ATTEMPTS']
+    stale = Job.status == 'running', Job.started_at < cutoff
+    requeued = db.session.execute(
+        update(Job).where(*stale, Job.attempts < max_attempts)
+        .values(status='queued', worker_id=None)
+        .execution_options(synchronize_session=False)).rowcount
+    failed = db.session.execute(
+        update(Job).where(*stale, Job.attempts >= max_attempts)
+        .values(status='failed', error='Timed out', finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    if requeued or failed:
+        logging.warning(f"Stale jobs: {requeued} requeued, {failed} failed")
+
+def purge_expired():
+    """Delete finished jobs (and their artifacts) older than JOB_RETENTION"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_RETENTION'])
+    expired = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff).all()
+    for job in expired:
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            os.remove(job.artifact_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired)
+
+def work(worker_id, poll_interval=1.0, once=False):
+    """Process jobs until interrupted (or until the queue is empty with once=True)"""
+    logging.info(f"Job worker {worker_id} started")
+    last_maintenance = None
+    while True:
+        if last_maintenance is None or time.monotonic() - last_maintenance > 60:
+            requeue_stale()
+            purge_expired()
+            last_maintenance = time.monotonic()
+        job = claim_next(worker_id)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(job)
+        finally:
+            db.session.remove()
@@ -0,0 +1,85 @@
+"""Shared dashboard metrics with a short per-process TTL cache.
+
+Order status counts come from one grouped query over the daily rollups and
+ticket counts from one conditional-aggregate query. Results are cached for
+METRICS_TTL seconds and dropped as soon as a transaction that wrote orders
+or support tickets commits in this process. A value computed while an
+invalidation happened is returned to its caller but not cached.
+"""
+import threading
+import time
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+from database import db
+from models import Order, SupportTicket
+import rollups
+
+METRICS_TTL = 30  # seconds
+
+_lock = threading.Lock()
+_cache = {}
+_generation = [0]  # bumped by every invalidate()
+
+def _cached(key, compute):
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and entry[1] > now:
+        return entry[0]
+    generation = _generation[0]
+    value = compute()
+    with _lock:
+        # Skip the store if an invalidation ran during compute(): value may predate it
+        if _generation[0] == generation:
+            _cache[key] = (value, now + METRICS_TTL)
+    return value
+
+def invalidate(key=None):
+    """Drop one cached metric (or all of them)"""
+    with _lock:
+        _generation[0] += 1
+        if key is None:
+            _cache.clear()
+        else:
+            _cache.pop(key, None)
+
+def order_summary():
+    """{'total_orders', 'total_revenue', 'status_counts': {status: count}}"""
+    return _cached('orders', rollups.report_summary)
+
+def order_status_count(status):
+    return order_summary()['status_counts'].get(status, 0)
+
+def _ticket_counts():
+    total, open_count, urgent, resolved = db.session.query(
+        func.count(SupportTicket.id),
+        func.sum(case((SupportTicket.status == 'open', 1), else_=0)),
+        func.sum(case((SupportTicket.priority == 'urgent', 1), else_=0)),
+        func.sum(case((SupportTicket.status == 'resolved', 1), else_=0)),
+    ).one()
+    return {
+        'total_tickets': total or 0,
+        'open_tickets': open_count or 0,
+        'urgent_tickets': urgent or 0,
+        'resolved_tickets': resolved or 0,
+    }
+
+def ticket_counts():
+    """{'total_tickets', 'open_tickets', 'urgent_tickets', 'resolved_tickets'}"""
+    return _cached('tickets', _ticket_counts)
+
+@event.listens_for(Session, 'after_flush')
+def _track_metric_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Order):
+            session.info.setdefault('metrics_changed', set()).add('orders')
+        elif isinstance(obj, SupportTicket):
+            session.info.setdefault('metrics_changed', set()).add('tickets')
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for key in session.info.pop('metrics_changed', ()):
+        invalidate(key)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('metrics_changed', None)
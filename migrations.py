@@ -0,0 +1,184 @@
+"""Versioned schema migrations applied on top of db.create_all().
+
+db.create_all() only creates missing tables, so anything that changes an
+existing table (indexes, new columns) is listed here as a numbered migration.
+A step is either an SQL string or a callable (see add_column).
+Applied versions are recorded in the schema_migrations table.
+"""
+from datetime import datetime
+import re
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from database import db
+from models import SchemaMigration, Order, DeliveryEvent, PickupRun
+import logging
+
+def add_column(table, column, ddl_type):
+    """Migration step adding a column unless db.create_all() already created it"""
+    def step():
+        columns = {col['name'] for col in inspect(db.engine).get_columns(table)}
+        if column not in columns:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+    return step
+
+def backfill_pickup_location(batch_size=5000):
+    """Migration step filling orders.pickup_district/pickup_state from pickup_address"""
+    from pickup_runs import split_pickup_address
+    table = Order.__table__
+    statement = table.update().where(table.c.id == bindparam('order_id'))\
+        .values(pickup_district=bindparam('district'), pickup_state=bindparam('state'))
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.pickup_address)
+            .where(table.c.pickup_district.is_(None), table.c.id > last_id)
+            .order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        params = []
+        for order_id, address in rows:
+            district, state = split_pickup_address(address)
+            if district:
+                params.append({'order_id': order_id, 'district': district[:100], 'state': (state or '')[:100] or None})
+        if params:
+            db.session.execute(statement, params)
+
+def seed_id_sequences():
+    """Migration step creating the id_sequences counter rows"""
+    from id_allocator import seed_sequences
+    seed_sequences()
+
+# (version, name, statements) - never edit an applied entry, append a new one
+MIGRATIONS = [
+    (1, 'order_hot_filter_indexes', [
+        'CREATE INDEX IF NOT EXISTS ix_orders_status_created ON orders (delivery_status, created_at DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_email_created ON orders (customer_email, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_partner_created ON orders (partner_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_zone ON orders (zone_id)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_invoice_created ON orders (invoice_generated, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_payment_status ON orders (payment_status)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_created ON orders (created_at)',
+    ]),
+    (2, 'columnar_export_watermark_indexes', [
+        'CREATE INDEX IF NOT EXISTS ix_orders_updated ON orders (updated_at)',
+        'CREATE INDEX IF NOT EXISTS ix_delivery_events_timestamp ON delivery_events (timestamp)',
+    ]),
+    (3, 'order_keyset_pagination_indexes', [
+        # Include id so (created_at DESC, id DESC) pages need no extra sort
+        'CREATE INDEX IF NOT EXISTS ix_orders_status_created_id ON orders (delivery_status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_orders_invoice_created_id ON orders (invoice_generated, created_at, id)',
+    ]),
+    (4, 'partner_work_queue_index', [
+        'CREATE INDEX IF NOT EXISTS ix_orders_partner_status_created ON orders (partner_id, delivery_status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_order_daily_rollups_partner ON order_daily_rollups (partner_id, delivery_status)',
+    ]),
+    (5, 'delivery_event_timeline_index', [
+        'CREATE INDEX IF NOT EXISTS ix_delivery_events_order_timestamp ON delivery_events (order_id, timestamp)',
+    ]),
+    (6, 'delivery_event_idempotency_key', [
+        add_column('delivery_events', 'idempotency_key', 'VARCHAR(100)'),
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_delivery_events_idempotency_key ON delivery_events (idempotency_key)',
+    ]),
+    (7, 'order_pickup_location_and_runs', [
+        add_column('orders', 'pickup_district', 'VARCHAR(100)'),
+        add_column('orders', 'pickup_state', 'VARCHAR(100)'),
+        add_column('orders', 'pickup_run_id', 'INTEGER REFERENCES pickup_runs (id)'),
+        backfill_pickup_location,
+        'CREATE INDEX IF NOT EXISTS ix_orders_pickup_run_id ON orders (pickup_run_id)',
+    ]),
+    (8, 'export_watermark_last_id', [
+        add_column('export_watermarks', 'last_id', 'INTEGER'),
+    ]),
+    (9, 'seed_id_sequences', [
+        seed_id_sequences,
+    ]),
+]
+
+def current_version():
+    """Return the highest applied migration version (0 if none)"""
+    version = db.session.query(db.func.max(SchemaMigration.version)).scalar()
+    return version or 0
+
+def run_migrations():
+    """Apply all pending migrations, each in its own transaction"""
+    applied = {row.version for row in SchemaMigration.query.all()}
+    for version, name, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement()
+                else:
+                    db.session.execute(text(statement))
+            db.session.add(SchemaMigration(version=version, name=name, applied_at=datetime.utcnow()))
+            db.session.commit()
+            logging.info(f"Applied migration {version}: {name}")
+        except IntegrityError:
+            # Another worker applied the same version concurrently
+            db.session.rollback()
+        except (OperationalError, ProgrammingError) as e:
+            db.session.rollback()
+            logging.error(f"Migration {version} ({name}) failed: {str(e)}")
+            raise
+
+def hot_order_queries():
+    """Query shapes used by the admin, partner and client screens"""
+    since = datetime(2024, 1, 1)
+    return {
+        'partner_work_queue': Order.query.filter_by(partner_id=1, delivery_status='pending')
+            .filter(Order.created_at >= since, db.or_(Order.created_at > since, Order.id > 1000))
+            .order_by(Order.created_at, Order.id).limit(11),
+        'partner_work_queue_closed': Order.query.filter_by(partner_id=1, delivery_status='delivered')
+            .order_by(Order.created_at.desc(), Order.id.desc()).limit(11),
+        'client_dashboard': Order.query.filter_by(customer_email='customer@example.com'),
+        'admin_invoice_status': Order.query.filter_by(delivery_status='delivered')
+            .filter(Order.created_at >= since).order_by(Order.created_at.desc()),
+        'admin_invoice_generated': Order.query.filter_by(invoice_generated=False)
+            .filter(Order.created_at >= since).order_by(Order.created_at.desc()),
+        'partner_orders': Order.query.filter_by(partner_id=1).order_by(Order.created_at.desc()),
+        'unassigned_orders': Order.query.filter_by(partner_id=None),
+        'zone_orders': Order.query.filter_by(zone_id=1),
+        'payment_status': Order.query.filter_by(payment_status='pending'),
+        'delivery_timeline': db.session.query(DeliveryEvent.event_type, DeliveryEvent.timestamp)
+            .filter(DeliveryEvent.order_id == 1).order_by(DeliveryEvent.timestamp, DeliveryEvent.id),
+        'columnar_export': Order.query.filter(Order.updated_at >= since,
+                                              db.or_(Order.updated_at > since, Order.id > 1000))
+            .order_by(Order.updated_at, Order.id),
+        'columnar_export_events': DeliveryEvent.query.filter(DeliveryEvent.id > 1000).order_by(DeliveryEvent.id),
+        'invoice_page': Order.query.filter(Order.created_at <= since,
+                                           db.or_(Order.created_at < since, Order.id < 1000))
+            .order_by(Order.created_at.desc(), Order.id.desc()).limit(51),
+        'invoice_page_status': Order.query.filter_by(delivery_status='delivered')
+            .filter(Order.created_at <= since, db.or_(Order.created_at < since, Order.id < 1000))
+            .order_by(Order.created_at.desc(), Order.id.desc()).limit(51),
+        'pickup_run_orders': Order.query.filter_by(pickup_run_id=1),
+        'open_pickup_runs': PickupRun.query.filter_by(status='open', cluster_key='jaipur|rajasthan')
+            .order_by(PickupRun.id),
+    }
+
+# A table scan without an index, in the current ("SCAN orders") and pre-3.36
+# ("SCAN TABLE orders", optionally "AS o" / "(~N rows)") plan formats
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?\w+(?: AS \w+)?(?: \(~\d+ rows\))?$')
+
+def is_full_scan(line):
+    """True if an EXPLAIN QUERY PLAN detail line is a full table scan"""
+    return bool(FULL_SCAN_PATTERN.match(line.strip()))
+
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN for each hot query and report full table scans.
+
+    Returns a dict of query name -> (plan lines, is_full_scan). Only SQLite
+    supports EXPLAIN QUERY PLAN; other backends return an empty dict.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return {}
+    results = {}
+    for name, query in hot_order_queries().items():
+        compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+        plan = [row[-1] for row in rows]
+        full_scan = any(is_full_scan(line) for line in plan)
+        results[name] = (plan, full_scan)
+    return results
@@ -129,6 +129,10 @@ class InvoiceTemplate(db.Model):
 
 class DeliveryEvent(db.Model):
     __tablename__ = 'delivery_events'
+    __table_args__ = (
+        db.Index('ix_delivery_events_order_timestamp', 'order_id', 'timestamp'),
+        db.Index('ux_delivery_events_idempotency_key', 'idempotency_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -137,8 +141,47 @@ class DeliveryEvent(db.Model):
     location = db.Column(db.String(200))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     updated_by = db.Column(db.String(50))  # partner_username or admin
+    idempotency_key = db.Column(db.String(100))  # "<partner id>:<client key>" for batch-ingested events
     
-    order = db.relationship('Order', backref='delivery_events')
+    # Dynamic backref: order.delivery_events is a query, so callers can order and limit it
+    order = db.relationship('Order', backref=db.backref('delivery_events', lazy='dynamic'))
+    
+    @staticmethod
+    def timeline(order_id):
+        """Events for an order in timestamp order, reading only the timeline columns"""
+        rows = db.session.query(
+            DeliveryEvent.event_type, DeliveryEvent.description, DeliveryEvent.location,
+            DeliveryEvent.timestamp, DeliveryEvent.updated_by
+        ).filter(DeliveryEvent.order_id == order_id)\
+            .order_by(DeliveryEvent.timestamp, DeliveryEvent.id).all()
+        return [{
+            'type': row.event_type,
+            'description': row.description,
+            'location': row.location,
+            'timestamp': row.timestamp.strftime('%Y-%m-%d %H:%M') if row.timestamp else '',
+            'updated_by': row.updated_by
+        } for row in rows]
+    
+    @staticmethod
+    def latest_events(order_ids):
+        """{order_id: latest event row} for many orders, from one grouped query"""
+        if not order_ids:
+            return {}
+        latest = db.session.query(
+            DeliveryEvent.order_id, db.func.max(DeliveryEvent.timestamp).label('timestamp')
+        ).filter(DeliveryEvent.order_id.in_(order_ids))\
+            .group_by(DeliveryEvent.order_id).subquery()
+        rows = db.session.query(
+            DeliveryEvent.id, DeliveryEvent.order_id, DeliveryEvent.event_type,
+            DeliveryEvent.location, DeliveryEvent.timestamp
+        ).join(latest, db.and_(DeliveryEvent.order_id == latest.c.order_id,
+                               DeliveryEvent.timestamp == latest.c.timestamp)).all()
+        result = {}
+        for row in rows:
+            # Several events can share the latest timestamp; keep the newest row
+            if row.order_id not in result or row.id > result[row.order_id].id:
+                result[row.order_id] = row
+        return result
 
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -152,6 +195,9 @@ class Order(db.Model):
     customer_phone = db.Column(db.String(20), nullable=False)
     pickup_address = db.Column(db.Text, nullable=False)
     delivery_address = db.Column(db.Text, nullable=False)
+    pickup_district = db.Column(db.String(100))  # also part of pickup_address; used for pickup runs
+    pickup_state = db.Column(db.String(100))
+    pickup_run_id = db.Column(db.Integer, db.ForeignKey('pickup_runs.id'), nullable=True, index=True)
     
     # Package details
     zone_id = db.Column(db.Integer, db.ForeignKey('zones.id'), nullable=False)
@@ -208,10 +254,11 @@ class Order(db.Model):
     partner = db.relationship('DeliveryPartner', backref='orders')
     partner_id = db.Column(db.Integer, db.ForeignKey('delivery_partners.id'), nullable=True)
     
-    def __init__(self, **kwargs):
-        super(Order, self).__init__(**kwargs)
+    def assign_id(self, order_id):
+        """Set the id (from id_allocator, at flush) and the reference number built from it"""
+        self.id = order_id
         if not self.reference_number:
-            self.reference_number = self.generate_reference_number()
+            self.reference_number = self.generate_reference_number(order_id)
     
     @staticmethod
     def generate_reference_number(order_id=None):
@@ -223,67 +270,28 @@ class Order(db.Model):
         return f"{rand_letters}{date_part}{voucher}"
     
     def calculate_total_amount(self):
-        """Calculate total amount using advanced pricing configuration"""
-        if not self.zone:
+        """Calculate total amount from the compiled pricing snapshot"""
+        from pricing import get_snapshot, quote
+        snapshot = get_snapshot()
+        zone = snapshot.zone(self.zone_id)
+        if not zone:
             return 0.0
         
-        # Get global pricing configuration
-        config = GlobalPricingConfig.query.first()
-        if not config:
-            # Fallback to basic calculation if no config
-            return round(self.zone.base_rate * self.weight * self.quantity, 2)
-        
-        # Calculate billable weight (minimum billable weight or actual weight, whichever is higher)
-        billable_weight = max(self.weight, config.minimum_billable_weight)
-        
-        # Base amount calculation
-        self.base_amount = self.zone.base_rate * billable_weight * self.quantity
-        
-        # Pickup charge
-        self.pickup_charge = config.base_pickup_charge
-        
-        # Extra weight charge if weight exceeds minimum billable weight
-        if self.weight > config.minimum_billable_weight:
-            extra_weight = self.weight - config.minimum_billable_weight
-            self.extra_weight_charge = extra_weight * config.extra_charge_per_kg
-        else:
-            self.extra_weight_charge = 0.0
-        
-        # Volume calculation for size-based pricing (if specified in settings)
-        volume = (self.length * self.width * self.height) / 1000000  # Convert cm³ to m³
-        volume_rate = PricingSettings.query.filter_by(setting_name='volume_rate_per_cubic_meter').first()
-        if volume_rate:
-            volume_cost = volume * volume_rate.setting_value
-            # Use higher of weight-based or volume-based pricing for base amount
-            self.base_amount = max(self.base_amount, volume_cost)
-        
-        # Insurance premium
-        if self.insurance_required and self.insurance_value > 0:
-            self.insurance_premium = self.insurance_value * config.insurance_rate
-        else:
-            self.insurance_premium = 0.0
+        breakdown = quote(snapshot, zone, self.weight, self.length, self.width, self.height,
+                          quantity=self.quantity or 1,
+                          payment_mode=self.payment_mode,
+                          insurance_required=self.insurance_required,
+                          insurance_value=self.insurance_value or 0.0)
         
-        # Payment processing fees
-        subtotal_for_fees = self.base_amount + self.pickup_charge + self.extra_weight_charge
+        self.base_amount = breakdown['base_amount']
+        self.pickup_charge = breakdown['pickup_charge']
+        self.extra_weight_charge = breakdown['extra_weight_charge']
+        self.insurance_premium = breakdown['insurance_premium']
+        self.payment_fee = breakdown['payment_fee']
+        self.subtotal = breakdown['subtotal']
+        self.gst_amount = breakdown['gst_amount']
         
-        if self.payment_mode == 'cash_on_delivery':
-            self.payment_fee = subtotal_for_fees * config.cod_fee_rate
-        elif self.payment_mode == 'card_payment':
-            self.payment_fee = subtotal_for_fees * config.card_payment_fee_rate
-        else:
-            self.payment_fee = 0.0
-        
-        # Calculate subtotal before tax
-        self.subtotal = (self.base_amount + self.pickup_charge + self.extra_weight_charge + 
-                        self.insurance_premium + self.payment_fee)
-        
-        # Calculate GST
-        self.gst_amount = self.subtotal * config.gst_rate
-        
-        # Calculate total amount
-        total = self.subtotal + self.gst_amount
-        
-        return round(total, 2)
+        return breakdown['total_amount']
     
     def get_delivery_timeline(self):
         """Get delivery timeline with status updates"""
@@ -391,17 +399,159 @@ class SupportTicket(db.Model):
     
     admin = db.relationship('Admin', backref='assigned_tickets')
     
-    def __init__(self, **kwargs):
-        super(SupportTicket, self).__init__(**kwargs)
+    def assign_id(self, ticket_id):
+        """Set the id (from id_allocator, at flush) and the ticket number built from it"""
+        self.id = ticket_id
         if not self.ticket_number:
-            self.ticket_number = self.generate_ticket_number()
+            self.ticket_number = self.generate_ticket_number(ticket_id)
     
     @staticmethod
-    def generate_ticket_number():
-        """Generate unique ticket number"""
+    def generate_ticket_number(ticket_id=None):
+        """Generate ticket number; the suffix is the ticket id in base 36, so it is unique"""
         import random
         import string
         prefix = "TKT"
         timestamp = datetime.now().strftime("%y%m%d")
-        random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        return f"{prefix}{timestamp}{random_suffix}"
+        if ticket_id is None:
+            return f"{prefix}{timestamp}{''.join(random.choices(string.ascii_uppercase + string.digits, k=4))}"
+        digits = string.digits + string.ascii_uppercase
+        suffix = ''
+        while ticket_id:
+            ticket_id, remainder = divmod(ticket_id, 36)
+            suffix = digits[remainder] + suffix
+        return f"{prefix}{timestamp}{suffix.rjust(4, '0')}"
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ConfigVersion(db.Model):
+    __tablename__ = 'config_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Holiday(db.Model):
+    __tablename__ = 'holidays'
+    __table_args__ = (
+        db.UniqueConstraint('date', 'state', name='uq_holidays_date_state'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    state = db.Column(db.String(100), nullable=True)  # None = national holiday
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'date': self.date.isoformat(),
+            'name': self.name,
+            'state': self.state,
+        }
+
+class IdSequence(db.Model):
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)  # table whose ids it hands out, e.g. orders
+    next_value = db.Column(db.Integer, nullable=False)  # first id not yet reserved by any worker
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ExportWatermark(db.Model):
+    __tablename__ = 'export_watermarks'
+    
+    name = db.Column(db.String(50), primary_key=True)  # exported table, e.g. orders
+    watermark = db.Column(db.DateTime)  # newest change timestamp already exported
+    last_id = db.Column(db.Integer)  # id of the newest exported row (keyset tie-break; the watermark for append-only tables)
+    rows_exported = db.Column(db.Integer, default=0)
+    last_run_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PickupRun(db.Model):
+    __tablename__ = 'pickup_runs'
+    __table_args__ = (
+        db.Index('ix_pickup_runs_status_cluster', 'status', 'cluster_key', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cluster_key = db.Column(db.String(210), nullable=False)  # lower-case "district|state"
+    pickup_district = db.Column(db.String(100), nullable=False)
+    pickup_state = db.Column(db.String(100))
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, accepted
+    partner_id = db.Column(db.Integer, db.ForeignKey('delivery_partners.id'), nullable=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)  # kg, weight x quantity
+    total_volume = db.Column(db.Float, nullable=False, default=0.0)  # m³, dimensions x quantity
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    accepted_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    orders = db.relationship('Order', backref='pickup_run', lazy='dynamic')
+    partner = db.relationship('DeliveryPartner')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'pickup_district': self.pickup_district,
+            'pickup_state': self.pickup_state,
+            'status': self.status,
+            'partner_id': self.partner_id,
+            'order_count': self.order_count,
+            'total_weight': round(self.total_weight, 2),
+            'total_volume': round(self.total_volume, 4),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'accepted_at': self.accepted_at.isoformat() if self.accepted_at else None,
+        }
+
+class OrderDailyRollup(db.Model):
+    __tablename__ = 'order_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'zone_id', 'partner_id', 'delivery_status', name='uq_order_daily_rollups_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # order created_at date (UTC)
+    zone_id = db.Column(db.Integer, nullable=False)
+    partner_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = unassigned
+    delivery_status = db.Column(db.String(20), nullable=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # sum of total_amount
+    gst = db.Column(db.Float, nullable=False, default=0.0)  # sum of gst_amount
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # handler name, see jobs.py
+    params = db.Column(db.Text, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    worker_id = db.Column(db.String(100))
+    created_by = db.Column(db.Integer, db.ForeignKey('admins.id'), nullable=True)
+    artifact_path = db.Column(db.String(500))
+    artifact_name = db.Column(db.String(200))  # download file name
+    mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'artifact_name': self.artifact_name,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,214 @@
+"""Bulk order import from a CSV or JSON manifest.
+
+Each row carries the same fields as the place_order form (pickup and
+delivery addresses may be given whole or as line/district/state parts).
+Rows are validated first, then every valid row is priced in one pass
+against a single pricing snapshot and inserted with executemany inserts,
+IMPORT_CHUNK_SIZE rows per transaction. Each chunk reserves its order ids
+from the id allocator, so reference numbers go into the insert itself.
+Rollup deltas are applied in the same transaction since Core inserts
+bypass the rollup hook (and the cached dashboard metrics are dropped after
+each commit for the same reason); the new orders join pickup runs in it too.
+
+The result has one entry per input row: the reference number of the new
+order or the reason the row was rejected. A chunk that fails to insert is
+rolled back on its own and its rows are reported as errors.
+"""
+from datetime import datetime
+import csv
+import io
+import json
+import logging
+from sqlalchemy import insert
+from database import db
+from models import Order
+from pricing import get_snapshot, quote_batch
+from id_allocator import allocate
+import pickup_runs
+import business_calendar
+import metrics
+import rollups
+
+MAX_IMPORT_ROWS = 10000
+IMPORT_CHUNK_SIZE = 1000
+
+REQUIRED_FIELDS = ('customer_name', 'customer_email', 'customer_phone', 'zone_id', 'package_type',
+                   'payment_mode', 'recipient_name', 'recipient_phone')
+NUMERIC_FIELDS = ('weight', 'length', 'width', 'height')
+PRICE_FIELDS = ('base_amount', 'pickup_charge', 'extra_weight_charge', 'insurance_premium',
+                'payment_fee', 'subtotal', 'gst_amount')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+
+def parse_manifest(data, filename=None):
+    """Return a list of row dicts from CSV or JSON bytes/text.
+
+    JSON may be a list of objects or {"orders": [...]}; anything else is
+    read as CSV with a header row. Raises ValueError on a malformed file.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    text = data.lstrip()
+    if (filename or '').lower().endswith('.json') or text.startswith(('[', '{')):
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON: {str(e)}')
+        rows = parsed.get('orders') if isinstance(parsed, dict) else parsed
+        if not isinstance(rows, list):
+            raise ValueError('JSON manifest must be a list of orders or {"orders": [...]}')
+        return rows
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise ValueError('CSV manifest has no header row')
+    return [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in reader]
+
+def _text(row, name):
+    value = row.get(name)
+    return str(value).strip() if value is not None else ''
+
+def _address(row, prefix):
+    whole = _text(row, f'{prefix}_address')
+    if whole:
+        return whole
+    parts = [_text(row, f'{prefix}_{part}') for part in ('address_line', 'district', 'state')]
+    # Same layout as place_order
+    return ', '.join(parts) if all(parts) else ''
+
+def _delivery_state(row):
+    state = _text(row, 'delivery_state')
+    if not state:
+        state = pickup_runs.split_pickup_address(_address(row, 'delivery'))[1]
+    return state or None
+
+def _pickup_location(row, pickup_address):
+    district, state = _text(row, 'pickup_district'), _text(row, 'pickup_state')
+    if not district:
+        district, state = pickup_runs.split_pickup_address(pickup_address)
+    return (district or '')[:100] or None, (state or '')[:100] or None
+
+def _validate(row):
+    """Return (cleaned row, error)"""
+    if not isinstance(row, dict):
+        return None, 'row must be an object'
+    missing = [name for name in REQUIRED_FIELDS if not _text(row, name)]
+    pickup_address, delivery_address = _address(row, 'pickup'), _address(row, 'delivery')
+    if not pickup_address:
+        missing.append('pickup_address')
+    if not delivery_address:
+        missing.append('delivery_address')
+    missing += [name for name in NUMERIC_FIELDS if not _text(row, name)]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+    try:
+        numbers = {name: float(row[name]) for name in NUMERIC_FIELDS}
+        zone_id = int(row['zone_id'])
+        quantity = int(row.get('quantity') or 1)
+        insurance_value = float(row.get('insurance_value') or 0)
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid number: {str(e)}'
+    if any(value <= 0 for value in numbers.values()) or quantity < 1 or insurance_value < 0:
+        return None, 'weight, dimensions and quantity must be positive'
+    pickup_district, pickup_state = _pickup_location(row, pickup_address)
+    insurance_required = row.get('insurance_required')
+    if not isinstance(insurance_required, bool):
+        insurance_required = _text(row, 'insurance_required').lower() in TRUE_VALUES
+    return dict(
+        numbers,
+        customer_name=_text(row, 'customer_name')[:100],
+        customer_email=_text(row, 'customer_email')[:120],
+        customer_phone=_text(row, 'customer_phone')[:20],
+        pickup_address=pickup_address,
+        delivery_address=delivery_address,
+        pickup_district=pickup_district,
+        pickup_state=pickup_state,
+        zone_id=zone_id,
+        package_type=_text(row, 'package_type')[:50],
+        quantity=quantity,
+        package_description=_text(row, 'package_description') or None,
+        payment_mode=_text(row, 'payment_mode')[:50],
+        recipient_name=_text(row, 'recipient_name')[:100],
+        recipient_phone=_text(row, 'recipient_phone')[:20],
+        insurance_required=insurance_required,
+        insurance_value=insurance_value,
+    ), None
+
+def _price(entries):
+    """Add pricing and estimated delivery to entries in place; returns the entries whose zone exists"""
+    result = quote_batch(get_snapshot(), [entry['values'] for entry in entries])
+    found = result['zone_found']
+    # All ETAs in one vectorized calendar lookup (per delivery state)
+    etas = iter(business_calendar.estimated_deliveries(
+        result['delivery_days'][found], [entry['delivery_state'] for entry, ok in zip(entries, found.tolist()) if ok]))
+    columns = {name: result[name].tolist() for name in PRICE_FIELDS + ('total_unrounded',)}
+    priced = []
+    for index, (entry, ok) in enumerate(zip(entries, found.tolist())):
+        if not ok:
+            entry['error'] = 'Invalid zone'
+            continue
+        values = entry['values']
+        for name in PRICE_FIELDS:
+            values[name] = columns[name][index]
+        values['total_amount'] = round(columns['total_unrounded'][index], 2)
+        values['estimated_delivery'] = next(etas)
+        priced.append(entry)
+    return priced
+
+def _insert_chunk(chunk, now):
+    """Insert one chunk of entries in its own transaction; returns the number saved"""
+    rows = [entry['values'] for entry in chunk]
+    try:
+        # Reserved in this chunk's transaction, so a failed chunk gives its ids back
+        for row, order_id in zip(rows, allocate('orders', len(rows))):
+            row.update(id=order_id, reference_number=Order.generate_reference_number(order_id),
+                       created_at=now, updated_at=now, delivery_status='pending', payment_status='pending',
+                       pickup_run_id=None)
+        pickup_runs.place_rows(rows)
+        db.session.execute(insert(Order), rows)
+        deltas = rollups.new_deltas()
+        for row in rows:
+            rollups.add_row_delta(deltas, row)
+        rollups.apply_rollup_deltas(db.session.connection(), deltas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Order import chunk of {len(chunk)} rows failed: {str(e)}")
+        for entry in chunk:
+            entry['error'] = 'Could not save order'
+        return 0
+    metrics.invalidate('orders')
+    for entry in chunk:
+        entry['order_id'] = entry['values']['id']
+        entry['reference_number'] = entry['values']['reference_number']
+    return len(chunk)
+
+def import_orders(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validate, price and insert manifest rows.
+
+    Returns {'imported': n, 'failed': n, 'results': [...]} with one result
+    per input row, in input order.
+    """
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f'At most {MAX_IMPORT_ROWS} orders per import')
+    entries = []
+    for number, row in enumerate(rows, 1):
+        values, error = _validate(row)
+        entries.append({'row': number, 'values': values, 'error': error,
+                        'delivery_state': _delivery_state(row) if values else None})
+
+    valid = [entry for entry in entries if not entry['error']]
+    priced = _price(valid) if valid else []
+
+    now = datetime.utcnow()
+    imported = 0
+    for start in range(0, len(priced), chunk_size):
+        imported += _insert_chunk(priced[start:start + chunk_size], now)
+    logging.info(f"Imported {imported} of {len(rows)} orders")
+
+    results = []
+    for entry in entries:
+        if entry.get('reference_number'):
+            results.append({'row': entry['row'], 'success': True, 'order_id': entry['order_id'],
+                            'reference_number': entry['reference_number']})
+        else:
+            results.append({'row': entry['row'], 'success': False, 'error': entry['error']})
+    return {'imported': imported, 'failed': len(rows) - imported, 'results': results}
@@ -0,0 +1,108 @@
+"""Keyset (seek) pagination over orders, newest first.
+
+Pages are ordered by (created_at DESC, id DESC) and each page starts
+strictly after the last row of the previous one, identified by an opaque
+cursor. The database seeks straight to the cursor through the created_at
+indexes instead of skipping OFFSET rows, so page 1000 costs the same as
+page 1.
+"""
+from datetime import datetime
+import math
+from sqlalchemy import or_
+from models import Order
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(order):
+    return f"{order.created_at.isoformat()}_{order.id}"
+
+def decode_cursor(cursor):
+    """Return (created_at, id); raises ValueError on a malformed cursor"""
+    created_at, _, order_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(order_id)
+
+class Page:
+    """One page of results with the interface of Flask-SQLAlchemy's Pagination.
+
+    Templates written against .paginate() (items, page, pages, total,
+    has_next, next_num, iter_pages, ...) keep working; next_cursor is the
+    keyset cursor of the following page.
+    """
+
+    def __init__(self, items, page, per_page, total, next_cursor=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+
+    @property
+    def pages(self):
+        return max(math.ceil(self.total / self.per_page), 1) if self.total else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, *, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        """Page numbers for a pager, with None marking each gap (as Pagination.iter_pages)"""
+        pages_end = self.pages + 1
+        if pages_end == 1:
+            return
+        left_end = min(1 + left_edge, pages_end)
+        yield from range(1, left_end)
+        if left_end == pages_end:
+            return
+        mid_start = max(left_end, self.page - left_current)
+        mid_end = min(self.page + right_current + 1, pages_end)
+        if mid_start - left_end > 0:
+            yield None
+        yield from range(mid_start, mid_end)
+        if mid_end == pages_end:
+            return
+        right_start = max(mid_end, pages_end - right_edge)
+        if right_start - mid_end > 0:
+            yield None
+        yield from range(right_start, pages_end)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+def after_cursor(query, cursor):
+    """Restrict a newest-first order query to rows after the cursor"""
+    created_at, order_id = decode_cursor(cursor)
+    # The created_at <= bound lets the index range scan start at the cursor
+    return query.filter(Order.created_at <= created_at,
+                        or_(Order.created_at < created_at, Order.id < order_id))
+
+def newest_first_page(query, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """Return (orders, next cursor or None) for one page of an order query"""
+    if cursor:
+        query = after_cursor(query, cursor)
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(size + 1).all()
+    if len(orders) > size:
+        return orders[:size], encode_cursor(orders[size - 1])
+    return orders, None
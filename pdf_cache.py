@@ -0,0 +1,86 @@
+"""Disk-backed cache for rendered bill and invoice PDFs.
+
+Files are content-addressed by a key derived from the document kind, the
+order id and the order's updated_at (plus invoice number and renderer
+version), so any write to the order produces a new key and stale files are
+never served. The cache directory is bounded by PDF_CACHE_MAX_BYTES with
+least-recently-used eviction (file mtime is bumped on every hit).
+Responses carry an ETag and Last-Modified, so repeat downloads are answered
+with 304 Not Modified without touching the renderer.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from flask import current_app, request, send_file
+
+RENDER_VERSION = '2'  # bump when the PDF layout changes
+
+_evict_lock = threading.Lock()
+
+def cache_dir():
+    path = current_app.config['PDF_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cache_key(kind, order, *extra):
+    """Content key for an order document; changes whenever the order is updated"""
+    parts = [RENDER_VERSION, kind, str(order.id),
+             order.updated_at.isoformat() if order.updated_at else '',
+             order.invoice_number or ''] + [str(part) for part in extra]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+def get_or_render(key, render):
+    """Return the path of the cached PDF for key, rendering it on a miss"""
+    path = os.path.join(cache_dir(), f'{key}.pdf')
+    try:
+        os.utime(path)  # mark as recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    content = render()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(content)
+    os.replace(tmp_path, path)
+    evict(current_app.config['PDF_CACHE_MAX_BYTES'], keep=path)
+    return path
+
+def evict(max_bytes, keep=None):
+    """Delete least-recently-used PDFs until the cache fits in max_bytes"""
+    with _evict_lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(cache_dir()):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= max_bytes:
+                break
+        logging.info(f"PDF cache evicted down to {total} bytes")
+
+def cached_pdf_response(kind, order, render, download_name, *extra):
+    """Serve an order PDF from the cache with ETag/Last-Modified (304 on repeat)"""
+    key = cache_key(kind, order, *extra)
+    if key in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(key)
+        return response
+
+    path = get_or_render(key, lambda: render(order))
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=download_name, conditional=True,
+                     etag=key, last_modified=order.updated_at, max_age=0)
@@ -0,0 +1,225 @@
+"""Pickup runs: pending orders batched by pickup district.
+
+Each pending order joins an open run for its pickup district and state,
+and a run is capped at PICKUP_RUN_MAX_WEIGHT kg and PICKUP_RUN_MAX_VOLUME
+m³. Clustering is incremental: a new order is placed first-fit into the
+oldest open run of its district that still has room, and a new run is
+started only when none does, so no other run is recomputed. Placing one
+order is a conditional UPDATE on the run's totals (as in jobs.claim_next),
+so concurrent bookings cannot overfill a run. Bulk paths (order import,
+catch-up clustering) plan a whole batch in memory against the open runs
+of the districts involved, then add each existing run's share with one
+such conditional UPDATE; rows whose run filled up in the meantime are
+placed again one at a time.
+
+A partner accepts an open run as a unit: the run is claimed with a
+conditional UPDATE and its still-unassigned pending orders are assigned
+to the partner in the same transaction. Accepted runs take no new orders.
+"""
+from datetime import datetime
+import logging
+from flask import current_app
+from sqlalchemy import update
+from database import db
+from models import Order, PickupRun
+
+BULK_CANDIDATE_RUNS = 8
+
+def split_pickup_address(address):
+    """(district, state) from a "line, district, state" address; (None, None) if it has fewer parts"""
+    parts = [part.strip() for part in (address or '').split(',')]
+    if len(parts) < 3 or not parts[-2]:
+        return None, None
+    return parts[-2], parts[-1] or None
+
+def cluster_key(district, state):
+    if not district:
+        return None
+    return f"{district.strip().lower()}|{(state or '').strip().lower()}"
+
+def order_load(weight, length, width, height, quantity):
+    """(weight in kg, volume in m³) an order adds to a run"""
+    quantity = quantity or 1
+    return (weight or 0.0) * quantity, (length or 0.0) * (width or 0.0) * (height or 0.0) / 1000000 * quantity
+
+def _caps():
+    return current_app.config['PICKUP_RUN_MAX_WEIGHT'], current_app.config['PICKUP_RUN_MAX_VOLUME']
+
+def _new_run(district, state, weight, volume, count=1):
+    run = PickupRun(cluster_key=cluster_key(district, state), pickup_district=district, pickup_state=state,
+                    status='open', order_count=count, total_weight=weight, total_volume=volume)
+    db.session.add(run)
+    return run
+
+def _claim(run_id, weight, volume, count=1):
+    """Add load to an open run if it still fits, re-checked in the UPDATE (as in jobs.claim_next)"""
+    max_weight, max_volume = _caps()
+    return db.session.execute(
+        update(PickupRun)
+        .where(PickupRun.id == run_id, PickupRun.status == 'open',
+               PickupRun.total_weight + weight <= max_weight,
+               PickupRun.total_volume + volume <= max_volume)
+        .values(order_count=PickupRun.order_count + count,
+                total_weight=PickupRun.total_weight + weight,
+                total_volume=PickupRun.total_volume + volume,
+                updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)).rowcount
+
+def _place(district, state, weight, volume):
+    """Put one order's load into the oldest open run with room, or a new run; returns the run id"""
+    max_weight, max_volume = _caps()
+    candidates = db.session.query(PickupRun.id).filter(
+        PickupRun.status == 'open', PickupRun.cluster_key == cluster_key(district, state),
+        PickupRun.total_weight + weight <= max_weight,
+        PickupRun.total_volume + volume <= max_volume).order_by(PickupRun.id).limit(5).all()
+    for (run_id,) in candidates:
+        # Another booking may have filled the run since the query above
+        if _claim(run_id, weight, volume):
+            return run_id
+    # No room anywhere (or the order alone exceeds the caps): start a run
+    run = _new_run(district, state, weight, volume)
+    db.session.flush()
+    return run.id
+
+def add_order(order):
+    """Put a new pending order into a pickup run (in the caller's transaction); returns the run or None"""
+    key = cluster_key(order.pickup_district, order.pickup_state)
+    if key is None or order.pickup_run_id is not None or (order.delivery_status or 'pending') != 'pending':
+        return None
+    weight, volume = order_load(order.weight, order.length, order.width, order.height, order.quantity)
+    order.pickup_run_id = _place(order.pickup_district, order.pickup_state, weight, volume)
+    return db.session.get(PickupRun, order.pickup_run_id)
+
+def place_rows(rows):
+    """First-fit a batch of order value dicts into runs; sets 'pickup_run_id' on each placed row.
+
+    Rows need pickup_district, pickup_state, weight, length, width, height
+    and quantity. Each district considers its BULK_CANDIDATE_RUNS newest
+    runs with room (add_order looks at a similar number), so a batch costs
+    O(rows) no matter how many runs a district has. Existing runs get one
+    guarded increment each, so a concurrent add_order is not overwritten;
+    rows whose run has filled up meanwhile are placed one by one as in
+    add_order. Everything is written in the caller's transaction.
+    """
+    max_weight, max_volume = _caps()
+    keyed = [(cluster_key(row.get('pickup_district'), row.get('pickup_state')), row) for row in rows]
+    keys = sorted({key for key, _ in keyed if key})
+    if not keys:
+        return 0
+    # cluster key -> [[weight, volume, added weight, added volume, run id or new PickupRun], ...], oldest first
+    candidates = {}
+    for start in range(0, len(keys), 500):
+        batch = keys[start:start + 500]
+        for run in db.session.query(PickupRun.id, PickupRun.cluster_key, PickupRun.total_weight,
+                                    PickupRun.total_volume)\
+                .filter(PickupRun.status == 'open', PickupRun.cluster_key.in_(batch),
+                        PickupRun.total_weight < max_weight, PickupRun.total_volume < max_volume)\
+                .order_by(PickupRun.id.desc()):
+            runs = candidates.setdefault(run.cluster_key, [])
+            if len(runs) < BULK_CANDIDATE_RUNS:
+                runs.insert(0, [run.total_weight, run.total_volume, 0.0, 0.0, run.id])
+
+    placed = []
+    for key, row in keyed:
+        if key is None:
+            continue
+        weight, volume = order_load(row.get('weight'), row.get('length'), row.get('width'),
+                                    row.get('height'), row.get('quantity'))
+        runs = candidates.setdefault(key, [])
+        for entry in runs:
+            if entry[0] + weight <= max_weight and entry[1] + volume <= max_volume:
+                break
+        else:
+            entry = [0.0, 0.0, 0.0, 0.0, _new_run(row['pickup_district'], row.get('pickup_state'), 0.0, 0.0, 0)]
+            runs.append(entry)
+            if len(runs) > BULK_CANDIDATE_RUNS:
+                runs.pop(0)  # stays open; add_order can still top it up
+        entry[0] += weight
+        entry[1] += volume
+        entry[2] += weight
+        entry[3] += volume
+        placed.append((row, entry, weight, volume))
+
+    by_run = {}  # id(entry) -> (entry, [(row, weight, volume), ...])
+    for row, entry, weight, volume in placed:
+        by_run.setdefault(id(entry), (entry, []))[1].append((row, weight, volume))
+    started, misplaced = [], []
+    for entry, run_rows in by_run.values():
+        run = entry[4]
+        if isinstance(run, PickupRun):
+            # Started by this batch, so no other transaction can see it yet
+            run.order_count, run.total_weight, run.total_volume = len(run_rows), entry[2], entry[3]
+            started.append((run, run_rows))
+        elif _claim(run, entry[2], entry[3], len(run_rows)):
+            for row, _, _ in run_rows:
+                row['pickup_run_id'] = run
+        else:
+            misplaced.extend(run_rows)  # filled or accepted since it was read
+    # One flush writes the new runs (batched)
+    db.session.flush()
+    for run, run_rows in started:
+        for row, _, _ in run_rows:
+            row['pickup_run_id'] = run.id
+    for row, weight, volume in misplaced:
+        row['pickup_run_id'] = _place(row['pickup_district'], row.get('pickup_state'), weight, volume)
+    if misplaced:
+        logging.info(f"Re-placed {len(misplaced)} orders whose pickup run filled up during a bulk placement")
+    return len(placed)
+
+def cluster_pending(batch_size=5000):
+    """Place pending orders that are not in a run yet (backfill/catch-up); returns how many were placed"""
+    placed = 0
+    last_id = 0
+    while True:
+        orders = db.session.query(Order.id, Order.pickup_district, Order.pickup_state, Order.weight,
+                                  Order.length, Order.width, Order.height, Order.quantity)\
+            .filter(Order.delivery_status == 'pending', Order.pickup_run_id.is_(None),
+                    Order.pickup_district.isnot(None), Order.id > last_id)\
+            .order_by(Order.id).limit(batch_size).all()
+        if not orders:
+            break
+        last_id = orders[-1].id
+        rows = [dict(order._mapping) for order in orders]
+        count = place_rows(rows)
+        if count:
+            # Bulk UPDATE by primary key (pickup_run_id does not feed the rollups or tracking pages)
+            db.session.execute(update(Order), [{'id': row['id'], 'pickup_run_id': row['pickup_run_id']}
+                                               for row in rows if row.get('pickup_run_id')])
+        db.session.commit()
+        placed += count
+    logging.info(f"Placed {placed} pending orders into pickup runs")
+    return placed
+
+def open_runs(district=None, state=None, after_id=None, limit=50):
+    """Open runs, oldest first, optionally for one district (and state); keyset paged by id"""
+    query = PickupRun.query.filter(PickupRun.status == 'open')
+    if district and state:
+        query = query.filter(PickupRun.cluster_key == cluster_key(district, state))
+    elif district:
+        query = query.filter(PickupRun.cluster_key.startswith(f"{district.strip().lower()}|", autoescape=True))
+    if after_id:
+        query = query.filter(PickupRun.id > after_id)
+    return query.order_by(PickupRun.id).limit(limit).all()
+
+def accept_run(run_id, partner_id):
+    """Claim an open run for a partner and assign its unassigned pending orders.
+
+    Returns (run, number of orders assigned), or (None, 0) if the run is
+    not open any more.
+    """
+    claimed = db.session.execute(
+        update(PickupRun)
+        .where(PickupRun.id == run_id, PickupRun.status == 'open')
+        .values(status='accepted', partner_id=partner_id, accepted_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None, 0
+    # ORM writes: a run is small, and the session hooks keep rollups and tracking pages in step
+    orders = Order.query.filter(Order.pickup_run_id == run_id, Order.partner_id.is_(None),
+                                Order.delivery_status == 'pending').all()
+    for order in orders:
+        order.partner_id = partner_id
+    db.session.commit()
+    logging.info(f"Pickup run {run_id} accepted by partner {partner_id} ({len(orders)} orders)")
+    return db.session.get(PickupRun, run_id), len(orders)
@@ -0,0 +1,290 @@
+"""Compiled pricing engine.
+
+GlobalPricingConfig, PricingSettings and Zone rates are compiled into an
+immutable PricingSnapshot that is cached per process. Admin endpoints that
+change any of them call bump_pricing_version() before committing; the local
+snapshot is dropped on commit, and other workers notice the new version the
+next time they check it (at most every VERSION_CHECK_INTERVAL seconds).
+Quotes are computed from the snapshot alone, without database round trips.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+import numpy as np
+import config_version
+from database import db
+
+PRICING_VERSION_KEY = 'pricing'
+VERSION_CHECK_INTERVAL = 5  # seconds between config version checks
+
+# GlobalPricingConfig columns copied into the snapshot
+CONFIG_FIELDS = (
+    'gst_rate', 'pickup_charge_jaipur', 'pickup_charge_oda_jaipur',
+    'delivery_charge_jaipur_0_5', 'delivery_charge_jaipur_5_15',
+    'delivery_charge_rajasthan_base', 'delivery_charge_rajasthan_per_kg',
+    'delivery_charge_india_base', 'delivery_charge_india_per_kg',
+    'oda_charge', 'min_weight', 'volume_rate',
+    'weight_cat_0_5', 'weight_cat_5_15', 'weight_cat_15_plus', 'cancellation_charge',
+)
+
+PAYMENT_FEE_SETTINGS = {
+    'cash_on_delivery': 'cod_fee_rate',
+    'card_payment': 'card_fee_rate',
+}
+
+@dataclass(frozen=True)
+class ZoneRate:
+    id: int
+    name: str
+    base_rate: float
+    delivery_days: int
+    is_active: bool = True
+
+@dataclass(frozen=True)
+class PricingSnapshot:
+    version: int = 0
+    has_config: bool = False
+    gst_rate: float = 0.18
+    pickup_charge_jaipur: float = 100.0
+    pickup_charge_oda_jaipur: float = 300.0
+    delivery_charge_jaipur_0_5: float = 300.0
+    delivery_charge_jaipur_5_15: float = 500.0
+    delivery_charge_rajasthan_base: float = 800.0
+    delivery_charge_rajasthan_per_kg: float = 20.0
+    delivery_charge_india_base: float = 1500.0
+    delivery_charge_india_per_kg: float = 30.0
+    oda_charge: float = 300.0
+    min_weight: float = 15.0
+    volume_rate: float = 50.0
+    weight_cat_0_5: float = 0.0
+    weight_cat_5_15: float = 0.0
+    weight_cat_15_plus: float = 0.0
+    cancellation_charge: float = 300.0
+    # PricingSettings, converted from percentages to rates
+    insurance_rate: float = 0.0
+    cod_fee_rate: float = 0.0
+    card_fee_rate: float = 0.0
+    zones: dict = field(default_factory=dict, compare=False)
+
+    def zone(self, zone_id):
+        """Return the ZoneRate for a zone id (int or str), or None"""
+        try:
+            return self.zones.get(int(zone_id))
+        except (TypeError, ValueError):
+            return None
+
+_lock = threading.Lock()
+_state = {'snapshot': None, 'checked_at': 0.0}
+
+def compile_snapshot(version=0):
+    """Load pricing rows from the database into a new PricingSnapshot"""
+    from models import GlobalPricingConfig, PricingSettings, Zone
+
+    values = {'version': version}
+    config = GlobalPricingConfig.query.first()
+    if config:
+        values['has_config'] = True
+        for name in CONFIG_FIELDS:
+            value = getattr(config, name)
+            if value is not None:
+                values[name] = float(value)
+
+    settings = {s.setting_name: s.setting_value for s in PricingSettings.query.all()}
+    if 'volume_rate_per_cubic_meter' in settings:
+        values['volume_rate'] = settings['volume_rate_per_cubic_meter']
+    values['insurance_rate'] = settings.get('insurance_rate_percentage', 0.0) / 100
+    values['cod_fee_rate'] = settings.get('cod_fee_percentage', 0.0) / 100
+    values['card_fee_rate'] = settings.get('card_payment_fee_percentage', 0.0) / 100
+
+    values['zones'] = {
+        z.id: ZoneRate(z.id, z.name, z.base_rate, z.delivery_days, bool(z.is_active))
+        for z in Zone.query.all()
+    }
+    return PricingSnapshot(**values)
+
+def get_snapshot():
+    """Return the cached pricing snapshot, recompiling if the version changed"""
+    snapshot = _state['snapshot']
+    now = time.monotonic()
+    if snapshot is not None and now - _state['checked_at'] < VERSION_CHECK_INTERVAL:
+        return snapshot
+    with _lock:
+        version = config_version.read(PRICING_VERSION_KEY)
+        snapshot = _state['snapshot']
+        if snapshot is None or snapshot.version != version:
+            snapshot = compile_snapshot(version)
+        _state['snapshot'] = snapshot
+        _state['checked_at'] = now
+    return snapshot
+
+def invalidate_snapshot():
+    """Drop the cached snapshot so the next quote recompiles it"""
+    with _lock:
+        _state['snapshot'] = None
+        _state['checked_at'] = 0.0
+
+def bump_pricing_version():
+    """Increment the pricing config version in the current transaction"""
+    config_version.bump(PRICING_VERSION_KEY)
+
+config_version.register(PRICING_VERSION_KEY, invalidate_snapshot)
+
+def quote(snapshot, zone, weight, length, width, height, quantity=1,
+          payment_mode=None, insurance_required=False, insurance_value=0.0):
+    """Price a single shipment against a snapshot; returns the breakdown dict"""
+    volume = (length * width * height) / 1000000  # Convert cm³ to m³
+    volume_cost = volume * snapshot.volume_rate
+
+    if not snapshot.has_config:
+        weight_cost = zone.base_rate * weight * quantity
+        total = round(weight_cost, 2)
+        return {
+            'weight_cost': weight_cost, 'volume': volume, 'volume_cost': 0.0,
+            'base_amount': weight_cost, 'pickup_charge': 0.0, 'extra_weight_charge': 0.0,
+            'insurance_premium': 0.0, 'payment_fee': 0.0, 'subtotal': weight_cost,
+            'gst_amount': 0.0, 'total_amount': total,
+        }
+
+    # Billable weight is at least min_weight; the base amount is the higher
+    # of weight-based and volume-based pricing
+    weight_cost = zone.base_rate * max(weight, snapshot.min_weight) * quantity
+    base_amount = max(weight_cost, volume_cost)
+    pickup_charge = snapshot.pickup_charge_jaipur
+
+    # Per-kg surcharge for the weight above min_weight (the 15+ kg category)
+    if weight > snapshot.min_weight:
+        extra_weight_charge = (weight - snapshot.min_weight) * snapshot.weight_cat_15_plus
+    else:
+        extra_weight_charge = 0.0
+
+    if insurance_required and insurance_value > 0:
+        insurance_premium = insurance_value * snapshot.insurance_rate
+    else:
+        insurance_premium = 0.0
+
+    subtotal_for_fees = base_amount + pickup_charge + extra_weight_charge
+    fee_field = PAYMENT_FEE_SETTINGS.get(payment_mode)
+    payment_fee = subtotal_for_fees * getattr(snapshot, fee_field) if fee_field else 0.0
+
+    subtotal = base_amount + pickup_charge + extra_weight_charge + insurance_premium + payment_fee
+    gst_amount = subtotal * snapshot.gst_rate
+    return {
+        'weight_cost': weight_cost,
+        'volume': volume,
+        'volume_cost': volume_cost,
+        'base_amount': base_amount,
+        'pickup_charge': pickup_charge,
+        'extra_weight_charge': extra_weight_charge,
+        'insurance_premium': insurance_premium,
+        'payment_fee': payment_fee,
+        'subtotal': subtotal,
+        'gst_amount': gst_amount,
+        'total_amount': round(subtotal + gst_amount, 2),
+    }
+
+def _zone_arrays(snapshot, zone_ids):
+    """Map zone ids to (found mask, base rates, delivery days) arrays"""
+    known = np.array(sorted(snapshot.zones), dtype=np.int64)
+    rates = np.array([snapshot.zones[z].base_rate for z in known], dtype=np.float64)
+    days = np.array([snapshot.zones[z].delivery_days for z in known], dtype=np.int64)
+    if len(known) == 0:
+        return np.zeros(len(zone_ids), dtype=bool), np.zeros(len(zone_ids)), np.zeros(len(zone_ids), dtype=np.int64)
+    idx = np.clip(np.searchsorted(known, zone_ids), 0, len(known) - 1)
+    found = known[idx] == zone_ids
+    return found, np.where(found, rates[idx], 0.0), np.where(found, days[idx], 0)
+
+def quote_arrays(snapshot, zone_ids, weight, length, width, height, quantity,
+                 payment_mode, insurance_required, insurance_value):
+    """Vectorized quote(): every argument is a 1-D array of equal length.
+
+    Returns a dict of arrays with the same keys as quote() plus 'zone_found'
+    and 'delivery_days'. Arithmetic follows quote() operation for operation,
+    so results match the scalar function exactly (totals are left unrounded
+    in 'total_unrounded').
+    """
+    zone_ids = np.asarray(zone_ids, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    quantity = np.asarray(quantity, dtype=np.float64)
+    found, base_rate, delivery_days = _zone_arrays(snapshot, zone_ids)
+
+    volume = (np.asarray(length, dtype=np.float64) * np.asarray(width, dtype=np.float64)
+              * np.asarray(height, dtype=np.float64)) / 1000000
+    volume_cost = volume * snapshot.volume_rate
+    zeros = np.zeros_like(weight)
+
+    if not snapshot.has_config:
+        weight_cost = base_rate * weight * quantity
+        return {
+            'zone_found': found, 'delivery_days': delivery_days,
+            'weight_cost': weight_cost, 'volume': volume, 'volume_cost': zeros,
+            'base_amount': weight_cost, 'pickup_charge': zeros, 'extra_weight_charge': zeros,
+            'insurance_premium': zeros, 'payment_fee': zeros, 'subtotal': weight_cost,
+            'gst_amount': zeros, 'total_unrounded': weight_cost,
+        }
+
+    weight_cost = base_rate * np.maximum(weight, snapshot.min_weight) * quantity
+    base_amount = np.maximum(weight_cost, volume_cost)
+    pickup_charge = np.full_like(weight, snapshot.pickup_charge_jaipur)
+    extra_weight_charge = np.where(weight > snapshot.min_weight,
+                                   (weight - snapshot.min_weight) * snapshot.weight_cat_15_plus, 0.0)
+
+    insurance_value = np.asarray(insurance_value, dtype=np.float64)
+    insured = np.asarray(insurance_required, dtype=bool) & (insurance_value > 0)
+    insurance_premium = np.where(insured, insurance_value * snapshot.insurance_rate, 0.0)
+
+    payment_mode = np.asarray(payment_mode, dtype=object)
+    fee_rate = np.zeros_like(weight)
+    for mode, fee_field in PAYMENT_FEE_SETTINGS.items():
+        fee_rate[payment_mode == mode] = getattr(snapshot, fee_field)
+    subtotal_for_fees = base_amount + pickup_charge + extra_weight_charge
+    payment_fee = subtotal_for_fees * fee_rate
+
+    subtotal = base_amount + pickup_charge + extra_weight_charge + insurance_premium + payment_fee
+    gst_amount = subtotal * snapshot.gst_rate
+    return {
+        'zone_found': found,
+        'delivery_days': delivery_days,
+        'weight_cost': weight_cost,
+        'volume': volume,
+        'volume_cost': volume_cost,
+        'base_amount': base_amount,
+        'pickup_charge': pickup_charge,
+        'extra_weight_charge': extra_weight_charge,
+        'insurance_premium': insurance_premium,
+        'payment_fee': payment_fee,
+        'subtotal': subtotal,
+        'gst_amount': gst_amount,
+        'total_unrounded': subtotal + gst_amount,
+    }
+
+INT64_MAX = np.iinfo(np.int64).max
+
+def _zone_id(value):
+    """Zone id as an int64-safe value; -1 (no such zone) if missing, malformed or out of range"""
+    try:
+        zone_id = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return -1
+    return zone_id if 0 < zone_id <= INT64_MAX else -1
+
+def quote_batch(snapshot, shipments):
+    """Price a list of shipment dicts (same fields as /api/calculate-price).
+
+    Raises ValueError if a numeric field cannot be parsed. Returns the
+    quote_arrays() result.
+    """
+    try:
+        return quote_arrays(
+            snapshot,
+            zone_ids=[_zone_id(s.get('zone_id')) for s in shipments],
+            weight=[float(s.get('weight', 0)) for s in shipments],
+            length=[float(s.get('length', 0)) for s in shipments],
+            width=[float(s.get('width', 0)) for s in shipments],
+            height=[float(s.get('height', 0)) for s in shipments],
+            quantity=[int(s.get('quantity', 1)) for s in shipments],
+            payment_mode=[s.get('payment_mode') for s in shipments],
+            insurance_required=[bool(s.get('insurance_required', False)) for s in shipments],
+            insurance_value=[float(s.get('insurance_value', 0)) for s in shipments],
+        )
+    except (TypeError, ValueError, AttributeError, OverflowError) as e:
+        raise ValueError(f"Invalid shipment data: {str(e)}")
@@ -0,0 +1,167 @@
+"""Rate-card what-if simulator.
+
+Re-prices historical orders under both the current and a proposed pricing
+configuration and reports the revenue delta between the two per zone and
+month. Stored order totals reflect whatever rates (and formula) applied
+when each order was booked, so they are reported alongside but do not
+enter the delta. Orders are streamed from the
+database in chunks (yield_per) and the chunks are priced in a process pool,
+with a bounded number of chunks in flight so memory stays flat. The admin
+endpoint queues a simulation as a background job (see jobs.py).
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import replace
+from datetime import datetime
+import os
+import numpy as np
+from sqlalchemy import select
+from database import db
+from models import Order
+from pricing import CONFIG_FIELDS, get_snapshot, quote_arrays
+
+# Snapshot fields an admin can override in a simulation
+SIMULATION_FIELDS = CONFIG_FIELDS + ('insurance_rate', 'cod_fee_rate', 'card_fee_rate')
+
+DEFAULT_CHUNK_SIZE = 20000
+MAX_SIMULATION_MONTHS = 36
+
+def validate_months(months):
+    """Return months as an int in 1..MAX_SIMULATION_MONTHS; raises ValueError otherwise"""
+    try:
+        months = int(months)
+    except (TypeError, ValueError):
+        raise ValueError('months must be a whole number')
+    if not 1 <= months <= MAX_SIMULATION_MONTHS:
+        raise ValueError(f'months must be between 1 and {MAX_SIMULATION_MONTHS}')
+    return months
+
+def proposed_snapshot(overrides, base=None):
+    """Return a copy of the current snapshot with the proposed values applied.
+
+    overrides maps snapshot field names to new values; an optional 'zones'
+    entry maps zone ids to new base rates.
+    """
+    base = base or get_snapshot()
+    values = {name: float(overrides[name]) for name in SIMULATION_FIELDS if overrides.get(name) not in (None, '')}
+    unknown = set(overrides) - set(SIMULATION_FIELDS) - {'zones'}
+    if unknown:
+        raise ValueError(f"Unknown pricing fields: {', '.join(sorted(unknown))}")
+    zones = dict(base.zones)
+    for zone_id, base_rate in (overrides.get('zones') or {}).items():
+        zone = zones.get(int(zone_id))
+        if zone is None:
+            raise ValueError(f"Unknown zone: {zone_id}")
+        zones[zone.id] = replace(zone, base_rate=float(base_rate))
+    return replace(base, has_config=True, zones=zones, **values)
+
+def months_ago(months, now=None):
+    """First day of the month `months - 1` months before now"""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    return datetime(index // 12, index % 12 + 1, 1)
+
+_COLUMNS = (
+    Order.zone_id, Order.created_at, Order.weight, Order.length, Order.width, Order.height,
+    Order.quantity, Order.payment_mode, Order.insurance_required, Order.insurance_value,
+    Order.total_amount,
+)
+
+def _prices(snapshot, inputs, stored):
+    """Rounded totals under a snapshot; orders in zones it does not know keep their stored price"""
+    result = quote_arrays(snapshot, *inputs)
+    return np.where(result['zone_found'], np.round(result['total_unrounded'], 2), stored)
+
+def reprice_chunk(current_snapshot, snapshot, rows):
+    """Re-price one chunk of order rows under the current and proposed snapshots.
+
+    Returns {(zone_id, month): [orders, stored, current, proposed]}.
+    """
+    (zone_ids, created, weight, length, width, height, quantity,
+     payment_mode, insurance_required, insurance_value, stored) = zip(*rows)
+    inputs = (zone_ids, weight, length, width, height, [q or 1 for q in quantity], payment_mode,
+              [bool(i) for i in insurance_required], [v or 0.0 for v in insurance_value])
+    stored = np.asarray([s or 0.0 for s in stored], dtype=np.float64)
+    current = _prices(current_snapshot, inputs, stored)
+    proposed = _prices(snapshot, inputs, stored)
+
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    months = [c.strftime('%Y-%m') if c else 'unknown' for c in created]
+    for zone_id, month, paid, old, new in zip(zone_ids, months, stored.tolist(), current.tolist(),
+                                              proposed.tolist()):
+        bucket = totals[(zone_id, month)]
+        bucket[0] += 1
+        bucket[1] += paid
+        bucket[2] += old
+        bucket[3] += new
+    return dict(totals)
+
+def _merge(totals, partial):
+    for key, values in partial.items():
+        bucket = totals[key]
+        for index, value in enumerate(values):
+            bucket[index] += value
+
+def iter_order_chunks(since, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream historical order pricing inputs in chunks of plain tuples"""
+    statement = (select(*_COLUMNS)
+                 .where(Order.created_at >= since)
+                 .execution_options(yield_per=chunk_size))
+    for partition in db.session.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
+
+def simulate_revenue(overrides, months=6, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """Re-price the last `months` months of orders under the current and proposed values.
+
+    workers=0 prices chunks in-process; otherwise a process pool of `workers`
+    processes is used (default: one per CPU).
+    """
+    months = validate_months(months)
+    current_snapshot = get_snapshot()
+    snapshot = proposed_snapshot(overrides, current_snapshot)
+    since = months_ago(months)
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+
+    if workers == 0:
+        for rows in iter_order_chunks(since, chunk_size):
+            _merge(totals, reprice_chunk(current_snapshot, snapshot, rows))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            max_in_flight = workers * 2
+            pending = set()
+            for rows in iter_order_chunks(since, chunk_size):
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _merge(totals, future.result())
+                pending.add(pool.submit(reprice_chunk, current_snapshot, snapshot, rows))
+            for future in pending:
+                _merge(totals, future.result())
+
+    rows = []
+    for (zone_id, month), (count, paid, old, new) in sorted(totals.items(),
+                                                          key=lambda item: (item[0][1], item[0][0])):
+        zone = current_snapshot.zones.get(zone_id)
+        rows.append({
+            'month': month,
+            'zone_id': zone_id,
+            'zone': zone.name if zone else str(zone_id),
+            'orders': count,
+            'stored_revenue': round(paid, 2),
+            'current_revenue': round(old, 2),
+            'proposed_revenue': round(new, 2),
+            'delta': round(new - old, 2),
+        })
+    stored_total = sum(row['stored_revenue'] for row in rows)
+    current_total = sum(row['current_revenue'] for row in rows)
+    proposed_total = sum(row['proposed_revenue'] for row in rows)
+    return {
+        'since': since.strftime('%Y-%m-%d'),
+        'orders': sum(row['orders'] for row in rows),
+        'stored_revenue': round(stored_total, 2),
+        'current_revenue': round(current_total, 2),
+        'proposed_revenue': round(proposed_total, 2),
+        'delta': round(proposed_total - current_total, 2),
+        'rows': rows,
+    }
@@ -0,0 +1,162 @@
+"""In-process publish/subscribe for tracking updates.
+
+SSE streams subscribe to a reference number and block on their own
+queue, so an idle tracker costs no database queries. Committed writes to
+an order publish its reference number (see tracking_cache), which wakes
+the matching streams. Each worker process accepts at most
+SSE_MAX_SUBSCRIBERS streams; beyond that callers fall back to polling.
+
+Publishing only reaches streams in the same process. When PUBSUB_REDIS_URL
+is set (and the redis package is installed) updates are also sent over a
+Redis channel and a relay thread in every process delivers them locally,
+after running the on_remote_update() handlers (tracking_cache drops its
+local copies there, so the woken streams read fresh views).
+
+Streams hold a worker thread each, so the web server must run threaded
+workers; see gunicorn.conf.py.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from flask import current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CHANNEL = 'tracking-updates'
+
+class SubscriberLimit(Exception):
+    """Raised when this process already serves SSE_MAX_SUBSCRIBERS streams"""
+
+class Subscription:
+    """One stream's mailbox; notifications for the same key coalesce"""
+
+    def __init__(self, key):
+        self.key = key
+        self._queue = queue.Queue(maxsize=1)
+
+    def notify(self):
+        try:
+            self._queue.put_nowait(True)
+        except queue.Full:
+            pass  # a wake-up is already pending
+
+    def wait(self, timeout):
+        """True if an update arrived within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+_lock = threading.Lock()
+_subscribers = {}  # key -> set of Subscription
+_count = 0
+_origin = None  # (pid, id) - made after fork, so preloaded workers get their own
+_relay = None  # (pid, thread)
+_redis_client = None
+_remote_handlers = []
+
+def _origin_id():
+    """This process's id on the Redis channel, so the relay can skip its own messages"""
+    global _origin
+    pid = os.getpid()
+    if _origin is None or _origin[0] != pid:
+        _origin = (pid, f'{pid}-{uuid.uuid4().hex[:8]}')
+    return _origin[1]
+
+def on_remote_update(handler):
+    """Register handler(keys), run for updates published by other processes before streams wake"""
+    _remote_handlers.append(handler)
+    return handler
+
+def _redis():
+    global _redis_client
+    url = current_app.config.get('PUBSUB_REDIS_URL')
+    if not url or redis is None:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(url)
+    return _redis_client
+
+def subscribe(key):
+    """Register a stream for key; raises SubscriberLimit at capacity"""
+    global _count
+    limit = current_app.config['SSE_MAX_SUBSCRIBERS']
+    subscription = Subscription(key)
+    with _lock:
+        if _count >= limit:
+            raise SubscriberLimit(f'{_count} streams open in this worker')
+        _subscribers.setdefault(key, set()).add(subscription)
+        _count += 1
+    _start_relay()
+    return subscription
+
+def unsubscribe(subscription):
+    global _count
+    with _lock:
+        subscribers = _subscribers.get(subscription.key)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            _count -= 1
+            if not subscribers:
+                del _subscribers[subscription.key]
+
+def subscriber_count():
+    return _count
+
+def _deliver(keys):
+    with _lock:
+        targets = [sub for key in keys for sub in _subscribers.get(key, ())]
+    for subscription in targets:
+        subscription.notify()
+
+def publish(*keys):
+    """Wake every stream subscribed to one of keys (in all processes when Redis is configured)"""
+    keys = [key for key in keys if key]
+    if not keys:
+        return
+    _deliver(keys)
+    client = _redis()
+    if client is not None:
+        try:
+            client.publish(CHANNEL, json.dumps({'origin': _origin_id(), 'keys': keys}))
+        except Exception as e:
+            logging.warning(f"Tracking update publish failed: {str(e)}")
+
+def _start_relay():
+    global _relay
+    pid = os.getpid()
+    if (_relay is not None and _relay[0] == pid) or _redis() is None:
+        return
+    with _lock:
+        if _relay is not None and _relay[0] == pid:
+            return
+        thread = threading.Thread(target=_relay_loop, args=(_redis(), _origin_id()), name='pubsub-relay', daemon=True)
+        _relay = (pid, thread)
+        thread.start()
+
+def _relay_loop(client, origin):
+    while True:
+        try:
+            listener = client.pubsub(ignore_subscribe_messages=True)
+            listener.subscribe(CHANNEL)
+            for message in listener.listen():
+                data = json.loads(message['data'])
+                if data.get('origin') == origin:
+                    continue
+                keys = data.get('keys') or []
+                for handler in _remote_handlers:
+                    try:
+                        handler(keys)
+                    except Exception as e:
+                        logging.warning(f"Tracking update handler failed: {str(e)}")
+                _deliver(keys)
+        except Exception as e:
+            logging.warning(f"Tracking update relay reconnecting: {str(e)}")
+            time.sleep(1)
@@ -0,0 +1,180 @@
+"""Daily order rollups (day x zone x partner x status).
+
+The order_daily_rollups table is kept in step with the orders table by a
+Session after_flush hook, so every ORM write to an Order adjusts the rollup
+rows in the same transaction. Code that writes orders with Core statements
+(bulk inserts/updates) must call apply_rollup_deltas() itself. Report and
+dashboard views read from the rollups, so their cost depends on the number
+of days rather than the number of orders.
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, func, inspect, insert, select, update, delete
+from sqlalchemy.orm import Session
+from database import db
+from models import Order, OrderDailyRollup, Zone, DeliveryPartner
+
+ROLLUP_KEY_ATTRS = ('created_at', 'zone_id', 'partner_id', 'delivery_status')
+ROLLUP_VALUE_ATTRS = ('total_amount', 'gst_amount')
+
+def rollup_key(created_at, zone_id, partner_id, delivery_status):
+    """Rollup row key for an order's values"""
+    day = (created_at or datetime.utcnow()).date()
+    return (day, zone_id, partner_id or 0, delivery_status or 'pending')
+
+def add_row_delta(deltas, values, sign=1):
+    """Add (sign=1) or remove (sign=-1) one order, given as a dict of column values"""
+    key = rollup_key(values.get('created_at'), values.get('zone_id'),
+                     values.get('partner_id'), values.get('delivery_status'))
+    bucket = deltas[key]
+    bucket[0] += sign
+    bucket[1] += sign * (values.get('total_amount') or 0.0)
+    bucket[2] += sign * (values.get('gst_amount') or 0.0)
+
+def new_deltas():
+    return defaultdict(lambda: [0, 0.0, 0.0])
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+# active_history makes an assignment load the committed value first, so the
+# history below has the old value even when the order was expired (e.g. by a
+# commit) before it was changed
+for _name in ROLLUP_KEY_ATTRS + ROLLUP_VALUE_ATTRS:
+    event.listen(getattr(Order, _name), 'set', _load_old_value, active_history=True)
+
+def _values(order, old=False):
+    state = inspect(order)
+    values = {}
+    for name in ROLLUP_KEY_ATTRS + ROLLUP_VALUE_ATTRS:
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        elif old and history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = getattr(order, name)
+    return values
+
+def _is_changed(order):
+    state = inspect(order)
+    return any(state.attrs[name].history.has_changes() for name in ROLLUP_KEY_ATTRS + ROLLUP_VALUE_ATTRS)
+
+def apply_rollup_deltas(connection, deltas):
+    """Upsert rollup deltas on a connection (inside the caller's transaction)"""
+    params = [
+        {'day': day, 'zone_id': zone_id, 'partner_id': partner_id, 'delivery_status': status,
+         'order_count': count, 'revenue': revenue, 'gst': gst}
+        for (day, zone_id, partner_id, status), (count, revenue, gst) in deltas.items()
+        if count or revenue or gst
+    ]
+    if not params:
+        return
+    table = OrderDailyRollup.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['day', 'zone_id', 'partner_id', 'delivery_status'],
+            set_={
+                'order_count': table.c.order_count + statement.excluded.order_count,
+                'revenue': table.c.revenue + statement.excluded.revenue,
+                'gst': table.c.gst + statement.excluded.gst,
+            })
+        connection.execute(statement, params)
+        return
+    for row in params:
+        result = connection.execute(
+            update(table)
+            .where(table.c.day == row['day'], table.c.zone_id == row['zone_id'],
+                   table.c.partner_id == row['partner_id'],
+                   table.c.delivery_status == row['delivery_status'])
+            .values(order_count=table.c.order_count + row['order_count'],
+                    revenue=table.c.revenue + row['revenue'],
+                    gst=table.c.gst + row['gst']))
+        if result.rowcount == 0:
+            connection.execute(insert(table), row)
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    deltas = new_deltas()
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add_row_delta(deltas, _values(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Order) and _is_changed(obj):
+            add_row_delta(deltas, _values(obj, old=True), -1)
+            add_row_delta(deltas, _values(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            add_row_delta(deltas, _values(obj, old=True), -1)
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
+
+def rebuild_rollups():
+    """Recompute all rollup rows from the orders table (backfill/repair)"""
+    table = OrderDailyRollup.__table__
+    day = func.date(Order.created_at)
+    partner = func.coalesce(Order.partner_id, 0)
+    status = func.coalesce(Order.delivery_status, 'pending')
+    source = (select(day, Order.zone_id, partner, status,
+                     func.count(Order.id),
+                     func.coalesce(func.sum(Order.total_amount), 0.0),
+                     func.coalesce(func.sum(Order.gst_amount), 0.0))
+              .group_by(day, Order.zone_id, partner, status))
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ['day', 'zone_id', 'partner_id', 'delivery_status', 'order_count', 'revenue', 'gst'], source))
+    db.session.commit()
+    return db.session.query(func.count(OrderDailyRollup.id)).scalar()
+
+def status_totals():
+    """Return {status: (order count, revenue)} from the rollups"""
+    rows = db.session.query(
+        OrderDailyRollup.delivery_status,
+        func.sum(OrderDailyRollup.order_count),
+        func.sum(OrderDailyRollup.revenue)
+    ).group_by(OrderDailyRollup.delivery_status).all()
+    return {status: (int(count or 0), float(revenue or 0)) for status, count, revenue in rows if count}
+
+def revenue_by_month():
+    """Return [(YYYY-MM, revenue)] in month order"""
+    months = defaultdict(float)
+    rows = db.session.query(OrderDailyRollup.day, func.sum(OrderDailyRollup.revenue))\
+        .group_by(OrderDailyRollup.day).all()
+    for day, revenue in rows:
+        months[day.strftime('%Y-%m')] += revenue or 0
+    return sorted(months.items())
+
+def top_partners(limit=5):
+    """Return [(partner full name, order count)] for the busiest partners"""
+    total = func.sum(OrderDailyRollup.order_count)
+    return db.session.query(DeliveryPartner.full_name, total)\
+        .join(OrderDailyRollup, OrderDailyRollup.partner_id == DeliveryPartner.id)\
+        .group_by(DeliveryPartner.id, DeliveryPartner.full_name)\
+        .having(total > 0)\
+        .order_by(total.desc())\
+        .limit(limit).all()
+
+def top_zones(limit=5):
+    """Return [(zone name, order count, revenue)] for the highest-revenue zones"""
+    revenue = func.sum(OrderDailyRollup.revenue)
+    return db.session.query(Zone.name, func.sum(OrderDailyRollup.order_count), revenue)\
+        .join(OrderDailyRollup, OrderDailyRollup.zone_id == Zone.id)\
+        .group_by(Zone.id, Zone.name)\
+        .having(func.sum(OrderDailyRollup.order_count) > 0)\
+        .order_by(revenue.desc())\
+        .limit(limit).all()
+
+def report_summary():
+    """Counts and revenue used by the dashboard and report views"""
+    totals = status_totals()
+    return {
+        'total_orders': sum(count for count, _ in totals.values()),
+        'total_revenue': sum(revenue for _, revenue in totals.values()),
+        'status_counts': {status: count for status, (count, _) in totals.items()},
+    }
@@ -1,13 +1,34 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, make_response, send_file, send_from_directory
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, make_response, send_file, send_from_directory, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from app import app, db, mail
-from models import Order, Zone, DeliveryPartner, Admin, GlobalPricingConfig, StateConfig, InvoiceTemplate, PricingSettings, DeliveryEvent, ContactSettings, SupportTicket
-from utils import generate_pdf_bill, calculate_estimated_delivery
+from models import Order, Zone, DeliveryPartner, Admin, GlobalPricingConfig, StateConfig, InvoiceTemplate, PricingSettings, DeliveryEvent, ContactSettings, SupportTicket, Job, PickupRun, Holiday
+from utils import calculate_estimated_delivery
+from invoice_renderer import generate_pdf_bill, generate_pdf_invoice, company_details
+import pdf_cache
+import invoice_bulk
+import jobs
+import pagination
+import work_queue
+import tracking_cache
+import pubsub
+import event_ingest
+import order_import
+import auto_assign
+import pickup_runs
+import business_calendar
 import logging
 from functools import wraps
 import io
-from customer_billing import calculate_customer_bill
+import zlib
+import json
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from customer_billing import calculate_customer_bill, calculate_customer_bills
+from pricing import get_snapshot, quote, quote_batch, bump_pricing_version
+import rollups
+import metrics
 from werkzeug.utils import secure_filename
 import os
 import random, smtplib
@@ -52,6 +73,7 @@ def init_default_data():
         for zone in default_zones:
             db.session.add(zone)
         
+        bump_pricing_version()
         db.session.commit()
         logging.info("Default zones created")
     
@@ -93,6 +115,7 @@ def init_default_data():
         ]
         for setting in default_settings:
             db.session.add(setting)
+        bump_pricing_version()
         logging.info("Default pricing settings created")
     
     # Create default global pricing configuration if it doesn't exist
@@ -112,6 +135,7 @@ def init_default_data():
             volume_rate=50.0
         )
         db.session.add(config)
+        bump_pricing_version()
         logging.info("Default global pricing configuration created")
     
     # Create default contact settings if it doesn't exist
@@ -211,7 +235,7 @@ def place_order():
                 return redirect(url_for('place_order'))
             
             # Calculate estimated delivery
-            estimated_delivery = calculate_estimated_delivery(zone.delivery_days)
+            estimated_delivery = calculate_estimated_delivery(zone.delivery_days, delivery_state)
             
             # Invoice file handling (optional for testing)
             gst_bill = request.files.get('gst_bill')
@@ -239,6 +263,8 @@ def place_order():
                 customer_phone=customer_phone,
                 pickup_address=pickup_address,
                 delivery_address=delivery_address,
+                pickup_district=pickup_district,
+                pickup_state=pickup_state,
                 zone_id=zone_id,
                 package_type=package_type,
                 weight=weight,
@@ -258,13 +284,11 @@ def place_order():
             # Calculate total amount
             order.total_amount = order.calculate_total_amount()
             
-            # Save order
+            # Save order (its id and reference number are assigned when it is flushed,
+            # by pickup_runs.add_order or the commit)
             order.gst_bill_filename = filename
             db.session.add(order)
-            db.session.commit()
-
-            # Update reference number with order id
-            order.reference_number = Order.generate_reference_number(order.id)
+            pickup_runs.add_order(order)
             db.session.commit()
 
             flash(f'Parcel booked! Reference Number: {order.reference_number}', 'success')
@@ -289,7 +313,7 @@ def track_package():
     if request.method == 'POST':
         reference_number = request.form.get('reference_number')
         if reference_number:
-            order = Order.query.filter_by(reference_number=reference_number.upper()).first()
+            order = tracking_cache.get_view(reference_number)
             if not order:
                 flash('Order not found. Please check your reference number.', 'error')
     
@@ -298,7 +322,7 @@ def track_package():
 @app.route('/order/<reference_number>')
 def order_details(reference_number):
     """Show order details and generate PDF"""
-    order = Order.query.filter_by(reference_number=reference_number.upper()).first()
+    order = tracking_cache.get_view(reference_number)
     if not order:
         flash('Order not found', 'error')
         return redirect(url_for('index'))
@@ -322,11 +346,9 @@ def download_bill(reference_number):
         return redirect(url_for('index'))
     
     try:
-        pdf_content = generate_pdf_bill(order)
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=bill_{reference_number}.pdf'
-        return response
+        company = company_details()
+        return pdf_cache.cached_pdf_response('bill', order, lambda o: generate_pdf_bill(o, company),
+                                             f'bill_{reference_number}.pdf', company['fingerprint'])
     except Exception as e:
         logging.error(f"Error generating PDF: {str(e)}")
         flash('Error generating bill. Please try again.', 'error')
@@ -381,28 +403,67 @@ def partner_dashboard():
         flash('Please login to access the dashboard', 'error')
         return redirect(url_for('partner_login'))
     
-    # Get orders with pagination
-    page = request.args.get('page', 1, type=int)
+    # This partner's work queue; ?cursor= continues from a page, ?page= jumps to one
     status_filter = request.args.get('status', 'all')
+    status = None if status_filter == 'all' else status_filter
+    status_counts = work_queue.status_counts(session['partner_id'])
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    size = pagination.page_size(request.args.get('per_page'), work_queue.DEFAULT_PAGE_SIZE)
+    try:
+        items, next_cursor = work_queue.work_queue_page(
+            session['partner_id'], request.args.get('cursor'), size, status, status_counts, page)
+    except ValueError as e:
+        flash(f'Invalid cursor: {str(e)}', 'error')
+        items, next_cursor = [], None
+    # Same interface as the .paginate() result the dashboard templates use
+    orders = pagination.Page(items, page, size, work_queue.queue_total(status_counts, status), next_cursor)
     
-    query = Order.query
-    if status_filter != 'all':
-        query = query.filter_by(delivery_status=status_filter)
-    
-    orders = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
-    
-    # Get remaining orders (not delivered)
-    remaining_orders = Order.query.filter(
-        Order.delivery_status != 'delivered'
-    ).order_by(Order.created_at.desc()).limit(5).all()
+    # Open orders sort first, so the head of the queue is the remaining work
+    remaining_orders = [order for order in orders if order.delivery_status in work_queue.OPEN_STATUSES][:5]
     
     return render_template('partner_dashboard_simple.html', 
                          orders=orders, 
+                         next_cursor=next_cursor,
                          status_filter=status_filter,
+                         status_counts=status_counts,
                          remaining_orders=remaining_orders)
 
+@app.route('/partner/work-queue')
+def partner_work_queue():
+    """Next page of the partner's work queue as JSON (?cursor=<next_cursor>, or ?page=<n>)"""
+    if 'partner_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    status_filter = request.args.get('status', 'all')
+    try:
+        orders, next_cursor = work_queue.work_queue_page(
+            session['partner_id'], request.args.get('cursor'),
+            pagination.page_size(request.args.get('per_page'), work_queue.DEFAULT_PAGE_SIZE),
+            None if status_filter == 'all' else status_filter,
+            page=max(request.args.get('page', 1, type=int) or 1, 1))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid filter or cursor: {str(e)}'}), 400
+    
+    return jsonify({
+        'success': True,
+        'orders': [{
+            'id': order.id,
+            'reference_number': order.reference_number,
+            'customer_name': order.customer_name,
+            'customer_phone': order.customer_phone,
+            'pickup_address': order.pickup_address,
+            'delivery_address': order.delivery_address,
+            'zone': order.zone.name if order.zone else None,
+            'delivery_status': order.delivery_status,
+            'payment_status': order.payment_status,
+            'payment_mode': order.payment_mode,
+            'total_amount': order.total_amount,
+            'estimated_delivery': order.estimated_delivery.isoformat() if order.estimated_delivery else None,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        } for order in orders],
+        'next_cursor': next_cursor
+    })
+
 @app.route('/partner/update-order/<int:order_id>', methods=['POST'])
 def update_order_status(order_id):
     """Update order status"""
@@ -479,6 +540,92 @@ def update_delivery_event():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/partner/delivery-events/batch', methods=['POST'])
+def ingest_delivery_events():
+    """Record a batch of queued device events in one transaction (idempotent per key)"""
+    if 'partner_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+    if not isinstance(events, list) or not events:
+        return jsonify({'success': False, 'error': 'events must be a non-empty list'}), 400
+    if len(events) > event_ingest.MAX_BATCH_EVENTS:
+        return jsonify({'success': False, 'error': f'At most {event_ingest.MAX_BATCH_EVENTS} events per request'}), 400
+    
+    try:
+        results = event_ingest.ingest_events(session['partner_id'], session.get('partner_username', 'partner'), events)
+    except Exception as e:
+        logging.error(f"Delivery event batch failed: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return jsonify({'success': True, 'counts': counts, 'results': results})
+
+@app.route('/partner/pickup-runs')
+def partner_pickup_runs():
+    """Open pickup runs as JSON, oldest first (?district=&state=&cursor=<next_cursor>)"""
+    if 'partner_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    size = pagination.page_size(request.args.get('per_page'), 50)
+    try:
+        after_id = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    runs = pickup_runs.open_runs(request.args.get('district'), request.args.get('state'), after_id, size + 1)
+    
+    return jsonify({
+        'success': True,
+        'runs': [run.to_dict() for run in runs[:size]],
+        'next_cursor': str(runs[size - 1].id) if len(runs) > size else None
+    })
+
+@app.route('/partner/pickup-runs/<int:run_id>')
+def partner_pickup_run(run_id):
+    """One pickup run with its orders"""
+    if 'partner_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    run = PickupRun.query.get(run_id)
+    if not run or (run.status != 'open' and run.partner_id != session['partner_id']):
+        return jsonify({'success': False, 'error': 'Pickup run not found'}), 404
+    
+    orders = run.orders.order_by(Order.created_at, Order.id).all()
+    return jsonify({
+        'success': True,
+        'run': run.to_dict(),
+        'orders': [{
+            'id': order.id,
+            'reference_number': order.reference_number,
+            'pickup_address': order.pickup_address,
+            'delivery_status': order.delivery_status,
+            'partner_id': order.partner_id,
+            'weight': order.weight,
+            'quantity': order.quantity,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        } for order in orders]
+    })
+
+@app.route('/partner/pickup-runs/<int:run_id>/accept', methods=['POST'])
+def accept_pickup_run(run_id):
+    """Take a whole pickup run: its unassigned pending orders are assigned to this partner"""
+    if 'partner_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        run, assigned = pickup_runs.accept_run(run_id, session['partner_id'])
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error accepting pickup run {run_id}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error accepting pickup run'}), 500
+    if run is None:
+        return jsonify({'success': False, 'error': 'Pickup run is no longer open'}), 409
+    
+    return jsonify({'success': True, 'run': run.to_dict(), 'assigned': assigned})
+
 @app.route('/partner/update-payment-status/<int:order_id>', methods=['POST'])
 def update_payment_status(order_id):
     if 'partner_id' not in session:
@@ -501,23 +648,129 @@ def update_payment_status(order_id):
 @app.route('/order/<reference_number>/timeline')
 def order_timeline(reference_number):
     """Get delivery timeline for an order"""
-    order = Order.query.filter_by(reference_number=reference_number.upper()).first()
+    order = tracking_cache.get_view(reference_number)
     if not order:
         return jsonify({'error': 'Order not found'}), 404
     
-    events = order.delivery_events.order_by(DeliveryEvent.timestamp).all()
-    timeline = []
+    return jsonify({'timeline': order.events})
+
+@app.route('/order/<reference_number>/status')
+def order_status(reference_number):
+    """Compact tracking status; the polling fallback for the SSE stream (ETag/304 aware)"""
+    view = tracking_cache.get_view(reference_number)
+    if not view:
+        return jsonify({'error': 'Order not found'}), 404
     
-    for event in events:
-        timeline.append({
-            'type': event.event_type,
-            'description': event.description,
-            'location': event.location,
-            'timestamp': event.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'updated_by': event.updated_by
-        })
+    payload = tracking_cache.status_payload(view)
+    response = jsonify(payload)
+    response.set_etag(payload['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def sse_message(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/order/<reference_number>/events')
+def order_events(reference_number):
+    """Server-Sent Events stream of tracking updates for one order"""
+    view = tracking_cache.get_view(reference_number)
+    if not view:
+        return jsonify({'error': 'Order not found'}), 404
+    
+    heartbeat = app.config['SSE_HEARTBEAT']
+    try:
+        subscription = pubsub.subscribe(view.reference_number)
+    except pubsub.SubscriberLimit:
+        # Too many open streams in this worker: tell the client to poll instead
+        response = jsonify({'error': 'Too many live trackers, poll the status URL instead',
+                            'poll_url': url_for('order_status', reference_number=view.reference_number),
+                            'poll_interval': heartbeat})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(heartbeat)
+        return response
+    # Release the pooled connection; the stream only touches the DB when an update arrives
+    db.session.remove()
     
-    return jsonify({'timeline': timeline})
+    def stream(payload):
+        try:
+            yield f"retry: {heartbeat * 1000}\n"
+            yield sse_message('status', payload)
+            deadline = time.monotonic() + app.config['SSE_MAX_DURATION']
+            while time.monotonic() < deadline:
+                if not subscription.wait(heartbeat):
+                    yield ': heartbeat\n\n'
+                    continue
+                current = tracking_cache.get_view(subscription.key)
+                db.session.remove()
+                if current is None:
+                    yield sse_message('gone', {'reference_number': subscription.key})
+                    return
+                update = tracking_cache.status_payload(current)
+                if update['version'] != payload['version']:
+                    payload = update
+                    yield sse_message('status', payload)
+            # Let the client reconnect so long-lived streams are spread across workers
+            yield sse_message('reconnect', {})
+        finally:
+            pubsub.unsubscribe(subscription)
+    
+    response = Response(stream_with_context(stream(tracking_cache.status_payload(view))),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+MAX_BULK_TRACKING = 1000
+BULK_TRACKING_FIELDS = ['reference_number', 'delivery_status', 'estimated_delivery', 'actual_delivery',
+                        'last_event_type', 'last_event_location', 'last_event_at']
+
+def _iso(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S') if value else None
+
+@app.route('/api/track/bulk', methods=['POST'])
+def track_bulk():
+    """Status, ETA and latest event for many reference numbers (add format=compact for row arrays)"""
+    data = request.get_json(silent=True) or {}
+    refs = data.get('reference_numbers')
+    if not isinstance(refs, list) or not refs or not all(isinstance(ref, str) for ref in refs):
+        return jsonify({'success': False, 'error': 'reference_numbers must be a non-empty list of strings'}), 400
+    refs = list(dict.fromkeys(ref.strip().upper() for ref in refs))
+    if len(refs) > MAX_BULK_TRACKING:
+        return jsonify({'success': False, 'error': f'At most {MAX_BULK_TRACKING} reference numbers per request'}), 400
+    
+    orders = db.session.query(
+        Order.id, Order.reference_number, Order.delivery_status,
+        Order.estimated_delivery, Order.actual_delivery
+    ).filter(Order.reference_number.in_(refs)).all()
+    events = DeliveryEvent.latest_events([order.id for order in orders])
+    
+    by_ref = {}
+    for order in orders:
+        event = events.get(order.id)
+        by_ref[order.reference_number] = [
+            order.reference_number, order.delivery_status,
+            _iso(order.estimated_delivery), _iso(order.actual_delivery),
+            event.event_type if event else None,
+            event.location if event else None,
+            _iso(event.timestamp) if event else None
+        ]
+    not_found = [ref for ref in refs if ref not in by_ref]
+    
+    if (data.get('format') or request.args.get('format')) == 'compact':
+        return jsonify({'success': True, 'fields': BULK_TRACKING_FIELDS,
+                        'rows': [by_ref[ref] for ref in refs if ref in by_ref],
+                        'not_found': not_found})
+    return jsonify({
+        'success': True,
+        'shipments': [dict(zip(BULK_TRACKING_FIELDS, by_ref[ref])) for ref in refs if ref in by_ref],
+        'not_found': not_found
+    })
+
+@app.route('/admin/tracking-cache/stats')
+@admin_required
+def tracking_cache_stats():
+    """Tracking cache hit/miss counters for this worker process"""
+    return jsonify({'success': True, 'stats': tracking_cache.stats()})
 
 # Client routes
 @app.route('/client/login', methods=['GET', 'POST'])
@@ -629,10 +882,11 @@ def admin_logout():
 def admin_dashboard():
     """Admin dashboard"""
     # Get statistics
-    total_orders = Order.query.count()
-    pending_orders = Order.query.filter_by(delivery_status='pending').count()
-    delivered_orders = Order.query.filter_by(delivery_status='delivered').count()
-    in_transit_orders = Order.query.filter_by(delivery_status='in_transit').count()
+    summary = metrics.order_summary()
+    total_orders = summary['total_orders']
+    pending_orders = summary['status_counts'].get('pending', 0)
+    delivered_orders = summary['status_counts'].get('delivered', 0)
+    in_transit_orders = summary['status_counts'].get('in_transit', 0)
     
     # Get recent orders
     recent_orders = Order.query.order_by(Order.created_at.desc()).limit(10).all()
@@ -663,6 +917,7 @@ def admin_pricing_config():
     if not config:
         config = GlobalPricingConfig()
         db.session.add(config)
+        bump_pricing_version()
         db.session.commit()
     if request.method == 'POST':
         config.gst_rate = float(request.form['gst_rate'])
@@ -682,11 +937,37 @@ def admin_pricing_config():
         config.weight_cat_5_15 = float(request.form.get('weight_cat_5_15', 0.0))
         config.weight_cat_15_plus = float(request.form.get('weight_cat_15_plus', 0.0))
         config.cancellation_charge = float(request.form.get('cancellation_charge', 300.0))
+        bump_pricing_version()
         db.session.commit()
         flash('Pricing configuration updated!', 'success')
         return redirect(url_for('admin_pricing_config'))
     return render_template('admin_pricing_config.html', config=config)
 
+@jobs.job_handler('pricing_simulation')
+def pricing_simulation_job(params, out):
+    from pricing_simulator import simulate_revenue
+    report = simulate_revenue(params['overrides'], months=params['months'])
+    out.write(json.dumps(report).encode('utf-8'))
+    return 'pricing_simulation.json', 'application/json'
+
+@app.route('/admin/pricing-config/simulate', methods=['POST'])
+@admin_required
+def simulate_pricing_config():
+    """Queue a preview of the revenue impact of proposed pricing values (poll the job for the report)"""
+    from pricing_simulator import proposed_snapshot, validate_months
+    try:
+        data = request.get_json(silent=True) or request.form.to_dict()
+        months = validate_months(data.pop('months', 6))
+        overrides = data.get('overrides', data)
+        # Reject bad values now rather than in the worker
+        proposed_snapshot(overrides)
+        return enqueue_job_response('pricing_simulation', {'overrides': overrides, 'months': months})
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error simulating pricing: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/admin/save-global-config', methods=['POST'])
 @admin_required
 def save_global_config():
@@ -708,6 +989,7 @@ def save_global_config():
         config.min_weight = float(request.form.get('min_weight', 15.0))
         config.volume_rate = float(request.form.get('volume_rate', 50.0))
         db.session.add(config)
+        bump_pricing_version()
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -725,6 +1007,7 @@ def add_zone():
             delivery_days=int(data['delivery_days'])
         )
         db.session.add(zone)
+        bump_pricing_version()
         db.session.commit()
         
         return jsonify({'success': True})
@@ -741,6 +1024,7 @@ def update_zone():
         if zone:
             zone.base_rate = float(data['base_rate'])
             zone.delivery_days = int(data['delivery_days'])
+            bump_pricing_version()
             db.session.commit()
             return jsonify({'success': True})
         else:
@@ -761,6 +1045,7 @@ def delete_zone():
                 return jsonify({'success': False, 'error': 'Cannot delete zone with existing orders'})
             
             db.session.delete(zone)
+            bump_pricing_version()
             db.session.commit()
             return jsonify({'success': True})
         else:
@@ -768,6 +1053,62 @@ def delete_zone():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/admin/holidays')
+@admin_required
+def admin_holidays():
+    """Holiday calendar as JSON (?year=&state=)"""
+    query = Holiday.query
+    year = request.args.get('year', type=int)
+    if year:
+        query = query.filter(Holiday.date.between(date(year, 1, 1), date(year, 12, 31)))
+    if request.args.get('state'):
+        query = query.filter(db.or_(Holiday.state.is_(None), db.func.lower(Holiday.state) == request.args['state'].strip().lower()))
+    return jsonify({'holidays': [holiday.to_dict() for holiday in query.order_by(Holiday.date, Holiday.state)]})
+
+@app.route('/admin/add-holiday', methods=['POST'])
+@admin_required
+def add_holiday():
+    """Add a national holiday, or a state holiday when state is given"""
+    try:
+        data = request.get_json()
+        holiday = Holiday(
+            date=date.fromisoformat(data['date']),
+            name=data['name'],
+            state=(data.get('state') or '').strip() or None
+        )
+        existing = Holiday.query.filter(Holiday.date == holiday.date)
+        if holiday.state:
+            existing = existing.filter(db.func.lower(Holiday.state) == holiday.state.lower())
+        else:
+            existing = existing.filter(Holiday.state.is_(None))
+        if existing.first():
+            return jsonify({'success': False, 'error': 'Holiday already exists for that date'})
+        db.session.add(holiday)
+        business_calendar.bump_calendar_version()
+        db.session.commit()
+        
+        return jsonify({'success': True, 'holiday': holiday.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/admin/delete-holiday', methods=['POST'])
+@admin_required
+def delete_holiday():
+    """Delete holiday"""
+    try:
+        data = request.get_json()
+        holiday = Holiday.query.get(data['holiday_id'])
+        if not holiday:
+            return jsonify({'success': False, 'error': 'Holiday not found'})
+        
+        db.session.delete(holiday)
+        business_calendar.bump_calendar_version()
+        db.session.commit()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/calculate-price', methods=['POST'])
 def calculate_price():
     """Calculate price via API"""
@@ -783,40 +1124,28 @@ def calculate_price():
         insurance_required = data.get('insurance_required', False)
         insurance_value = float(data.get('insurance_value', 0))
         
-        zone = Zone.query.get(zone_id)
+        snapshot = get_snapshot()
+        zone = snapshot.zone(zone_id)
         if not zone:
             return jsonify({'error': 'Invalid zone'}), 400
         
-        # Create temporary order to calculate price
-        temp_order = Order(
-            zone_id=zone_id,
-            weight=weight,
-            length=length,
-            width=width,
-            height=height,
-            quantity=quantity,
-            payment_mode=payment_mode,
-            insurance_required=insurance_required,
-            insurance_value=insurance_value
-        )
-        temp_order.zone = zone
-        
-        total_amount = temp_order.calculate_total_amount()
-        estimated_delivery = calculate_estimated_delivery(zone.delivery_days)
-        
-        # Calculate volume
-        volume = (length * width * height) / 1000000  # Convert cm³ to m³
+        breakdown = quote(snapshot, zone, weight, length, width, height,
+                          quantity=quantity,
+                          payment_mode=payment_mode,
+                          insurance_required=insurance_required,
+                          insurance_value=insurance_value)
+        estimated_delivery = calculate_estimated_delivery(zone.delivery_days, data.get('delivery_state'))
         
         return jsonify({
-            'total_amount': total_amount,
+            'total_amount': breakdown['total_amount'],
             'estimated_delivery': estimated_delivery.strftime('%Y-%m-%d %H:%M:%S'),
             'delivery_days': zone.delivery_days,
-            'volume': volume,
+            'volume': breakdown['volume'],
             'breakdown': {
-                'base_cost': zone.base_rate * weight,
-                'volume_cost': volume * 50,  # volume rate
-                'insurance_cost': temp_order.insurance_premium,
-                'payment_fee': total_amount - temp_order.insurance_premium - (zone.base_rate * weight) - (volume * 50)
+                'base_cost': breakdown['weight_cost'],
+                'volume_cost': breakdown['volume_cost'],
+                'insurance_cost': breakdown['insurance_premium'],
+                'payment_fee': breakdown['payment_fee']
             }
         })
         
@@ -824,26 +1153,98 @@ def calculate_price():
         logging.error(f"Error calculating price: {str(e)}")
         return jsonify({'error': 'Error calculating price'}), 500
 
-@app.route('/admin/invoice-management')
-@admin_required
-def admin_invoice_management():
-    """Admin invoice management page"""
-    # Get all orders with optional filters
-    status_filter = request.args.get('status')
-    invoice_filter = request.args.get('invoice')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
+MAX_BATCH_QUOTES = 10000
+
+@app.route('/api/calculate-price/batch', methods=['POST'])
+def calculate_price_batch():
+    """Price an array of shipments in one pass"""
+    data = request.get_json(silent=True) or {}
+    shipments = data.get('shipments')
+    if not isinstance(shipments, list) or not shipments:
+        return jsonify({'error': 'shipments must be a non-empty list'}), 400
+    if len(shipments) > MAX_BATCH_QUOTES:
+        return jsonify({'error': f'At most {MAX_BATCH_QUOTES} shipments per request'}), 400
+    
+    try:
+        result = quote_batch(get_snapshot(), shipments)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # All ETAs in one vectorized calendar lookup (per delivery state)
+    etas = iter(business_calendar.estimated_deliveries(
+        result['delivery_days'][result['zone_found']],
+        [shipment.get('delivery_state') for shipment, found in zip(shipments, result['zone_found'].tolist()) if found]))
+    
+    columns = [result[key].tolist() for key in (
+        'zone_found', 'delivery_days', 'total_unrounded', 'volume', 'weight_cost',
+        'volume_cost', 'insurance_premium', 'payment_fee')]
+    quotes = []
+    for found, days, total, volume, base_cost, volume_cost, insurance_cost, payment_fee in zip(*columns):
+        if not found:
+            quotes.append({'error': 'Invalid zone'})
+            continue
+        quotes.append({
+            'total_amount': round(total, 2),
+            'estimated_delivery': next(etas).strftime('%Y-%m-%d %H:%M:%S'),
+            'delivery_days': days,
+            'volume': volume,
+            'breakdown': {
+                'base_cost': base_cost,
+                'volume_cost': volume_cost,
+                'insurance_cost': insurance_cost,
+                'payment_fee': payment_fee
+            }
+        })
     
-    query = Order.query
+    return jsonify({'quotes': quotes})
+
+def wants_async():
+    """True when the caller asked for the work to be queued (?async=1)"""
+    return request.values.get('async', '').lower() in ('1', 'true', 'yes')
+
+def enqueue_job_response(kind, params=None):
+    """Queue a background job and answer 202 with its status URL"""
+    job = jobs.enqueue(kind, params, created_by=current_user.id)
+    return jsonify({'success': True, 'job_id': job.id,
+                    'status_url': url_for('job_status', job_id=job.id)}), 202
+
+@app.route('/admin/jobs/<int:job_id>')
+@admin_required
+def job_status(job_id):
+    """Poll a background job"""
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    result = job.to_dict()
+    if job.status == 'done':
+        result['download_url'] = url_for('job_download', job_id=job.id)
+    return jsonify({'success': True, 'job': result})
+
+@app.route('/admin/jobs/<int:job_id>/download')
+@admin_required
+def job_download(job_id):
+    """Download the artifact of a finished job"""
+    job = Job.query.get(job_id)
+    if not job or job.status != 'done' or not job.artifact_path or not os.path.exists(job.artifact_path):
+        return jsonify({'success': False, 'error': 'Job result not available'}), 404
+    return send_file(job.artifact_path, mimetype=job.mimetype, as_attachment=True,
+                     download_name=job.artifact_name)
+
+def filter_orders(query, args):
+    """Apply the invoice-management filters (status, invoice, date range) to a query or select"""
+    status_filter = args.get('status')
+    invoice_filter = args.get('invoice')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
     
     if status_filter:
-        query = query.filter_by(delivery_status=status_filter)
+        query = query.filter(Order.delivery_status == status_filter)
     
     if invoice_filter:
         if invoice_filter == 'generated':
-            query = query.filter_by(invoice_generated=True)
+            query = query.filter(Order.invoice_generated == True)
         elif invoice_filter == 'pending':
-            query = query.filter_by(invoice_generated=False)
+            query = query.filter(Order.invoice_generated == False)
     
     if date_from:
         query = query.filter(Order.created_at >= datetime.strptime(date_from, '%Y-%m-%d'))
@@ -851,9 +1252,52 @@ def admin_invoice_management():
     if date_to:
         query = query.filter(Order.created_at <= datetime.strptime(date_to, '%Y-%m-%d'))
     
-    orders = query.order_by(Order.created_at.desc()).all()
+    return query
+
+@app.route('/admin/invoice-management')
+@admin_required
+def admin_invoice_management():
+    """Admin invoice management page"""
+    # First page only; the page fetches the rest from admin_invoice_orders as the user scrolls
+    try:
+        orders, next_cursor = invoice_orders_page(request.args)
+    except ValueError as e:
+        flash(f'Invalid filter: {str(e)}', 'error')
+        orders, next_cursor = [], None
+    
+    return render_template('admin_invoice_management.html', orders=orders, next_cursor=next_cursor)
+
+def invoice_orders_page(args):
+    """One keyset page of the filtered invoice-management orders"""
+    query = filter_orders(Order.query.options(joinedload(Order.zone)), args)
+    return pagination.newest_first_page(query, args.get('cursor'), pagination.page_size(args.get('per_page')))
+
+@app.route('/admin/invoice-management/orders')
+@admin_required
+def admin_invoice_orders():
+    """Next page of invoice-management orders as JSON (?cursor=<next_cursor>)"""
+    try:
+        orders, next_cursor = invoice_orders_page(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid filter or cursor: {str(e)}'}), 400
     
-    return render_template('admin_invoice_management.html', orders=orders)
+    return jsonify({
+        'success': True,
+        'orders': [{
+            'id': order.id,
+            'reference_number': order.reference_number,
+            'customer_name': order.customer_name,
+            'customer_email': order.customer_email,
+            'zone': order.zone.name if order.zone else None,
+            'total_amount': order.total_amount,
+            'delivery_status': order.delivery_status,
+            'payment_status': order.payment_status,
+            'invoice_generated': order.invoice_generated,
+            'invoice_number': order.invoice_number,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        } for order in orders],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/admin/generate-invoice', methods=['POST'])
 @admin_required
@@ -878,6 +1322,64 @@ def generate_invoice():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@jobs.job_handler('invoice_zip')
+def invoice_zip_job(params, out):
+    statement = filter_orders(select(Order.id), params)
+    order_ids = db.session.execute(statement.order_by(Order.created_at, Order.id)).scalars().all()
+    if not order_ids:
+        raise ValueError('No orders match the filters')
+    invoice_bulk.assign_invoice_numbers(order_ids)
+    for chunk in invoice_bulk.stream_invoice_zip(order_ids, company_details(), app.config['INVOICE_RENDER_WORKERS']):
+        out.write(chunk)
+    return f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip", 'application/zip'
+
+@app.route('/admin/generate-invoices/bulk', methods=['POST'])
+@admin_required
+def generate_invoices_bulk():
+    """Number all filtered orders and stream their invoices as a ZIP"""
+    try:
+        statement = filter_orders(select(Order.id), request.values)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid filter: {str(e)}'}), 400
+    
+    if wants_async():
+        return enqueue_job_response('invoice_zip', {key: request.values.get(key)
+                                                    for key in ('status', 'invoice', 'date_from', 'date_to')
+                                                    if request.values.get(key)})
+    
+    order_ids = db.session.execute(statement.order_by(Order.created_at, Order.id)).scalars().all()
+    if not order_ids:
+        return jsonify({'success': False, 'error': 'No orders match the filters'}), 404
+    if len(order_ids) > app.config['BULK_INVOICE_LIMIT']:
+        return jsonify({'success': False,
+                        'error': f"Too many orders ({len(order_ids)}); narrow the filters to at most {app.config['BULK_INVOICE_LIMIT']}"}), 400
+    
+    try:
+        invoice_bulk.assign_invoice_numbers(order_ids)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    company = company_details()
+    filename = f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    # Rendered in this thread: forking a threaded web worker can leave the child
+    # holding a lock another thread had. The invoice_zip job uses the process pool.
+    response = Response(
+        stream_with_context(invoice_bulk.stream_invoice_zip(order_ids, company, workers=0)),
+        mimetype='application/zip'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Invoice-Count'] = str(len(order_ids))
+    
+    return response
+
+@jobs.job_handler('invoice_pdf')
+def invoice_pdf_job(params, out):
+    order = Order.query.get(params['order_id'])
+    if not order:
+        raise ValueError('Order not found')
+    out.write(generate_pdf_invoice(order))
+    return f'invoice_{order.reference_number}.pdf', 'application/pdf'
+
 @app.route('/admin/download-invoice/<int:order_id>')
 @admin_required
 def download_invoice(order_id):
@@ -888,173 +1390,117 @@ def download_invoice(order_id):
             flash('Order not found', 'error')
             return redirect(url_for('admin_invoice_management'))
         
-        # Generate PDF invoice
-        from reportlab.lib.pagesizes import letter
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        from io import BytesIO
+        if wants_async():
+            return enqueue_job_response('invoice_pdf', {'order_id': order.id})
         
-        # Create PDF buffer
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        story.append(Paragraph("INVOICE", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Company Info
-        company_info = [
-            ["GotoFast Logistics", ""],
-            ["123 Business Street", ""],
-            ["City, State 12345", ""],
-            ["Phone: +1 (555) 123-4567", ""],
-            ["Email: info@gotofast.com", ""]
-        ]
-        
-        company_table = Table(company_info, colWidths=[4*inch, 2*inch])
-        company_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(company_table)
-        story.append(Spacer(1, 20))
-        
-        # Invoice Details
-        invoice_data = [
-            ["Invoice Number:", order.invoice_number or f"INV-{order.reference_number}"],
-            ["Date:", order.created_at.strftime('%Y-%m-%d')],
-            ["Reference:", order.reference_number],
-            ["Customer:", order.customer_name],
-            ["Email:", order.customer_email],
-            ["Phone:", order.customer_phone]
-        ]
-        
-        invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-        invoice_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(invoice_table)
-        story.append(Spacer(1, 20))
-        
-        # Package Details
-        package_data = [
-            ["Pickup Address:", order.pickup_address],
-            ["Delivery Address:", order.delivery_address],
-            ["Zone:", order.zone.name if order.zone else "N/A"],
-            ["Weight:", f"{order.weight} kg"],
-            ["Dimensions:", f"{order.length}×{order.width}×{order.height} cm"],
-            ["Quantity:", str(order.quantity)]
-        ]
-        
-        package_table = Table(package_data, colWidths=[2*inch, 4*inch])
-        package_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(package_table)
-        story.append(Spacer(1, 20))
-        
-        # Pricing Breakdown
-        pricing_data = [
-            ["Description", "Amount"],
-            ["Base Amount", f"${order.base_amount:.2f}"],
-            ["Pickup Charge", f"${order.pickup_charge:.2f}"],
-            ["Extra Weight Charge", f"${order.extra_weight_charge:.2f}"],
-            ["Payment Fee", f"${order.payment_fee:.2f}"],
-            ["Subtotal", f"${order.subtotal:.2f}"],
-            ["GST (18%)", f"${order.gst_amount:.2f}"],
-            ["Total Amount", f"${order.total_amount:.2f}"]
-        ]
-        
-        pricing_table = Table(pricing_data, colWidths=[3*inch, 1.5*inch])
-        pricing_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ]))
-        story.append(pricing_table)
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Return PDF as response
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=invoice_{order.reference_number}.pdf'
-        
-        return response
+        company = company_details()
+        return pdf_cache.cached_pdf_response('invoice', order, lambda o: generate_pdf_invoice(o, company),
+                                             f'invoice_{order.reference_number}.pdf', company['fingerprint'])
         
     except Exception as e:
         flash(f'Error generating invoice: {str(e)}', 'error')
         return redirect(url_for('admin_invoice_management'))
 
-@app.route('/admin/export-data')
-@admin_required
-def export_data():
-    """Export order data in CSV format"""
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_HEADER = [
+    'Reference Number', 'Customer Name', 'Customer Email', 'Customer Phone',
+    'Pickup Address', 'Delivery Address', 'Zone', 'Weight (kg)', 
+    'Dimensions (L×W×H)', 'Total Amount', 'Payment Mode', 'Payment Status',
+    'Delivery Status', 'Invoice Generated', 'Created Date'
+]
+
+def iter_export_rows(args):
+    """Yield CSV rows for the filtered orders, fetched in server-side batches with the zone joined"""
+    statement = filter_orders(select(
+        Order.reference_number, Order.customer_name, Order.customer_email,
+        Order.customer_phone, Order.pickup_address, Order.delivery_address,
+        Zone.name, Order.weight, Order.length, Order.width, Order.height,
+        Order.total_amount, Order.payment_mode, Order.payment_status,
+        Order.delivery_status, Order.invoice_generated, Order.created_at
+    ).outerjoin(Zone, Order.zone_id == Zone.id), args)
+    statement = statement.order_by(Order.created_at.desc()).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    
+    for partition in db.session.execute(statement).partitions():
+        yield [[
+            row.reference_number, row.customer_name, row.customer_email,
+            row.customer_phone, row.pickup_address, row.delivery_address,
+            row.name or '', row.weight,
+            f"{row.length}×{row.width}×{row.height}", row.total_amount,
+            row.payment_mode, row.payment_status, row.delivery_status,
+            'Yes' if row.invoice_generated else 'No',
+            row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else ''
+        ] for row in partition]
+
+def stream_csv(header, batches, compress=False):
+    """Encode batches of CSV rows chunk by chunk, optionally as a gzip stream"""
     import csv
-    import io
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=31) if compress else None
     
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        return compressor.compress(data) if compressor else data
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    writer.writerow(header)
+    yield drain()
+    for rows in batches:
+        writer.writerows(rows)
+        chunk = drain()
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+@jobs.job_handler('export_csv')
+def export_csv_job(params, out):
+    compress = params.pop('gzip', False)
+    for chunk in stream_csv(EXPORT_HEADER, iter_export_rows(params), compress):
+        out.write(chunk)
+    if compress:
+        return 'orders_export.csv.gz', 'application/gzip'
+    return 'orders_export.csv', 'text/csv'
+
+@app.route('/admin/export-data')
+@admin_required
+def export_data():
+    """Export order data in CSV format, streamed (add gzip=1 to compress, async=1 to queue)"""
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    # Parse filters up front so bad input fails before the response starts
+    filter_orders(select(Order.id), request.args)
     
-    # Write header
-    writer.writerow([
-        'Reference Number', 'Customer Name', 'Customer Email', 'Customer Phone',
-        'Pickup Address', 'Delivery Address', 'Zone', 'Weight (kg)', 
-        'Dimensions (L×W×H)', 'Total Amount', 'Payment Mode', 'Payment Status',
-        'Delivery Status', 'Invoice Generated', 'Created Date'
-    ])
+    if wants_async():
+        params = {key: request.args.get(key) for key in ('status', 'invoice', 'date_from', 'date_to')
+                  if request.args.get(key)}
+        params['gzip'] = compress
+        return enqueue_job_response('export_csv', params)
     
-    # Write data
-    for order in orders:
-        writer.writerow([
-            order.reference_number, order.customer_name, order.customer_email,
-            order.customer_phone, order.pickup_address, order.delivery_address,
-            order.zone.name if order.zone else '', order.weight,
-            f"{order.length}×{order.width}×{order.height}", order.total_amount,
-            order.payment_mode, order.payment_status, order.delivery_status,
-            'Yes' if getattr(order, 'invoice_generated', False) else 'No',
-            order.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = 'attachment; filename=orders_export.csv'
+    filename = 'orders_export.csv.gz' if compress else 'orders_export.csv'
+    response = Response(
+        stream_with_context(stream_csv(EXPORT_HEADER, iter_export_rows(request.args.to_dict()), compress)),
+        mimetype='application/gzip' if compress else 'text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
     
     return response
 
+@app.route('/admin/export-data/columnar', methods=['POST'])
+@admin_required
+def export_columnar_data():
+    """Write orders and delivery events as month-partitioned Parquet (incremental unless full=1)"""
+    from columnar_export import export_all
+    try:
+        incremental = request.args.get('full', '').lower() not in ('1', 'true', 'yes')
+        rows = export_all(app.config['COLUMNAR_EXPORT_DIR'], incremental=incremental)
+        return jsonify({'success': True, 'incremental': incremental, 'rows': rows})
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in columnar export: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/admin/partner-config')
 @admin_required
 def admin_partner_config():
@@ -1118,6 +1564,62 @@ def assign_order_to_partner():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/admin/import-orders', methods=['POST'])
+@admin_required
+def import_orders():
+    """Book every order in an uploaded CSV/JSON manifest (or a JSON body)"""
+    manifest = request.files.get('manifest')
+    try:
+        if manifest and manifest.filename:
+            rows = order_import.parse_manifest(manifest.read(), manifest.filename)
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                return jsonify({'success': False, 'error': 'Upload a manifest file or send a JSON list of orders'}), 400
+            rows = order_import.parse_manifest(json.dumps(data))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if not rows:
+        return jsonify({'success': False, 'error': 'The manifest has no orders'}), 400
+    
+    try:
+        result = order_import.import_orders(rows)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error importing orders: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error importing orders'}), 500
+    
+    return jsonify({'success': result['imported'] > 0, **result})
+
+@app.route('/admin/auto-assign', methods=['POST'])
+@admin_required
+def auto_assign_orders():
+    """Assign every open unassigned order to an active partner (dry_run=1 only previews)"""
+    dry_run = request.values.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        plan = auto_assign.plan_assignments() if dry_run else auto_assign.assign_orders()
+    except auto_assign.AssignmentConflict as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        logging.error(f"Error auto-assigning orders: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error assigning orders'}), 500
+    
+    return jsonify({'success': True, 'dry_run': dry_run, 'assigned': len(plan['assignments']), **plan})
+
+@app.route('/admin/pickup-runs/cluster', methods=['POST'])
+@admin_required
+def cluster_pickup_runs():
+    """Place pending orders that are not in a pickup run yet (new orders are placed on booking)"""
+    try:
+        placed = pickup_runs.cluster_pending()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error clustering pickup runs: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error clustering pickup runs'}), 500
+    
+    return jsonify({'success': True, 'placed': placed})
+
 @app.route('/admin/unassigned-orders')
 @admin_required
 def get_unassigned_orders():
@@ -1246,10 +1748,11 @@ def admin_support_management():
     tickets = query.order_by(SupportTicket.created_at.desc()).all()
     
     # Get statistics
-    total_tickets = SupportTicket.query.count()
-    open_tickets = SupportTicket.query.filter_by(status='open').count()
-    urgent_tickets = SupportTicket.query.filter_by(priority='urgent').count()
-    resolved_tickets = SupportTicket.query.filter_by(status='resolved').count()
+    ticket_counts = metrics.ticket_counts()
+    total_tickets = ticket_counts['total_tickets']
+    open_tickets = ticket_counts['open_tickets']
+    urgent_tickets = ticket_counts['urgent_tickets']
+    resolved_tickets = ticket_counts['resolved_tickets']
     
     return render_template('admin_support_management.html', 
                          tickets=tickets,
@@ -1339,45 +1842,32 @@ def internal_error(error):
 @app.route('/admin/report')
 @admin_required
 def admin_report():
-    from sqlalchemy import func
-    # Total orders
-    total_orders = Order.query.count()
-    delivered_orders = Order.query.filter_by(delivery_status='delivered').count()
-    pending_orders = Order.query.filter_by(delivery_status='pending').count()
-    in_transit_orders = Order.query.filter_by(delivery_status='in_transit').count()
-    cancelled_orders = Order.query.filter_by(delivery_status='cancelled').count()
+    # Totals and orders by status (from the daily rollups)
+    summary = metrics.order_summary()
+    status_counts = summary['status_counts']
+    total_orders = summary['total_orders']
+    delivered_orders = status_counts.get('delivered', 0)
+    pending_orders = status_counts.get('pending', 0)
+    in_transit_orders = status_counts.get('in_transit', 0)
+    cancelled_orders = status_counts.get('cancelled', 0)
 
     # Total revenue
-    total_revenue = db.session.query(func.sum(Order.total_amount)).scalar() or 0
+    total_revenue = summary['total_revenue']
 
-    # Revenue by month (last 12 months)
-    revenue_by_month = db.session.query(
-        func.strftime('%Y-%m', Order.created_at).label('month'),
-        func.sum(Order.total_amount)
-    ).group_by('month').order_by('month').all()
+    # Revenue by month
+    revenue_by_month = rollups.revenue_by_month()
     months = [row[0] for row in revenue_by_month]
     revenues = [float(row[1]) for row in revenue_by_month]
 
     # Orders by status
-    status_counts = db.session.query(Order.delivery_status, func.count(Order.id)).group_by(Order.delivery_status).all()
-    status_labels = [row[0].title() for row in status_counts]
-    status_values = [row[1] for row in status_counts]
+    status_labels = [status.title() for status in status_counts]
+    status_values = list(status_counts.values())
 
     # Top delivery partners
-    top_partners = db.session.query(
-        DeliveryPartner.full_name, func.count(Order.id)
-    ).join(Order, Order.partner_id == DeliveryPartner.id)\
-    .group_by(DeliveryPartner.id)\
-    .order_by(func.count(Order.id).desc())\
-    .limit(5).all()
+    top_partners = rollups.top_partners()
 
     # Top zones
-    top_zones = db.session.query(
-        Zone.name, func.count(Order.id), func.sum(Order.total_amount)
-    ).join(Order, Order.zone_id == Zone.id)\
-    .group_by(Zone.id)\
-    .order_by(func.sum(Order.total_amount).desc())\
-    .limit(5).all()
+    top_zones = rollups.top_zones()
 
     return render_template(
         'admin_report.html',
@@ -1395,33 +1885,22 @@ def admin_report():
         top_zones=top_zones
     )
 
-@app.route('/admin/report/download/pdf')
-@admin_required
-def download_report_pdf():
+def build_report_pdf():
+    """Overall report as PDF bytes"""
     from fpdf import FPDF
     from datetime import datetime
-    # Gather stats (reuse logic from admin_report)
-    from sqlalchemy import func
-    total_orders = Order.query.count()
-    delivered_orders = Order.query.filter_by(delivery_status='delivered').count()
-    pending_orders = Order.query.filter_by(delivery_status='pending').count()
-    in_transit_orders = Order.query.filter_by(delivery_status='in_transit').count()
-    cancelled_orders = Order.query.filter_by(delivery_status='cancelled').count()
-    total_revenue = db.session.query(func.sum(Order.total_amount)).scalar() or 0
+    # Gather stats (same rollup queries as admin_report)
+    summary = metrics.order_summary()
+    total_orders = summary['total_orders']
+    delivered_orders = summary['status_counts'].get('delivered', 0)
+    pending_orders = summary['status_counts'].get('pending', 0)
+    in_transit_orders = summary['status_counts'].get('in_transit', 0)
+    cancelled_orders = summary['status_counts'].get('cancelled', 0)
+    total_revenue = summary['total_revenue']
     # Top partners
-    top_partners = db.session.query(
-        DeliveryPartner.full_name, func.count(Order.id)
-    ).join(Order, Order.partner_id == DeliveryPartner.id)\
-    .group_by(DeliveryPartner.id)\
-    .order_by(func.count(Order.id).desc())\
-    .limit(5).all()
+    top_partners = rollups.top_partners()
     # Top zones
-    top_zones = db.session.query(
-        Zone.name, func.count(Order.id), func.sum(Order.total_amount)
-    ).join(Order, Order.zone_id == Zone.id)\
-    .group_by(Zone.id)\
-    .order_by(func.sum(Order.total_amount).desc())\
-    .limit(5).all()
+    top_zones = rollups.top_zones()
     # PDF generation
     pdf = FPDF()
     pdf.add_page()
@@ -1449,17 +1928,25 @@ def download_report_pdf():
     for zone, count, revenue in top_zones:
         pdf.cell(0, 10, f'{zone}: {count} orders, INR {revenue or 0:.2f}', ln=1)
     # Output
-    pdf_bytes = pdf.output(dest='S').encode('latin1')
-    pdf_output = io.BytesIO(pdf_bytes)
-    pdf_output.seek(0)
-    return send_file(pdf_output, as_attachment=True, download_name='overall_report.pdf', mimetype='application/pdf')
+    return pdf.output(dest='S').encode('latin1')
 
-@app.route('/admin/report/download/csv')
+@jobs.job_handler('report_pdf')
+def report_pdf_job(params, out):
+    out.write(build_report_pdf())
+    return 'overall_report.pdf', 'application/pdf'
+
+@app.route('/admin/report/download/pdf')
 @admin_required
-def download_report_csv():
+def download_report_pdf():
+    if wants_async():
+        return enqueue_job_response('report_pdf')
+    pdf_output = io.BytesIO(build_report_pdf())
+    return send_file(pdf_output, as_attachment=True, download_name='overall_report.pdf', mimetype='application/pdf')
+
+def build_report_csv():
+    """Overall report as CSV text"""
     import csv
     from datetime import datetime
-    from sqlalchemy import func
     output = io.StringIO()
     writer = csv.writer(output)
     # Header
@@ -1467,12 +1954,13 @@ def download_report_csv():
     writer.writerow([f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M") }'])
     writer.writerow([])
     # Stats
-    total_orders = Order.query.count()
-    delivered_orders = Order.query.filter_by(delivery_status='delivered').count()
-    pending_orders = Order.query.filter_by(delivery_status='pending').count()
-    in_transit_orders = Order.query.filter_by(delivery_status='in_transit').count()
-    cancelled_orders = Order.query.filter_by(delivery_status='cancelled').count()
-    total_revenue = db.session.query(func.sum(Order.total_amount)).scalar() or 0
+    summary = metrics.order_summary()
+    total_orders = summary['total_orders']
+    delivered_orders = summary['status_counts'].get('delivered', 0)
+    pending_orders = summary['status_counts'].get('pending', 0)
+    in_transit_orders = summary['status_counts'].get('in_transit', 0)
+    cancelled_orders = summary['status_counts'].get('cancelled', 0)
+    total_revenue = summary['total_revenue']
     writer.writerow(['Total Orders', total_orders])
     writer.writerow(['Delivered', delivered_orders])
     writer.writerow(['Pending', pending_orders])
@@ -1483,28 +1971,29 @@ def download_report_csv():
     # Top partners
     writer.writerow(['Top Delivery Partners'])
     writer.writerow(['Partner', 'Orders Delivered'])
-    top_partners = db.session.query(
-        DeliveryPartner.full_name, func.count(Order.id)
-    ).join(Order, Order.partner_id == DeliveryPartner.id)\
-    .group_by(DeliveryPartner.id)\
-    .order_by(func.count(Order.id).desc())\
-    .limit(5).all()
+    top_partners = rollups.top_partners()
     for partner, count in top_partners:
         writer.writerow([partner, count])
     writer.writerow([])
     # Top zones
     writer.writerow(['Top Zones'])
     writer.writerow(['Zone', 'Orders', 'Revenue (INR)'])
-    top_zones = db.session.query(
-        Zone.name, func.count(Order.id), func.sum(Order.total_amount)
-    ).join(Order, Order.zone_id == Zone.id)\
-    .group_by(Zone.id)\
-    .order_by(func.sum(Order.total_amount).desc())\
-    .limit(5).all()
+    top_zones = rollups.top_zones()
     for zone, count, revenue in top_zones:
         writer.writerow([zone, count, f'{revenue or 0:.2f}'])
-    # Output
-    response = make_response(output.getvalue())
+    return output.getvalue()
+
+@jobs.job_handler('report_csv')
+def report_csv_job(params, out):
+    out.write(build_report_csv().encode('utf-8'))
+    return 'overall_report.csv', 'text/csv'
+
+@app.route('/admin/report/download/csv')
+@admin_required
+def download_report_csv():
+    if wants_async():
+        return enqueue_job_response('report_csv')
+    response = make_response(build_report_csv())
     response.headers['Content-Disposition'] = 'attachment; filename=overall_report.csv'
     response.headers['Content-Type'] = 'text/csv'
     return response
@@ -1519,6 +2008,19 @@ def api_customer_calculate_bill():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/customer-calculate-bill/batch', methods=['POST'])
+def api_customer_calculate_bills():
+    """Columnar customer billing for a whole manifest ({"columns": {...}} or {"rows": [...]})"""
+    try:
+        data = request.get_json()
+        batch = data.get('columns') or data.get('rows')
+        if not batch:
+            return jsonify({'success': False, 'error': 'columns or rows required'}), 400
+        invoice = calculate_customer_bills(batch)
+        return jsonify({'success': True, 'invoice': {name: values.tolist() for name, values in invoice.items()}})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @app.route('/uploaded-invoice/<filename>')
 def uploaded_invoice(filename):
     """Serve the uploaded invoice PDF from the uploaded_gst_bills folder"""
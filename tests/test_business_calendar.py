@@ -0,0 +1,96 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import business_calendar
+import config_version
+import pricing
+from business_calendar import BusinessCalendar
+from database import db
+from models import Holiday
+
+START = date(2026, 1, 5)  # a Monday
+HOLIDAYS = [date(2026, 1, 26), date(2026, 1, 27), date(2026, 3, 6), date(2026, 8, 15)]  # 15 Aug is a Saturday
+
+
+def _walk(day, business_days, holidays):
+    """Reference: step day by day, skipping weekends and holidays"""
+    while business_days > 0:
+        day += timedelta(days=1)
+        if day.weekday() < 5 and day not in holidays:
+            business_days -= 1
+    return day
+
+
+@pytest.fixture
+def calendar():
+    return BusinessCalendar(START, HOLIDAYS)
+
+
+@pytest.mark.parametrize('day, business_days, expected', [
+    (date(2026, 1, 9), 1, date(2026, 1, 12)),   # Friday -> Monday
+    (date(2026, 1, 10), 1, date(2026, 1, 12)),  # Saturday -> Monday
+    (date(2026, 1, 11), 0, date(2026, 1, 11)),  # zero days keeps the day, even a Sunday
+    (date(2026, 1, 23), 1, date(2026, 1, 28)),  # Friday, then a weekend and two holidays
+    (date(2026, 1, 26), 1, date(2026, 1, 28)),  # starting on a holiday
+    (date(2026, 3, 5), 1, date(2026, 3, 9)),    # holiday Friday and the weekend
+    (date(2026, 8, 14), 1, date(2026, 8, 17)),  # a holiday on a Saturday costs nothing extra
+    (date(2026, 1, 5), 20, date(2026, 2, 4)),
+])
+def test_add_skips_weekends_and_holidays(calendar, day, business_days, expected):
+    assert calendar.add(day, business_days) == expected
+
+
+def test_add_matches_a_day_by_day_walk(calendar):
+    rng = random.Random(25)
+    holidays = set(HOLIDAYS)
+    for _ in range(500):
+        day = START + timedelta(days=rng.randrange(0, 300))
+        business_days = rng.randrange(0, 40)
+        assert calendar.add(day, business_days) == _walk(day, business_days, holidays)
+
+
+def test_add_offsets_matches_add(calendar):
+    rng = np.random.default_rng(25)
+    offsets = rng.integers(0, 400, 2000)
+    business_days = rng.integers(0, 60, 2000)
+    arrivals = calendar.add_offsets(offsets, business_days)
+    expected = [(calendar.add(START + timedelta(days=int(offset)), int(days)) - START).days
+                for offset, days in zip(offsets, business_days)]
+    assert arrivals.tolist() == expected
+
+
+def test_out_of_range_raises(calendar):
+    with pytest.raises(ValueError):
+        calendar.add(START - timedelta(days=1), 1)
+    with pytest.raises(ValueError):
+        calendar.add_offsets([0], [10000])
+
+
+def test_bumped_versions_invalidate_both_caches_on_commit(app):
+    holiday = Holiday(date=date.today() + timedelta(days=1), name='Test Holiday')
+    before = {name: config_version.read(name) for name in ('pricing', 'holidays')}
+    business_calendar.get_calendar()
+    pricing.get_snapshot()
+
+    db.session.add(holiday)
+    business_calendar.bump_calendar_version()
+    pricing.bump_pricing_version()
+    db.session.rollback()
+    assert business_calendar._state['calendars'] and pricing._state['snapshot'] is not None
+
+    db.session.add(holiday)
+    business_calendar.bump_calendar_version()
+    pricing.bump_pricing_version()
+    db.session.commit()
+    assert not business_calendar._state['calendars'] and pricing._state['snapshot'] is None
+    assert config_version.read('holidays') == before['holidays'] + 1
+    assert config_version.read('pricing') == before['pricing'] + 1
+    business_calendar.get_calendar()
+    assert holiday.date in business_calendar._state['holidays']['']
+
+    db.session.delete(holiday)
+    business_calendar.bump_calendar_version()
+    db.session.commit()
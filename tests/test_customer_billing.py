@@ -0,0 +1,75 @@
+import math
+import random
+
+import pytest
+
+from customer_billing import calculate_customer_bill, calculate_customer_bills
+from pricing import PricingSnapshot
+
+CONFIGS = [
+    PricingSnapshot(has_config=True),
+    # Non-round rates so any change in operation order shows up in the last bit
+    PricingSnapshot(has_config=True, gst_rate=0.18, pickup_charge_jaipur=99.9, pickup_charge_oda_jaipur=301.7,
+                    delivery_charge_jaipur_0_5=287.35, delivery_charge_jaipur_5_15=512.05,
+                    delivery_charge_rajasthan_base=812.4, delivery_charge_rajasthan_per_kg=19.7,
+                    delivery_charge_india_base=1499.99, delivery_charge_india_per_kg=31.3,
+                    oda_charge=277.7, min_weight=12.5),
+]
+LOCATION_TYPES = ['jaipur_city', 'oda_jaipur', 'rajasthan', 'all_india', 'elsewhere']
+INVOICE_FIELDS = ('pickup_charge', 'delivery_charge', 'oda_charge', 'subtotal', 'gst', 'total',
+                  'eway_bill_required', 'declared_value', 'weight')
+
+
+def _around(value):
+    """The value and its neighbouring floats, for slab boundaries"""
+    return [math.nextafter(value, -math.inf), value, math.nextafter(value, math.inf)]
+
+
+def _rows(rng, config, count):
+    weights = _around(config.min_weight) + [0.0, 0.5, 5.0, 200.0]
+    distances = _around(5.0) + _around(15.0) + [0.0, 30.0]
+    declared = _around(50000.0) + [0.0, 125000.0]
+    rows = []
+    for _ in range(count):
+        rows.append({
+            'location_type': rng.choice(LOCATION_TYPES),
+            'weight': rng.choice(weights) if rng.random() < 0.5 else rng.uniform(0, 100),
+            'distance_km': rng.choice(distances) if rng.random() < 0.5 else rng.uniform(0, 25),
+            'is_oda': rng.random() < 0.3,
+            'declared_value': rng.choice(declared) if rng.random() < 0.5 else rng.uniform(0, 100000),
+            'description': 'parcel',
+            'dimensions': '10x10x10',
+        })
+    return rows
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('seed', range(5))
+def test_columnar_bills_match_scalar_bills(config, seed):
+    rows = _rows(random.Random(seed), config, 2000)
+    bills = calculate_customer_bills(rows, config)
+    for index, row in enumerate(rows):
+        expected = calculate_customer_bill(row, config)
+        for name in INVOICE_FIELDS:
+            actual = bills[name][index].item()
+            assert type(actual)(expected[name]) == actual, (row, name)
+            if isinstance(actual, float):
+                assert float(expected[name]).hex() == actual.hex(), (row, name)
+        assert bills['product_description'][index] == expected['product_description']
+        assert bills['dimensions'][index] == expected['dimensions']
+
+
+def test_columns_and_rows_give_the_same_bills():
+    config = CONFIGS[1]
+    rows = _rows(random.Random(42), config, 200)
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    from_rows = calculate_customer_bills(rows, config)
+    from_columns = calculate_customer_bills(columns, config)
+    for name in INVOICE_FIELDS:
+        assert from_rows[name].tolist() == from_columns[name].tolist()
+
+
+def test_requires_pricing_config():
+    with pytest.raises(Exception, match='Pricing configuration not set'):
+        calculate_customer_bills({'location_type': [], 'weight': [], 'declared_value': []},
+                                 PricingSnapshot())
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+import id_allocator
+from database import db
+from models import IdSequence, SupportTicket
+
+
+def _ticket():
+    return SupportTicket(customer_name='Ticket Customer', customer_email='ticket@example.com',
+                         subject='Where is my parcel', message='It has not arrived yet.')
+
+
+def _counter():
+    return db.session.get(IdSequence, 'support_tickets').next_value
+
+
+@pytest.fixture
+def fresh_blocks(app):
+    id_allocator._blocks.clear()
+    yield
+    id_allocator._blocks.clear()
+
+
+def test_construction_allocates_nothing(fresh_blocks):
+    before = _counter()
+    ticket = _ticket()
+    assert ticket.id is None and ticket.ticket_number is None
+    db.session.commit()
+    assert _counter() == before
+
+
+def test_ids_are_assigned_at_flush(fresh_blocks):
+    tickets = [_ticket() for _ in range(3)]
+    db.session.add_all(tickets)
+    db.session.flush()
+    ids = [ticket.id for ticket in tickets]
+    assert len(set(ids)) == 3
+    assert all(ticket.ticket_number.endswith(f"{ticket.id:04d}") for ticket in tickets)
+    db.session.commit()
+    for ticket in tickets:
+        db.session.delete(ticket)
+    db.session.commit()
+
+
+def test_rollback_undoes_the_reservation(fresh_blocks):
+    before = _counter()
+    db.session.add(_ticket())
+    db.session.flush()
+    assert _counter() > before
+    db.session.rollback()
+    assert _counter() == before
+    assert id_allocator._process_ranges('support_tickets') == []
+
+
+def test_committed_block_is_reused_without_the_table(fresh_blocks):
+    first = id_allocator.allocate('support_tickets')
+    db.session.commit()
+    after_first = _counter()
+    second = id_allocator.allocate('support_tickets')
+    db.session.commit()
+    assert second[0] == first[0] + 1
+    assert _counter() == after_first
+
+
+def test_counter_behind_max_id_is_raised(fresh_blocks):
+    ticket = _ticket()
+    db.session.add(ticket)
+    db.session.commit()
+    id_allocator._blocks.clear()
+    db.session.get(IdSequence, 'support_tickets').next_value = 1
+    db.session.get(IdSequence, 'support_tickets').updated_at = datetime.utcnow()
+    db.session.commit()
+    assert id_allocator.allocate('support_tickets') == [ticket.id + 1]
+    db.session.rollback()
+    db.session.delete(ticket)
+    db.session.commit()
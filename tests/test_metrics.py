@@ -0,0 +1,29 @@
+import metrics
+
+
+def test_value_computed_across_an_invalidation_is_not_cached():
+    metrics.invalidate()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        # A commit elsewhere invalidates while this value is being computed
+        metrics.invalidate('orders')
+        return len(calls)
+
+    assert metrics._cached('test', compute) == 1
+    assert metrics._cached('test', compute) == 2
+
+
+def test_value_is_cached_until_invalidated():
+    metrics.invalidate()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert metrics._cached('test', compute) == 1
+    assert metrics._cached('test', compute) == 1
+    metrics.invalidate('test')
+    assert metrics._cached('test', compute) == 2
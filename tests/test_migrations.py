@@ -0,0 +1,31 @@
+import pytest
+
+from migrations import check_query_plans, hot_order_queries, is_full_scan
+
+
+@pytest.mark.parametrize('line', [
+    'SCAN orders',
+    'SCAN TABLE orders',
+    'SCAN TABLE orders AS o',
+    'SCAN TABLE orders (~100000 rows)',
+])
+def test_full_scan_lines(line):
+    assert is_full_scan(line)
+
+
+@pytest.mark.parametrize('line', [
+    'SEARCH orders USING INDEX ix_orders_zone (zone_id=?)',
+    'SEARCH TABLE orders USING INDEX ix_orders_zone (zone_id=?)',
+    'SCAN orders USING INDEX ix_orders_created',
+    'SCAN TABLE orders USING COVERING INDEX ix_orders_created',
+    'USE TEMP B-TREE FOR ORDER BY',
+])
+def test_indexed_lines(line):
+    assert not is_full_scan(line)
+
+
+def test_hot_queries_use_indexes(app):
+    results = check_query_plans()
+    assert set(results) == set(hot_order_queries())
+    scans = {name: plan for name, (plan, full_scan) in results.items() if full_scan}
+    assert scans == {}
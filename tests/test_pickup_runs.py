@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import update
+
+import pickup_runs
+from database import db
+from models import PickupRun
+
+DISTRICT, STATE = 'Testpur', 'Rajasthan'
+
+
+def _row(weight):
+    return {'pickup_district': DISTRICT, 'pickup_state': STATE, 'weight': weight,
+            'length': 10, 'width': 10, 'height': 10, 'quantity': 1}
+
+
+def _runs():
+    return PickupRun.query.filter_by(cluster_key=pickup_runs.cluster_key(DISTRICT, STATE))\
+        .order_by(PickupRun.id).all()
+
+
+@pytest.fixture
+def open_run(app):
+    run = pickup_runs._new_run(DISTRICT, STATE, 100.0, 0.1, 2)
+    db.session.commit()
+    yield run.id
+    db.session.rollback()
+    for run in _runs():
+        db.session.delete(run)
+    db.session.commit()
+
+
+def test_bulk_placement_adds_to_the_current_totals(open_run, monkeypatch):
+    claim = pickup_runs._claim
+
+    def concurrent_booking_first(run_id, weight, volume, count=1):
+        # Another booking lands in the run after place_rows read its totals
+        db.session.execute(update(PickupRun).where(PickupRun.id == run_id)
+                           .values(order_count=PickupRun.order_count + 1,
+                                   total_weight=PickupRun.total_weight + 20))
+        monkeypatch.setattr(pickup_runs, '_claim', claim)
+        return claim(run_id, weight, volume, count)
+
+    monkeypatch.setattr(pickup_runs, '_claim', concurrent_booking_first)
+    rows = [_row(30), _row(30)]
+    assert pickup_runs.place_rows(rows) == 2
+    db.session.commit()
+
+    run = db.session.get(PickupRun, open_run)
+    db.session.refresh(run)
+    assert [row['pickup_run_id'] for row in rows] == [open_run, open_run]
+    assert run.order_count == 5
+    assert run.total_weight == pytest.approx(180.0)
+
+
+def test_rows_that_no_longer_fit_are_placed_again(open_run, monkeypatch):
+    claim = pickup_runs._claim
+
+    def concurrent_booking_first(run_id, weight, volume, count=1):
+        db.session.execute(update(PickupRun).where(PickupRun.id == run_id)
+                           .values(order_count=PickupRun.order_count + 1,
+                                   total_weight=PickupRun.total_weight + 100))
+        monkeypatch.setattr(pickup_runs, '_claim', claim)
+        return claim(run_id, weight, volume, count)
+
+    monkeypatch.setattr(pickup_runs, '_claim', concurrent_booking_first)
+    rows = [_row(30), _row(30)]
+    assert pickup_runs.place_rows(rows) == 2
+    db.session.commit()
+
+    runs = _runs()
+    assert runs[0].id == open_run
+    # 200 kg already in the run: one more 30 kg order fits, the second starts a run
+    assert [run.total_weight for run in runs] == pytest.approx([230.0, 30.0])
+    assert [run.order_count for run in runs] == [4, 1]
+    assert [row['pickup_run_id'] for row in rows] == [runs[0].id, runs[1].id]
+    assert all(run.total_weight <= 250 for run in runs)
@@ -0,0 +1,41 @@
+import math
+import random
+
+import pytest
+
+from pricing import PricingSnapshot, ZoneRate, quote, quote_arrays
+
+ZONE = ZoneRate(id=3, name='Test Zone', base_rate=12.5, delivery_days=4)
+SNAPSHOT = PricingSnapshot(has_config=True, min_weight=15.0, weight_cat_15_plus=7.0, volume_rate=50.0,
+                           insurance_rate=0.02, cod_fee_rate=0.025, card_fee_rate=0.015, zones={3: ZONE})
+
+
+def test_weight_below_minimum_is_billed_at_minimum():
+    light = quote(SNAPSHOT, ZONE, 2.0, 10, 10, 10, quantity=3)
+    at_minimum = quote(SNAPSHOT, ZONE, 15.0, 10, 10, 10, quantity=3)
+    assert light['weight_cost'] == pytest.approx(12.5 * 15.0 * 3)
+    assert light['total_amount'] == at_minimum['total_amount']
+    heavier = quote(SNAPSHOT, ZONE, 20.0, 10, 10, 10)
+    assert heavier['weight_cost'] == pytest.approx(12.5 * 20.0)
+    assert heavier['extra_weight_charge'] == pytest.approx(5.0 * 7.0)
+
+
+def test_without_config_actual_weight_is_billed():
+    snapshot = PricingSnapshot(zones={3: ZONE})
+    assert quote(snapshot, ZONE, 2.0, 10, 10, 10)['total_amount'] == 25.0
+
+
+@pytest.mark.parametrize('snapshot', [SNAPSHOT, PricingSnapshot(zones={3: ZONE})])
+def test_quote_arrays_matches_quote(snapshot):
+    rng = random.Random(2)
+    weights = [0.0, 2.0, math.nextafter(15.0, 0), 15.0, math.nextafter(15.0, 100), 40.0]
+    weights += [rng.uniform(0, 60) for _ in range(200)]
+    shipments = [(w, rng.uniform(1, 120), rng.uniform(1, 120), rng.uniform(1, 120), rng.randint(1, 5),
+                  rng.choice(['cash_on_delivery', 'card_payment', 'online_payment']),
+                  rng.random() < 0.5, rng.uniform(0, 5000)) for w in weights]
+    result = quote_arrays(snapshot, [3] * len(shipments), *[list(column) for column in zip(*shipments)])
+    for index, shipment in enumerate(shipments):
+        weight, length, width, height, quantity, mode, insured, value = shipment
+        expected = quote(snapshot, ZONE, weight, length, width, height, quantity, mode, insured, value)
+        assert result['weight_cost'][index] == expected['weight_cost']
+        assert round(result['total_unrounded'][index], 2) == expected['total_amount']
@@ -0,0 +1,42 @@
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+from pricing import PricingSnapshot, ZoneRate
+from pricing_simulator import proposed_snapshot, reprice_chunk
+
+SNAPSHOT = PricingSnapshot(has_config=True, zones={1: ZoneRate(1, 'Local', 10.0, 2),
+                                                   2: ZoneRate(2, 'National', 20.0, 5)})
+BOOKED = datetime(2026, 4, 10)
+
+
+def _row(zone_id, weight, stored):
+    return (zone_id, BOOKED, weight, 10, 10, 10, 1, 'online_payment', False, 0.0, stored)
+
+
+def test_unchanged_config_has_no_delta_even_when_stored_totals_drifted():
+    # Booked under older rates/formulas: stored totals are far from today's prices
+    rows = [_row(1, 3.0, 1.0), _row(1, 30.0, 9999.0), _row(2, 8.0, 42.0)]
+    totals = reprice_chunk(SNAPSHOT, proposed_snapshot({}, SNAPSHOT), rows)
+    for count, stored, current, proposed in totals.values():
+        assert proposed == current
+        assert stored != current
+    assert totals[(1, '2026-04')][0] == 2
+    assert totals[(1, '2026-04')][1] == pytest.approx(10000.0)
+
+
+def test_delta_is_only_the_proposed_change():
+    rows = [_row(1, 3.0, 1.0), _row(2, 8.0, 42.0)]
+    proposed = proposed_snapshot({'zones': {'2': 25.0}}, SNAPSHOT)
+    totals = reprice_chunk(SNAPSHOT, proposed, rows)
+    assert totals[(1, '2026-04')][3] == totals[(1, '2026-04')][2]
+    _, _, current, new = totals[(2, '2026-04')]
+    # 15 kg billable at 5 more per kg, plus GST
+    assert new - current == pytest.approx(5.0 * 15 * (1 + SNAPSHOT.gst_rate), abs=0.01)
+
+
+def test_unknown_zone_keeps_stored_price():
+    current = replace(SNAPSHOT, zones={})
+    totals = reprice_chunk(current, current, [_row(7, 3.0, 123.0)])
+    assert totals[(7, '2026-04')] == [1, 123.0, 123.0, 123.0]
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import pubsub
+import tracking_cache
+
+
+class _StopRelay(BaseException):
+    """Ends _relay_loop, which retries on any Exception"""
+
+
+class _Channel:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        for message in self.messages:
+            yield {'data': json.dumps(message)}
+        raise _StopRelay()
+
+
+class _Client:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return _Channel(self.messages)
+
+
+def test_relayed_update_evicts_local_view_before_waking_streams(app):
+    key = 'REFRELAY0001'
+    view = object()
+    tracking_cache._store(key, view, tracking_cache._generation)
+    subscription = pubsub.subscribe(key)
+    try:
+        seen = []
+        pubsub.on_remote_update(lambda keys: seen.append(key in tracking_cache._entries))
+        with pytest.raises(_StopRelay):
+            pubsub._relay_loop(_Client([{'origin': 'another-process', 'keys': [key]}]), 'this-process')
+        assert seen == [False]  # already evicted when later handlers ran
+        assert key not in tracking_cache._entries
+        assert subscription.wait(0)
+    finally:
+        pubsub._remote_handlers.pop()
+        pubsub.unsubscribe(subscription)
+
+
+def test_relay_skips_its_own_messages(app):
+    key = 'REFRELAY0002'
+    tracking_cache._store(key, object(), tracking_cache._generation)
+    subscription = pubsub.subscribe(key)
+    try:
+        with pytest.raises(_StopRelay):
+            pubsub._relay_loop(_Client([{'origin': 'this-process', 'keys': [key]}]), 'this-process')
+        assert key in tracking_cache._entries
+        assert not subscription.wait(0)
+    finally:
+        pubsub.unsubscribe(subscription)
+        tracking_cache.invalidate_local(key)
+
+
+def test_origin_is_made_per_process(monkeypatch):
+    first = pubsub._origin_id()
+    assert pubsub._origin_id() == first
+    # A forked (e.g. preloaded) worker has a new pid and must not reuse the parent's id
+    monkeypatch.setattr(pubsub.os, 'getpid', lambda: -1)
+    assert pubsub._origin_id() != first
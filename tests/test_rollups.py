@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from sqlalchemy import func
+
+import rollups
+from database import db
+from models import Order
+
+
+def _order():
+    now = datetime.utcnow()
+    return Order(customer_name='Test Customer', customer_email='rollups@example.com', customer_phone='9000000000',
+                 pickup_address='1 Main Road, Jaipur, Rajasthan', delivery_address='2 Park Street, Kota, Rajasthan',
+                 zone_id=1, package_type='box', weight=2.0, length=10, width=10, height=10, quantity=1,
+                 payment_mode='online_payment', recipient_name='Recipient', recipient_phone='9000000001',
+                 total_amount=250.0, gst_amount=38.0, estimated_delivery=now, created_at=now)
+
+
+def _consistent():
+    orders = db.session.query(Order.delivery_status, func.count(Order.id), func.sum(Order.total_amount))\
+        .group_by(Order.delivery_status).all()
+    expected = {status: (count, round(revenue, 2)) for status, count, revenue in orders}
+    actual = {status: (count, round(revenue, 2)) for status, (count, revenue) in rollups.status_totals().items()}
+    return expected == actual
+
+
+def test_rollups_follow_changes_to_expired_orders(app):
+    rollups.rebuild_rollups()
+    order = _order()
+    db.session.add(order)
+    db.session.commit()
+    assert _consistent()
+
+    # Every commit expires the order, so these writes replace values that are not loaded
+    order.delivery_status = 'in_transit'
+    db.session.commit()
+    assert _consistent()
+
+    order.total_amount = 300.0
+    order.partner_id = 7
+    db.session.commit()
+    assert _consistent()
+
+    db.session.delete(order)
+    db.session.commit()
+    assert _consistent()
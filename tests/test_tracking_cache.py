@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import tracking_cache
+from database import db
+from models import DeliveryEvent, Order
+
+
+def test_shared_entries_round_trip_through_json(app):
+    now = datetime(2026, 3, 4, 5, 6, 7, 890)
+    order = Order(customer_name='Tracking Customer', customer_email='tracking@example.com',
+                  customer_phone='9000000000', pickup_address='1 Main Road, Jaipur, Rajasthan',
+                  delivery_address='2 Park Street, Kota, Rajasthan', zone_id=1, package_type='box',
+                  weight=1.5, length=10, width=10, height=10, quantity=2, payment_mode='online_payment',
+                  recipient_name='Recipient', recipient_phone='9000000001', total_amount=123.45,
+                  estimated_delivery=now, created_at=now, delivery_status='in_transit')
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(DeliveryEvent(order_id=order.id, event_type='picked_up', description='Picked up',
+                                 location='Jaipur', timestamp=now))
+    db.session.commit()
+
+    view = tracking_cache.build_view(order.reference_number)
+    generation, loaded = tracking_cache._load_view(tracking_cache._dump_view(view, '7'))
+
+    assert generation == '7'
+    assert vars(loaded) == vars(view)
+    assert isinstance(loaded.created_at, datetime)
+    assert tracking_cache.status_payload(loaded) == tracking_cache.status_payload(view)
+    assert loaded.get_delivery_timeline() == view.get_delivery_timeline()
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import work_queue
+from database import db
+from models import Order
+from pagination import Page
+
+PARTNER_ID = 4242
+STATUS_ROWS = {'in_transit': 3, 'pending': 7, 'delivered': 9, 'cancelled': 2}
+
+
+@pytest.fixture
+def queue(app):
+    start = datetime(2026, 1, 1)
+    created = []
+    for status, count in STATUS_ROWS.items():
+        for index in range(count):
+            order = Order(customer_name='Queue Customer', customer_email='queue@example.com',
+                          customer_phone='9000000000', pickup_address='1 Main Road, Jaipur, Rajasthan',
+                          delivery_address='2 Park Street, Kota, Rajasthan', zone_id=1, package_type='box',
+                          weight=1.0, length=10, width=10, height=10, quantity=1, payment_mode='online_payment',
+                          recipient_name='Recipient', recipient_phone='9000000001', total_amount=100.0,
+                          estimated_delivery=start, created_at=start + timedelta(hours=len(created)),
+                          delivery_status=status, partner_id=PARTNER_ID)
+            db.session.add(order)
+            created.append(order)
+    db.session.commit()
+    yield
+    # ORM deletes, so the rollup hook takes the orders back out of the counts
+    for order in created:
+        db.session.delete(order)
+    db.session.commit()
+
+
+def _walk_cursors(size, status=None):
+    pages, cursor = [], None
+    while True:
+        orders, cursor = work_queue.work_queue_page(PARTNER_ID, cursor, size, status)
+        pages.append([order.id for order in orders])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('size', [1, 4, 7, 10, 50])
+@pytest.mark.parametrize('status', [None, 'pending', 'delivered'])
+def test_numbered_pages_match_cursor_pages(queue, size, status):
+    pages = _walk_cursors(size, status)
+    total = work_queue.queue_total(work_queue.status_counts(PARTNER_ID), status)
+    assert sum(len(page) for page in pages) == total
+    for number, expected in enumerate(pages, 1):
+        orders, _ = work_queue.work_queue_page(PARTNER_ID, size=size, status=status, page=number)
+        assert [order.id for order in orders] == expected
+
+
+def test_page_has_pagination_interface(queue):
+    counts = work_queue.status_counts(PARTNER_ID)
+    orders, cursor = work_queue.work_queue_page(PARTNER_ID, size=10, page=2)
+    page = Page(orders, 2, 10, work_queue.queue_total(counts), cursor)
+    assert page.total == 21
+    assert page.pages == 3
+    assert page.items == orders and list(page) == orders
+    assert page.has_prev and page.prev_num == 1
+    assert page.has_next and page.next_num == 3
+    assert list(page.iter_pages()) == [1, 2, 3]
+
+    last, cursor = work_queue.work_queue_page(PARTNER_ID, size=10, page=3)
+    page = Page(last, 3, 10, 21, cursor)
+    assert len(page) == 1 and not page.has_next and page.next_num is None
+
+
+def test_iter_pages_marks_gaps():
+    page = Page([], 10, 10, 200)
+    assert list(page.iter_pages()) == [1, 2, None, 8, 9, 10, 11, 12, 13, 14, None, 19, 20]
@@ -0,0 +1,291 @@
+"""Read-through cache for the public tracking pages.
+
+/track-package, /order/<ref> and /order/<ref>/timeline read a TrackingView:
+a detached copy of the order columns, its zone, the partner's public
+details and the delivery events, keyed by reference number. Views live in
+a per-process LRU (TRACKING_CACHE_SIZE entries, TRACKING_CACHE_TTL
+seconds) with an optional shared Redis tier (TRACKING_CACHE_REDIS_URL).
+
+Any committed ORM write to an Order or DeliveryEvent drops the affected
+reference numbers from this process's LRU and from the shared tier; code
+that writes with Core statements calls mark_changed() itself. Other
+processes pick up the change from the shared tier or when their local
+entry expires, so the local TTL bounds cross-process staleness.
+
+Shared entries are JSON tagged with a per-reference generation counter
+that every invalidation increments. A view is only written if the counter
+still has the value read before the view was built (checked atomically in
+Redis), and readers ignore entries whose tag is behind the counter, so a
+read that raced a commit cannot park a stale page in the shared tier.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+import json
+import logging
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload
+from models import Order, DeliveryEvent
+import pubsub
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+SHARED_KEY_PREFIX = 'tracking:'
+SHARED_GENERATION_PREFIX = 'tracking-gen:'
+
+# SET key view EX ttl, but only if the generation counter still has the value read before building the view
+_SET_IF_CURRENT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+class TrackingView:
+    """Read-only copy of an order with the attributes the tracking templates use"""
+
+    def __init__(self, values, zone, partner, events):
+        self.__dict__.update(values)
+        self.zone = zone
+        self.partner = partner
+        self.events = events
+
+    # Same timeline logic as the model; it only reads plain attributes
+    get_delivery_timeline = Order.get_delivery_timeline
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # reference number -> (view, expires at)
+_generation = 0  # bumped on every invalidation; guards against storing stale reads
+_stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+_shared_client = None
+
+def _columns(obj, exclude=()):
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns if column.key not in exclude}
+
+def build_view(reference_number):
+    """Load a TrackingView from the database (None if there is no such order)"""
+    order = Order.query.options(joinedload(Order.zone), joinedload(Order.partner))\
+        .filter_by(reference_number=reference_number).first()
+    if not order:
+        return None
+    return TrackingView(
+        _columns(order),
+        SimpleNamespace(**_columns(order.zone)) if order.zone else None,
+        SimpleNamespace(id=order.partner.id, full_name=order.partner.full_name) if order.partner else None,
+        DeliveryEvent.timeline(order.id)
+    )
+
+def status_payload(view):
+    """Compact status of a view for SSE updates and status polling"""
+    last_event = view.events[-1] if view.events else None
+    return {
+        'reference_number': view.reference_number,
+        'delivery_status': view.delivery_status,
+        'payment_status': view.payment_status,
+        'estimated_delivery': view.estimated_delivery.strftime('%Y-%m-%dT%H:%M:%S') if view.estimated_delivery else None,
+        'actual_delivery': view.actual_delivery.strftime('%Y-%m-%dT%H:%M:%S') if view.actual_delivery else None,
+        'last_event': last_event,
+        'event_count': len(view.events),
+        # Changes whenever the order row or its events change
+        'version': f"{view.updated_at.isoformat() if view.updated_at else ''}-{len(view.events)}",
+    }
+
+def _shared():
+    global _shared_client
+    url = current_app.config.get('TRACKING_CACHE_REDIS_URL')
+    if not url or redis is None:
+        return None
+    if _shared_client is None:
+        _shared_client = redis.Redis.from_url(url, socket_timeout=0.5)
+    return _shared_client
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def _json_object(value):
+    if len(value) == 1 and '$datetime' in value:
+        return datetime.fromisoformat(value['$datetime'])
+    return value
+
+def _dump_view(view, generation):
+    values = {name: value for name, value in vars(view).items() if name not in ('zone', 'partner', 'events')}
+    return json.dumps({
+        'generation': generation,
+        'values': values,
+        'zone': vars(view.zone) if view.zone else None,
+        'partner': vars(view.partner) if view.partner else None,
+        'events': view.events,
+    }, default=_json_default)
+
+def _load_view(data):
+    """(generation, TrackingView) from a shared entry"""
+    entry = json.loads(data, object_hook=_json_object)
+    return entry['generation'], TrackingView(
+        entry['values'],
+        SimpleNamespace(**entry['zone']) if entry['zone'] else None,
+        SimpleNamespace(**entry['partner']) if entry['partner'] else None,
+        entry['events'],
+    )
+
+def _shared_get(key):
+    """(view or None, shared generation or None); the generation is needed to store a rebuilt view"""
+    client = _shared()
+    if client is None:
+        return None, None
+    try:
+        data, generation = client.mget(SHARED_KEY_PREFIX + key, SHARED_GENERATION_PREFIX + key)
+        generation = generation.decode() if generation else '0'
+        if data:
+            tag, view = _load_view(data)
+            if str(tag) == generation:
+                return view, generation
+        return None, generation
+    except Exception as e:
+        logging.warning(f"Tracking cache shared get failed: {str(e)}")
+        return None, None
+
+def _shared_set(key, view, generation):
+    client = _shared()
+    if client is None or generation is None:
+        return
+    try:
+        client.eval(_SET_IF_CURRENT, 2, SHARED_KEY_PREFIX + key, SHARED_GENERATION_PREFIX + key,
+                    generation, _dump_view(view, generation), current_app.config['TRACKING_CACHE_SHARED_TTL'])
+    except Exception as e:
+        logging.warning(f"Tracking cache shared set failed: {str(e)}")
+
+def _store(key, view, generation):
+    capacity = current_app.config['TRACKING_CACHE_SIZE']
+    expires = time.monotonic() + current_app.config['TRACKING_CACHE_TTL']
+    with _lock:
+        if generation != _generation:
+            return  # invalidated while we were loading; the read may be stale
+        _entries[key] = (view, expires)
+        _entries.move_to_end(key)
+        while len(_entries) > capacity:
+            _entries.popitem(last=False)
+            _stats['evictions'] += 1
+
+def get_view(reference_number):
+    """TrackingView for a reference number (None if not found)"""
+    key = reference_number.strip().upper()
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return entry[0]
+        generation = _generation
+
+    view, shared_generation = _shared_get(key)
+    if view is not None:
+        with _lock:
+            _stats['shared_hits'] += 1
+        _store(key, view, generation)
+        return view
+
+    with _lock:
+        _stats['misses'] += 1
+    view = build_view(key)
+    if view is not None:
+        _store(key, view, generation)
+        _shared_set(key, view, shared_generation)
+    return view
+
+def invalidate_local(*reference_numbers):
+    """Drop cached views from this process's LRU only; returns the normalised keys"""
+    global _generation
+    keys = [ref.upper() for ref in reference_numbers if ref]
+    if not keys:
+        return keys
+    with _lock:
+        _generation += 1
+        for key in keys:
+            _entries.pop(key, None)
+        _stats['invalidations'] += len(keys)
+    return keys
+
+@pubsub.on_remote_update
+def _invalidate_remote_change(keys):
+    # The publishing process already cleared the shared tier
+    invalidate_local(*keys)
+
+def invalidate(*reference_numbers):
+    """Drop cached views for the given reference numbers (local LRU and shared tier)"""
+    keys = invalidate_local(*reference_numbers)
+    if not keys:
+        return
+    client = _shared()
+    if client is not None:
+        try:
+            # Bumping the generation also fences off views being built right now; the
+            # counter outlives any entry tagged with an older value
+            ttl = current_app.config['TRACKING_CACHE_SHARED_TTL'] * 2
+            pipe = client.pipeline()
+            for key in keys:
+                pipe.incr(SHARED_GENERATION_PREFIX + key)
+                pipe.expire(SHARED_GENERATION_PREFIX + key, ttl)
+            pipe.delete(*[SHARED_KEY_PREFIX + key for key in keys])
+            pipe.execute()
+        except Exception as e:
+            logging.warning(f"Tracking cache shared delete failed: {str(e)}")
+
+def clear():
+    """Drop every entry from this process's LRU"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+def stats():
+    """Hit/miss counters and occupancy for this process"""
+    with _lock:
+        result = dict(_stats)
+        result['size'] = len(_entries)
+    lookups = result['hits'] + result['shared_hits'] + result['misses']
+    result['capacity'] = current_app.config['TRACKING_CACHE_SIZE']
+    result['hit_ratio'] = round((result['hits'] + result['shared_hits']) / lookups, 4) if lookups else None
+    result['shared_tier'] = _shared() is not None
+    return result
+
+def mark_changed(session, *reference_numbers):
+    """Invalidate (and publish) these orders when session commits; for Core writes the hooks cannot see"""
+    refs = {ref for ref in reference_numbers if ref}
+    if refs:
+        session.info.setdefault('tracking_changed', set()).update(refs)
+
+@event.listens_for(Session, 'after_flush')
+def _track_order_writes(session, flush_context):
+    refs = set()
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Order):
+                refs.add(obj.reference_number)
+                refs.update(inspect(obj).attrs.reference_number.history.deleted)
+            elif isinstance(obj, DeliveryEvent):
+                order = session.get(Order, obj.order_id) if obj.order_id else None
+                if order:
+                    refs.add(order.reference_number)
+    refs.discard(None)
+    if refs:
+        session.info.setdefault('tracking_changed', set()).update(refs)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    refs = session.info.pop('tracking_changed', None)
+    if refs:
+        invalidate(*refs)
+        pubsub.publish(*[ref.upper() for ref in refs])
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('tracking_changed', None)
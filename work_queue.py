@@ -0,0 +1,107 @@
+"""Per-partner work queue with keyset cursors.
+
+A partner sees only their own orders: open work first (in transit, picked
+up, then pending, oldest first), followed by closed orders (delivered,
+then cancelled, newest first). Each status is read with its own range
+scan on the (partner_id, delivery_status, created_at, id) index, so a page
+touches only the rows it returns regardless of the size of the orders
+table. Cursors carry the status and the last (created_at, id). Per-status
+counts come from the daily rollups, which also reveal any statuses outside
+the fixed order so they can be listed after it. A numbered page without a
+cursor (a jump from a pager) skips whole statuses by their counts and
+offsets only within the status it lands in.
+"""
+from datetime import datetime
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+from database import db
+from models import Order, OrderDailyRollup
+
+# (status, newest first) in display order
+QUEUE_ORDER = (
+    ('in_transit', False),
+    ('picked_up', False),
+    ('pending', False),
+    ('delivered', True),
+    ('cancelled', True),
+)
+QUEUE_STATUSES = tuple(status for status, _ in QUEUE_ORDER)
+OPEN_STATUSES = ('in_transit', 'picked_up', 'pending')
+
+DEFAULT_PAGE_SIZE = 10
+
+def encode_cursor(order):
+    return f"{order.delivery_status}~{order.created_at.isoformat()}~{order.id}"
+
+def decode_cursor(cursor):
+    """Return (status, created_at, id); raises ValueError on a malformed cursor"""
+    status, created_at, order_id = cursor.split('~')
+    return status, datetime.fromisoformat(created_at), int(order_id)
+
+def status_counts(partner_id):
+    """{status: count} for one partner's orders, from the daily rollups"""
+    total = func.sum(OrderDailyRollup.order_count)
+    rows = db.session.query(OrderDailyRollup.delivery_status, total)\
+        .filter(OrderDailyRollup.partner_id == partner_id)\
+        .group_by(OrderDailyRollup.delivery_status)\
+        .having(total > 0).all()
+    return {status: int(count) for status, count in rows}
+
+def queue_statuses(counts):
+    """Statuses in queue order; statuses outside QUEUE_ORDER come last, by name"""
+    return list(QUEUE_STATUSES) + sorted(status for status in counts if status not in QUEUE_STATUSES)
+
+def _status_rows(partner_id, status, after, limit, offset=0):
+    newest_first = dict(QUEUE_ORDER).get(status, True)
+    query = Order.query.options(joinedload(Order.zone))\
+        .filter(Order.partner_id == partner_id, Order.delivery_status == status)
+
+    if after:
+        created_at, order_id = after
+        if newest_first:
+            query = query.filter(Order.created_at <= created_at,
+                                 or_(Order.created_at < created_at, Order.id < order_id))
+        else:
+            query = query.filter(Order.created_at >= created_at,
+                                 or_(Order.created_at > created_at, Order.id > order_id))
+
+    if newest_first:
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    else:
+        query = query.order_by(Order.created_at, Order.id)
+    return query.offset(offset or None).limit(limit).all()
+
+def work_queue_page(partner_id, cursor=None, size=DEFAULT_PAGE_SIZE, status=None, counts=None, page=1):
+    """Return (orders, next cursor or None) for one page of a partner's queue.
+
+    status restricts the page to one delivery status; counts (from
+    status_counts) can be passed in when the caller already has them.
+    Without a cursor, page selects the page number to start from.
+    """
+    if counts is None:
+        counts = status_counts(partner_id)
+    statuses = [status] if status else queue_statuses(counts)
+
+    start, after, skip = 0, None, 0
+    if cursor:
+        cursor_status, created_at, order_id = decode_cursor(cursor)
+        if cursor_status not in statuses:
+            raise ValueError(f"Cursor status not in queue: {cursor_status}")
+        start, after = statuses.index(cursor_status), (created_at, order_id)
+    elif page and page > 1:
+        skip = (page - 1) * size
+        while start < len(statuses) and counts.get(statuses[start], 0) <= skip:
+            skip -= counts.get(statuses[start], 0)
+            start += 1
+
+    orders = []
+    for index in range(start, len(statuses)):
+        orders.extend(_status_rows(partner_id, statuses[index], after if index == start else None,
+                                   size + 1 - len(orders), skip if index == start else 0))
+        if len(orders) > size:
+            return orders[:size], encode_cursor(orders[size - 1])
+    return orders, None
+
+def queue_total(counts, status=None):
+    """Number of orders in the queue (or in one status of it)"""
+    return counts.get(status, 0) if status else sum(counts.values())
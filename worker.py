@@ -0,0 +1,14 @@
+"""Background job worker: python worker.py [--once] [--poll SECONDS]"""
+import argparse
+import os
+import socket
+from app import app
+from jobs import work
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Process queued report, export and PDF jobs')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls when idle')
+    args = parser.parse_args()
+    with app.app_context():
+        work(f'{socket.gethostname()}:{os.getpid()}', poll_interval=args.poll, once=args.once)